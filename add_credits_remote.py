@@ -1,4 +1,13 @@
-"""Add credits to users on remote deployment (Render/Railway)"""
+"""Add credits to users on remote deployment (Render/Railway)
+
+Interactive by default. To grant credits from a CSV file (one "email[,credits]"
+per line, optional "email,credits" header), uploaded in chunks over one connection:
+
+    python add_credits_remote.py --file grants.csv [--credits 10] [--chunk-size 1000] [--skip 0]
+"""
+import argparse
+import csv
+import io
 import os
 import sys
 
@@ -13,6 +22,9 @@ if not ADMIN_KEY:
     print("Set it with: $env:ADMIN_KEY='your_key_here' (PowerShell)")
     sys.exit(1)
 
+# One keep-alive connection for all requests
+session = requests.Session()
+
 def add_credits_to_user(email, credits):
     """Add credits to a specific user"""
     url = f"{RENDER_URL}/admin/add_credits"
@@ -23,7 +35,7 @@ def add_credits_to_user(email, credits):
     }
     
     try:
-        response = requests.post(url, json=payload, timeout=10)
+        response = session.post(url, json=payload, timeout=10)
         if response.status_code == 200:
             data = response.json()
             print(f"✅ Success: {data['message']}")
@@ -48,13 +60,11 @@ def add_credits_to_all(credits):
     }
     
     try:
-        response = requests.post(url, json=payload, timeout=10)
+        response = session.post(url, json=payload, timeout=300)
         if response.status_code == 200:
             data = response.json()
             print(f"✅ Success: {data['message']}")
-            print("\nUpdated users:")
-            for user in data['updated_users']:
-                print(f"  {user['email']}: {user['old_total']} → {user['new_total']} (available: {user['available']})")
+            print(f"   {data['batches']} batches")
         else:
             print(f"❌ Error: {response.json().get('error', 'Unknown error')}")
             sys.exit(1)
@@ -62,7 +72,53 @@ def add_credits_to_all(credits):
         print(f"❌ Connection error: {e}")
         sys.exit(1)
 
+def grant_from_file(path, credits, chunk_size, skip):
+    """Upload the grants in a CSV file, chunk_size lines per request"""
+    url = f"{RENDER_URL}/admin/add_credits"
+    with open(path, newline='') as f:
+        rows = [row for row in csv.reader(f) if row and row[0].strip() and not row[0].strip().startswith('#')]
+    if rows and rows[0][0].strip().lower() == 'email':
+        rows = rows[1:]
+
+    totals = {'requested': 0, 'users_updated': 0, 'credits_granted': 0, 'not_found_count': 0}
+    for start in range(skip, len(rows), chunk_size):
+        chunk = io.StringIO()
+        csv.writer(chunk).writerows(rows[start:start + chunk_size])
+        payload = {"admin_key": ADMIN_KEY, "csv": chunk.getvalue(), "credits": credits}
+
+        try:
+            response = session.post(url, json=payload, timeout=120)
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            data, response = {'error': str(e)}, None
+        if response is None or response.status_code != 200:
+            # Earlier chunks are committed; resume after them so nobody is granted twice
+            print(f"❌ Error on rows {start + 1}-{start + chunk_size}: {data.get('error', 'Unknown error')}")
+            print(f"   Rows before {start + 1} were applied. Fix the problem and resume with --skip {start}")
+            print("   (if this chunk reported users_updated > 0, check those users before resuming)")
+            sys.exit(1)
+
+        for key in totals:
+            totals[key] += data.get(key, 0)
+        print(f"✅ Rows {start + 1}-{min(start + chunk_size, len(rows))}: {data['message']}")
+        for email in data.get('not_found', []):
+            print(f"   not found: {email}")
+
+    print(f"\nDone: {totals['credits_granted']} credits to {totals['users_updated']} users "
+          f"({totals['requested']} requested, {totals['not_found_count']} not found)")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add credits to users on the remote deployment")
+    parser.add_argument('--file', help='CSV of grants: email[,credits] per line')
+    parser.add_argument('--credits', type=int, default=0, help='credits for lines without an amount')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='grants per request')
+    parser.add_argument('--skip', type=int, default=0, help='grant rows to skip (to resume an upload)')
+    args = parser.parse_args()
+
+    if args.file:
+        grant_from_file(args.file, args.credits, args.chunk_size, args.skip)
+        sys.exit(0)
+
     print("=" * 60)
     print("Add Credits to Remote Deployment")
     print("=" * 60)
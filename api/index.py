@@ -7,6 +7,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 # Set Vercel environment variable before importing app
 os.environ['VERCEL'] = '1'
+# Each function instance is short-lived: connect through the database's transaction pooler
+# (DATABASE_URL should be the pooler URL) instead of keeping a pool per instance
+os.environ.setdefault('DB_POOL_MODE', 'pooler')
 
 # Import Flask app - Vercel will handle it automatically
 from app import app
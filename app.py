@@ -7,10 +7,21 @@ import time
 import secrets
 import string
 import re
+import csv
+import json
+import math
+import zipfile
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for, make_response
+from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for, make_response, g, has_app_context, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session as SessionBase, make_transient_to_detached
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
@@ -29,6 +40,37 @@ app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 # Use /tmp on Vercel, otherwise system temp directory
 app.config['UPLOAD_FOLDER'] = '/tmp' if os.environ.get('VERCEL') else tempfile.gettempdir()
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0  # Disable caching
+# pdfminer layout parameters for the text-only engine (LAParams fields).
+# A wide char_margin keeps each visual line (e.g. a table row) on one line like pdfplumber does;
+# override with a JSON object, e.g. TEXT_LAPARAMS='{"line_margin": 0.3, "boxes_flow": null}'
+DEFAULT_TEXT_LAPARAMS = {'char_margin': 50.0}
+# LAParams' keyword arguments, listed here so importing the app doesn't load pdfminer
+LAPARAMS_FIELDS = {'line_overlap', 'char_margin', 'line_margin', 'word_margin', 'boxes_flow', 'detect_vertical', 'all_texts'}
+
+def load_text_laparams(value):
+    """TEXT_LAPARAMS from its env value; a malformed value is logged and the defaults are used"""
+    if not value:
+        return dict(DEFAULT_TEXT_LAPARAMS)
+    try:
+        overrides = json.loads(value)
+        if not isinstance(overrides, dict):
+            raise ValueError('not a JSON object')
+    except ValueError as e:
+        logging.getLogger(__name__).error(f"Ignoring TEXT_LAPARAMS={value!r}: {e}")
+        return dict(DEFAULT_TEXT_LAPARAMS)
+    unknown = sorted(set(overrides) - LAPARAMS_FIELDS)
+    if unknown:
+        logging.getLogger(__name__).error(f"Ignoring unknown TEXT_LAPARAMS keys {', '.join(unknown)}; "
+                                          f"valid keys are {', '.join(sorted(LAPARAMS_FIELDS))}")
+    return {**DEFAULT_TEXT_LAPARAMS, **{key: overrides[key] for key in overrides if key in LAPARAMS_FIELDS}}
+
+app.config['TEXT_LAPARAMS'] = load_text_laparams(os.environ.get('TEXT_LAPARAMS'))
+# Behind a reverse proxy, trust this many X-Forwarded-For hops so request.remote_addr (used for
+# per-IP rate limits and logging) is the client's address rather than the proxy's
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+if TRUSTED_PROXY_COUNT:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT)  # type: ignore[method-assign]
 
 csrf = CSRFProtect(app)
 
@@ -38,6 +80,56 @@ def inject_csrf_token():
     from flask_wtf.csrf import generate_csrf  # type: ignore[import]
     return dict(csrf_token=lambda: generate_csrf())
 
+# Static assets: build_assets.py writes minified, content-hashed copies to static/dist and a manifest
+# mapping e.g. 'style.css' to 'dist/style.<hash>.css' and the hash of the source it was built from.
+# Those are served as immutable for a year, so repeat page loads make no asset requests. Without a
+# current build, the source file is linked with a content-hash ?v= and revalidated on each load.
+STATIC_DIST_PREFIX = 'dist/'
+asset_cache = {}  # path -> (mtime, manifest dict or content hash)
+unbuilt_assets_logged = set()
+
+def _file_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def _cached_by_mtime(path, load):
+    mtime = _file_mtime(path)
+    if mtime is None:
+        return None
+    cached = asset_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = asset_cache[path] = (mtime, load(path))
+    return cached[1]
+
+def _load_manifest(path):
+    with open(path) as f:
+        return json.load(f)
+
+def _content_hash(path):
+    import hashlib
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+@app.template_global()
+def asset_url(filename):
+    """URL of a static asset: its fingerprinted build if that is up to date, else the source file"""
+    static_folder = app.static_folder or 'static'
+    manifest_path = os.path.join(static_folder, STATIC_DIST_PREFIX, 'manifest.json')
+    source_path = os.path.join(static_folder, filename)
+    manifest = _cached_by_mtime(manifest_path, _load_manifest) or {}
+    source_hash = _cached_by_mtime(source_path, _content_hash)
+    # static/dist/ isn't committed: a source that differs from its last build is served as-is until the next one
+    built = manifest.get(filename)
+    if isinstance(built, dict) and built.get('source_hash') == source_hash:
+        return url_for('static', filename=built['file'])
+    if is_vercel and filename not in unbuilt_assets_logged:
+        unbuilt_assets_logged.add(filename)
+        logger.warning(f"No current build of {filename}; serving the source without long-term caching "
+                       f"(did the deploy run build_assets.py?)")
+    return url_for('static', filename=filename, v=source_hash)
+
 # Database configuration
 # Use PostgreSQL if DATABASE_URL is set (Vercel/Render), otherwise SQLite for local dev
 database_url = os.environ.get('DATABASE_URL')
@@ -53,23 +145,74 @@ else:
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///jdt_users.db'
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-# Database connection pool settings
-# Optimized for serverless (Vercel) - smaller pool size
+# Database connection settings, chosen explicitly with DB_POOL_MODE:
+#   vm     - long-running server: a persistent pool sized by DB_POOL_SIZE / DB_MAX_OVERFLOW
+#   pooler - behind a transaction pooler (PgBouncer, Supabase/Neon pooler URLs): no client-side
+#            pool, no pre-ping and no prepared statements; each checkout is a short-lived
+#            connection to the pooler, which owns the real Postgres connections
 is_vercel = os.environ.get('VERCEL', '') != ''
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True,
-    'pool_recycle': 300,
-    'pool_size': 1 if is_vercel else 5,  # Smaller pool for serverless
-    'max_overflow': 0 if is_vercel else 10,  # No overflow on serverless
-    'connect_args': {
-        'client_encoding': 'utf8',
-        'options': '-c statement_timeout=60000'  # 60 second timeout
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'vm').lower()
+if DB_POOL_MODE not in ('vm', 'pooler'):
+    raise RuntimeError(f"DB_POOL_MODE must be 'vm' or 'pooler', not {DB_POOL_MODE!r}")
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 60000))
+is_postgres = app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql')
+if DB_POOL_MODE == 'pooler':
+    from sqlalchemy.pool import NullPool
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'poolclass': NullPool}
+else:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': 10,  # Fail a request rather than queue behind a stuck pool
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'pool_use_lifo': True,  # Reuse hot connections so spare ones idle out after a burst
     }
-}
+if is_postgres:
+    # libpq-only connection options (SQLite rejects them)
+    connect_args = {'client_encoding': 'utf8'}
+    if DB_POOL_MODE == 'pooler':
+        # Transaction poolers reject the `options` startup parameter and hand each transaction
+        # to any server connection, so session settings and named prepared statements don't
+        # survive. Set statement_timeout on the database role instead.
+        from sqlalchemy.engine import make_url
+        if make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_dialect().driver == 'psycopg':
+            connect_args['prepare_threshold'] = None  # psycopg 3 prepares repeated queries; psycopg2 never does
+    else:
+        connect_args['options'] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] = connect_args
+
+# Per-request query instrumentation: requests over either threshold are logged with their statements.
+# Query count / DB time response headers are added in debug mode or with QUERY_STATS_HEADERS=1.
+app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', 1000))
+app.config['SLOW_REQUEST_QUERIES'] = int(os.environ.get('SLOW_REQUEST_QUERIES', 15))
+app.config['QUERY_STATS_HEADERS'] = os.environ.get('QUERY_STATS_HEADERS', '').lower() in ['1', 'true', 'yes']
+
+# Optional read replica for the read-only API endpoints (the views marked @read_replica). Their
+# SELECTs go to DATABASE_REPLICA_URL unless the client wrote within REPLICA_READ_AFTER_WRITE seconds
+# (so nobody sees their own change missing) or the replica failed within REPLICA_RETRY_SECONDS.
+database_replica_url = os.environ.get('DATABASE_REPLICA_URL', '')
+if database_replica_url.startswith('postgres://'):
+    database_replica_url = database_replica_url.replace('postgres://', 'postgresql://', 1)
+if database_replica_url:
+    app.config['SQLALCHEMY_BINDS'] = {
+        'replica': {'url': database_replica_url, **app.config['SQLALCHEMY_ENGINE_OPTIONS']}
+    }
+REPLICA_READ_AFTER_WRITE = float(os.environ.get('REPLICA_READ_AFTER_WRITE', 10))
+REPLICA_RETRY_SECONDS = float(os.environ.get('REPLICA_RETRY_SECONDS', 30))
+
+class RoutingSession(FlaskSQLAlchemySession):
+    """Session that sends SELECTs to the replica engine while a @read_replica view runs"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_app_context() and g.get('use_replica')
+                and clause is not None and getattr(clause, 'is_select', False)):
+            return self._db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
 
 # Initialize extensions
-db = SQLAlchemy(app)
-login_manager = LoginManager(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+login_manager = LoginManager(app, add_context_processor=False)  # Templates never use current_user; don't load it for every page
 login_manager.login_view = 'index'  # type: ignore[assignment]
 login_manager.login_message = 'Please log in to access this page.'
 login_manager.login_message_category = 'info'
@@ -83,7 +226,6 @@ logger = logging.getLogger(__name__)
 conversion_progress_lock = threading.Lock()
 conversion_results_lock = threading.Lock()
 file_history_lock = threading.Lock()
-credit_operation_lock = threading.Lock()  # New: Prevent race conditions in credit operations
 db_initialization_lock = threading.Lock()  # Prevent race conditions in database initialization
 
 # Store conversion progress with thread safety
@@ -95,9 +237,656 @@ file_history = {}
 MAX_TASK_AGE = timedelta(hours=1)
 task_timestamps = {}
 
+# Batch uploads: batch_id -> {'user_id', 'task_ids'} (guarded by conversion_progress_lock)
+conversion_batches = {}
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', 50))
+
+# Shared pool of conversion workers for single and batch uploads
+CONVERSION_WORKERS = int(os.environ.get('CONVERSION_WORKERS', min(4, os.cpu_count() or 1)))
+conversion_executor = ThreadPoolExecutor(max_workers=CONVERSION_WORKERS, thread_name_prefix='convert')
+
+NO_DATA_ERROR = {
+    'status': 'error',
+    'message': 'No data found in the PDF!',
+    'error_type': 'no_data',
+    'suggestion': 'This PDF may contain images or scanned content. Try using "text" extraction mode or ensure the PDF has actual text/tables.'
+}
+
+class InvalidPageRangeError(ValueError):
+    """Raised when a page range selects none of the document's pages"""
+
+def set_task_progress(task_id, data):
+    """Replace a task's progress entry (thread-safe)"""
+    with conversion_progress_lock:
+        conversion_progress[task_id] = data
+
+# ==================== Metrics ====================
+# In-process counters and histograms served by /metrics in the Prometheus text format.
+# Every worker process keeps its own values, so scrape each process separately.
+metrics_lock = threading.Lock()
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+PAGES_PER_SECOND_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (10_000, 100_000, 1_000_000, 10_000_000, 50_000_000, 100_000_000)
+ROWS_BUCKETS = (0, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+MEMORY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2000, 4000, 8000)
+
+class Histogram:
+    """Cumulative-bucket histogram (caller holds metrics_lock)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+metrics_registry = {
+    'stage_seconds': defaultdict(lambda: Histogram(SECONDS_BUCKETS)),  # stage -> histogram
+    'page_seconds': Histogram(SECONDS_BUCKETS),
+    'conversion_seconds': Histogram(SECONDS_BUCKETS),
+    'pages_per_second': Histogram(PAGES_PER_SECOND_BUCKETS),
+    'output_bytes': Histogram(BYTES_BUCKETS),
+    'table_rows': Histogram(ROWS_BUCKETS),
+    'job_peak_memory_mb': Histogram(MEMORY_BUCKETS),
+    'conversions': defaultdict(int),  # status -> count
+    'credit_operations': defaultdict(int),  # transaction_type -> count
+    'request_seconds': defaultdict(lambda: Histogram(SECONDS_BUCKETS)),  # (method, route) -> histogram
+    'requests': defaultdict(int),  # (method, route, status) -> count
+    'request_queries': defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS)),  # (method, route) -> histogram
+    'request_db_seconds': defaultdict(lambda: Histogram(SECONDS_BUCKETS)),  # (method, route) -> histogram
+    'password_hash_seconds': defaultdict(lambda: Histogram(SECONDS_BUCKETS)),  # hash/verify -> histogram
+    'password_hash_rejected': defaultdict(int),  # hash/verify -> count
+    'rate_limited': defaultdict(int),  # (group, user/ip) -> count
+    'compression_bytes': defaultdict(int),  # (encoding, original/compressed) -> bytes
+}
+conversion_jobs = {'queued': 0, 'running': 0}
+
+def count_metric(name, key, amount=1):
+    """Increment a labelled counter in the metrics registry"""
+    with metrics_lock:
+        metrics_registry[name][key] += amount
+
+# ==================== Memory accounting ====================
+# Estimated MB per selected page by extraction mode, and per MB of PDF, for admission control.
+# Starting points from benchmarks/bench_convert.py peak memory on the synthetic corpus;
+# compare with the estimated/peak columns stored on conversions to recalibrate.
+MEMORY_BASE_MB = 20
+MEMORY_PER_PAGE_MB = {'tables': 5.0, 'both': 6.0, 'text': 0.2}
+MEMORY_PER_FILE_MB = 3.0
+
+# Pages /inspect extracts (spread over the selected range) to check the text layer and time the work
+INSPECT_SAMPLE_PAGES = int(os.environ.get('INSPECT_SAMPLE_PAGES', 3))
+# Added to an inspection's ETA for building and writing the output file
+INSPECT_OUTPUT_SECONDS = 0.5
+
+def current_rss_mb():
+    """Resident set size of this process in MB (None where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def detect_memory_limit_mb():
+    """Container (cgroup) memory limit or physical memory in MB, whichever is lower; None if unknown"""
+    limits = []
+    for path in ['/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes']:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value.isdigit() and int(value) < 1 << 60:
+                limits.append(int(value) / (1024 * 1024))
+        except OSError:
+            pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    limits.append(int(line.split()[1]) / 1024)
+                    break
+    except (OSError, ValueError):
+        pass
+    return min(limits) if limits else None
+
+class MemoryMonitor:
+    """Samples process RSS while a job runs and keeps the highest rise above the starting RSS.
+
+    Conversions run as threads of one process, so jobs running at the same
+    time show up in each other's samples: the figure is an upper bound for
+    the job, exact when it runs alone.
+    """
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.baseline = current_rss_mb()
+        self.peak = self.baseline
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.baseline is not None:
+            self.thread = threading.Thread(target=self.sample, daemon=True)
+            self.thread.start()
+        return self
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            rss = current_rss_mb()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        rss = current_rss_mb()
+        if rss is not None and self.peak is not None and rss > self.peak:
+            self.peak = rss
+
+    @property
+    def peak_mb(self):
+        if self.baseline is None:
+            return None
+        return round(self.peak - self.baseline, 1)
+
+class MemoryBudget:
+    """Admission control for conversion jobs against the worker's memory budget.
+
+    Each job reserves its estimated memory before it is handed to the worker
+    pool. A job that would push the reservations past the budget waits, in
+    submission order, until running jobs release theirs. A job larger than
+    the whole budget is admitted once nothing else is running. A budget of 0
+    disables admission control.
+    """
+
+    def __init__(self, budget_mb):
+        self.budget_mb = budget_mb
+        self.reserved_mb = 0.0
+        self.admitted = 0
+        self.waiting = deque()  # (memory_mb, start)
+        self.lock = threading.Lock()
+
+    def fits(self, memory_mb):
+        return not self.budget_mb or not self.admitted or self.reserved_mb + memory_mb <= self.budget_mb
+
+    def reserve(self, memory_mb):
+        self.reserved_mb += memory_mb
+        self.admitted += 1
+
+    def admit(self, memory_mb, start, on_hold=None):
+        """Call start() now if the job fits, otherwise when enough memory is released"""
+        with self.lock:
+            if self.waiting or not self.fits(memory_mb):
+                if on_hold:
+                    on_hold()
+                self.waiting.append((memory_mb, start))
+                return
+            self.reserve(memory_mb)
+        start()
+
+    def release(self, memory_mb):
+        """Return a finished job's reservation and start the waiting jobs that now fit"""
+        ready = []
+        with self.lock:
+            self.reserved_mb -= memory_mb
+            self.admitted -= 1
+            while self.waiting and self.fits(self.waiting[0][0]):
+                waiting_mb, start = self.waiting.popleft()
+                self.reserve(waiting_mb)
+                ready.append(start)
+        for start in ready:
+            start()
+
+# Budget for the estimated memory of concurrently admitted jobs (MB); defaults to half the
+# container/physical memory, MEMORY_BUDGET_MB=0 turns admission control off
+memory_budget = MemoryBudget(float(os.environ.get('MEMORY_BUDGET_MB') or (detect_memory_limit_mb() or 0) / 2))
+
+def submit_conversion(fn, *args, memory_mb=0, task_id=None):
+    """Queue a job on the conversion workers once its estimated memory fits the budget.
+
+    Tracks queue depth and in-flight jobs for /metrics. A held-back job's
+    task (if given) is marked as queued until it is admitted.
+    """
+    future = Future()
+    with metrics_lock:
+        conversion_jobs['queued'] += 1
+
+    def run():
+        with metrics_lock:
+            conversion_jobs['queued'] -= 1
+            conversion_jobs['running'] += 1
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with metrics_lock:
+                conversion_jobs['running'] -= 1
+            memory_budget.release(memory_mb)
+
+    def hold():
+        logger.info(f"Holding back job {task_id}: needs ~{memory_mb:.0f} MB, "
+                    f"{memory_budget.reserved_mb:.0f} of {memory_budget.budget_mb:.0f} MB reserved")
+        if task_id:
+            set_task_progress(task_id, {
+                'status': 'queued',
+                'progress': 0,
+                'message': 'Waiting for server capacity...'
+            })
+
+    memory_budget.admit(memory_mb, lambda: conversion_executor.submit(run), hold)
+    return future
+
+class ConversionTimer:
+    """Wall-clock timings of one conversion, per named stage and per page"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = defaultdict(float)
+        self.pages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def summary(self):
+        """Timings for the final progress payload"""
+        total = time.perf_counter() - self.started
+        return {
+            'total_seconds': round(total, 4),
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'pages': {page_number: round(seconds, 4) for page_number, seconds in self.pages.items()},
+            'pages_per_second': round(len(self.pages) / total, 2) if self.pages and total else None
+        }
+
+    def record(self, status, row_count=0, output_bytes=None):
+        """Add this conversion to the metrics histograms"""
+        total = time.perf_counter() - self.started
+        with metrics_lock:
+            metrics_registry['conversions'][status] += 1
+            metrics_registry['conversion_seconds'].observe(total)
+            for name, seconds in self.stages.items():
+                metrics_registry['stage_seconds'][name].observe(seconds)
+            for seconds in self.pages.values():
+                metrics_registry['page_seconds'].observe(seconds)
+            if status == 'completed':
+                if self.pages and total:
+                    metrics_registry['pages_per_second'].observe(len(self.pages) / total)
+                metrics_registry['table_rows'].observe(row_count)
+                if output_bytes is not None:
+                    metrics_registry['output_bytes'].observe(output_bytes)
+
+def render_metrics():
+    """Render the metrics registry and live gauges in the Prometheus text format"""
+    lines = []
+
+    def sample(name, labels, value):
+        if labels:
+            pairs = []
+            for key, val in labels.items():
+                escaped = str(val).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                pairs.append(f'{key}="{escaped}"')
+            lines.append(f'{name}{{{",".join(pairs)}}} {value}')
+        else:
+            lines.append(f'{name} {value}')
+
+    def metric(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    def histogram(name, hist, labels=None):
+        labels = labels or {}
+        for bound, count in zip(hist.buckets, hist.counts):
+            sample(f'{name}_bucket', {**labels, 'le': bound}, count)
+        sample(f'{name}_bucket', {**labels, 'le': '+Inf'}, hist.count)
+        sample(f'{name}_sum', labels, round(hist.sum, 6))
+        sample(f'{name}_count', labels, hist.count)
+
+    with metrics_lock:
+        metric('jdt_conversion_queue_depth', 'gauge', 'Conversion jobs waiting for a worker')
+        sample('jdt_conversion_queue_depth', None, conversion_jobs['queued'])
+        metric('jdt_conversion_jobs_in_flight', 'gauge', 'Conversion jobs currently running')
+        sample('jdt_conversion_jobs_in_flight', None, conversion_jobs['running'])
+        metric('jdt_conversion_workers', 'gauge', 'Size of the conversion worker pool')
+        sample('jdt_conversion_workers', None, CONVERSION_WORKERS)
+        metric('jdt_tracked_tasks', 'gauge', 'Conversion tasks held in memory')
+        sample('jdt_tracked_tasks', None, len(conversion_progress))
+        metric('jdt_memory_budget_mb', 'gauge', 'Memory budget for admitted conversion jobs (0 = unlimited)')
+        sample('jdt_memory_budget_mb', None, memory_budget.budget_mb)
+        metric('jdt_memory_reserved_mb', 'gauge', 'Estimated memory reserved by admitted conversion jobs')
+        sample('jdt_memory_reserved_mb', None, round(memory_budget.reserved_mb, 1))
+        metric('jdt_conversion_jobs_held', 'gauge', 'Conversion jobs held back by the memory budget')
+        sample('jdt_conversion_jobs_held', None, len(memory_budget.waiting))
+        metric('jdt_process_rss_mb', 'gauge', 'Resident set size of this process')
+        sample('jdt_process_rss_mb', None, round(current_rss_mb() or 0, 1))
+
+        metric('jdt_conversions_total', 'counter', 'Finished conversions by outcome')
+        for status, count in sorted(metrics_registry['conversions'].items()):
+            sample('jdt_conversions_total', {'status': status}, count)
+
+        metric('jdt_conversion_seconds', 'histogram', 'End-to-end conversion time')
+        histogram('jdt_conversion_seconds', metrics_registry['conversion_seconds'])
+        metric('jdt_conversion_stage_seconds', 'histogram', 'Time spent per conversion stage')
+        for stage, hist in sorted(metrics_registry['stage_seconds'].items()):
+            histogram('jdt_conversion_stage_seconds', hist, {'stage': stage})
+        metric('jdt_conversion_page_seconds', 'histogram', 'Extraction time per page')
+        histogram('jdt_conversion_page_seconds', metrics_registry['page_seconds'])
+        metric('jdt_conversion_pages_per_second', 'histogram', 'Pages per second of completed conversions')
+        histogram('jdt_conversion_pages_per_second', metrics_registry['pages_per_second'])
+        metric('jdt_conversion_table_rows', 'histogram', 'Table rows per completed conversion')
+        histogram('jdt_conversion_table_rows', metrics_registry['table_rows'])
+        metric('jdt_conversion_output_bytes', 'histogram', 'Output file size of completed conversions')
+        histogram('jdt_conversion_output_bytes', metrics_registry['output_bytes'])
+        metric('jdt_conversion_peak_memory_mb', 'histogram', 'Peak RSS rise during a conversion')
+        histogram('jdt_conversion_peak_memory_mb', metrics_registry['job_peak_memory_mb'])
+
+        metric('jdt_credit_operations_total', 'counter', 'Credit ledger entries recorded by type')
+        for transaction_type, count in sorted(metrics_registry['credit_operations'].items()):
+            sample('jdt_credit_operations_total', {'type': transaction_type}, count)
+
+        metric('jdt_http_requests_total', 'counter', 'HTTP requests by route and status')
+        for (method, route, status), count in sorted(metrics_registry['requests'].items()):
+            sample('jdt_http_requests_total', {'method': method, 'route': route, 'status': status}, count)
+        metric('jdt_http_request_seconds', 'histogram', 'HTTP request latency by route')
+        for (method, route), hist in sorted(metrics_registry['request_seconds'].items()):
+            histogram('jdt_http_request_seconds', hist, {'method': method, 'route': route})
+        metric('jdt_http_request_db_queries', 'histogram', 'Database queries per request by route')
+        for (method, route), hist in sorted(metrics_registry['request_queries'].items()):
+            histogram('jdt_http_request_db_queries', hist, {'method': method, 'route': route})
+        metric('jdt_http_request_db_seconds', 'histogram', 'Database time per request by route')
+        for (method, route), hist in sorted(metrics_registry['request_db_seconds'].items()):
+            histogram('jdt_http_request_db_seconds', hist, {'method': method, 'route': route})
+
+        metric('jdt_password_hash_workers', 'gauge', 'Size of the password hashing pool')
+        sample('jdt_password_hash_workers', None, PASSWORD_HASH_WORKERS)
+        metric('jdt_password_hash_seconds', 'histogram', 'Password hash/verify time including the wait for a worker')
+        for operation, hist in sorted(metrics_registry['password_hash_seconds'].items()):
+            histogram('jdt_password_hash_seconds', hist, {'operation': operation})
+        metric('jdt_password_hash_rejected_total', 'counter', 'Password jobs rejected because the pool was full')
+        for operation, count in sorted(metrics_registry['password_hash_rejected'].items()):
+            sample('jdt_password_hash_rejected_total', {'operation': operation}, count)
+
+        metric('jdt_rate_limited_total', 'counter', 'Requests rejected by the rate limiter by endpoint group and key type')
+        for (group, scope), count in sorted(metrics_registry['rate_limited'].items()):
+            sample('jdt_rate_limited_total', {'group': group, 'scope': scope}, count)
+
+        metric('jdt_http_compression_bytes_total', 'counter', 'Bytes of compressed responses before and after compression')
+        for (encoding, stage), count in sorted(metrics_registry['compression_bytes'].items()):
+            sample('jdt_http_compression_bytes_total', {'encoding': encoding, 'stage': stage}, count)
+
+    return '\n'.join(lines) + '\n'
+
+# ==================== Query instrumentation ====================
+SQL_PARAMETER = re.compile(r"%\(\w+\)s|(?<!:):\w+|\?|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SQL_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+def fingerprint_statement(statement):
+    """Normalise a SQL statement so repeats with different values group together"""
+    statement = SQL_PARAMETER.sub('?', statement)
+    statement = SQL_VALUE_LIST.sub('(?)', statement)
+    return ' '.join(statement.split())
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    """Note the query start time on the connection, per cursor (handles nested executes)"""
+    conn.info.setdefault('query_started', {})[id(cursor)] = time.perf_counter()
+
+def count_request_query(statement, seconds):
+    """Count a query and its time against the current request, if any"""
+    if not has_request_context():
+        return  # Conversion workers and startup queries aren't attributed to a request
+
+    if 'db_queries' not in g:
+        g.db_queries = 0
+        g.db_seconds = 0.0
+        g.db_statements = {}  # fingerprint -> [count, seconds]
+    g.db_queries += 1
+    g.db_seconds += seconds
+    entry = g.db_statements.setdefault(fingerprint_statement(statement), [0, 0.0])
+    entry[0] += 1
+    entry[1] += seconds
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    """Count a finished query against the current request"""
+    count_request_query(statement, time.perf_counter() - conn.info['query_started'].pop(id(cursor)))
+
+@event.listens_for(Engine, 'handle_error')
+def record_failed_query(context):
+    """Count a query that raised (after_cursor_execute never fires for it) and drop its start time"""
+    cursor = getattr(context.execution_context, 'cursor', None)
+    if context.connection is None or cursor is None:
+        return  # Failed before a statement ran, e.g. while connecting
+    started = context.connection.info.get('query_started', {}).pop(id(cursor), None)
+    if started is not None:
+        count_request_query(context.statement or '', time.perf_counter() - started)
+
+# ==================== Password hashing ====================
+# Hashing and checking passwords is deliberately expensive CPU work. It runs on a small pool of its
+# own (hashlib releases the GIL while hashing), so a login burst uses at most PASSWORD_HASH_WORKERS
+# cores and leaves the rest to conversions and API calls. At most PASSWORD_HASH_QUEUE more jobs
+# wait for a worker; a request that can't get a slot within PASSWORD_HASH_WAIT seconds gets a 503.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 1) // 2)))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 5))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='pwhash')
+password_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+password_hash_prefix = {}  # PASSWORD_HASH_METHOD -> method/parameter prefix of the hashes it produces
+
+class PasswordHashBusy(Exception):
+    """Raised when the password hashing pool has no free slot"""
+
+def run_password_job(operation, fn, *args):
+    """Run a hashing job on the password pool and wait for its result"""
+    if not password_slots.acquire(timeout=PASSWORD_HASH_WAIT):
+        count_metric('password_hash_rejected', operation)
+        raise PasswordHashBusy()
+    try:
+        start = time.perf_counter()
+        result = password_executor.submit(fn, *args).result()
+        with metrics_lock:
+            metrics_registry['password_hash_seconds'][operation].observe(time.perf_counter() - start)
+        return result
+    finally:
+        password_slots.release()
+
+def hash_password(password):
+    """Hash a password with PASSWORD_HASH_METHOD on the password pool"""
+    return run_password_job('hash', generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+def _verify_password_job(pwhash, password):
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if PASSWORD_HASH_METHOD not in password_hash_prefix:
+        password_hash_prefix[PASSWORD_HASH_METHOD] = generate_password_hash('', PASSWORD_HASH_METHOD).split('$', 1)[0]
+    if pwhash.split('$', 1)[0] == password_hash_prefix[PASSWORD_HASH_METHOD]:
+        return True, None
+    return True, generate_password_hash(password, PASSWORD_HASH_METHOD)
+
+def verify_password(pwhash, password):
+    """Check a password on the password pool.
+
+    Returns (valid, new_hash). new_hash is set when the password is valid but
+    the stored hash uses other parameters than PASSWORD_HASH_METHOD, so the
+    caller can upgrade it.
+    """
+    return run_password_job('verify', _verify_password_job, pwhash, password)
+
+# ==================== Rate limiting ====================
+# Token buckets per client and endpoint group: a bucket holds up to `capacity` requests and refills at
+# `per_second`. Signed-in clients are keyed by their user id (read from the session cookie, so the check
+# needs no database access), everyone else by IP. Buckets live in process memory unless
+# RATE_LIMIT_STORAGE_URL points at Redis, which every worker then shares.
+# Override budgets with JSON, e.g. RATE_LIMITS='{"upload": [5, 0.05]}'.
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1').lower() in ['1', 'true', 'yes']
+DEFAULT_RATE_LIMITS = {
+    'upload': (10, 10 / 60),  # Burst of 10 conversions, then 10 a minute
+    'inspect': (20, 30 / 60),  # Re-checked as the page range and password are edited
+    'auth': (10, 5 / 60),  # Logins and sign-ups per IP: 10, then 5 a minute
+    'progress': (30, 4),  # Twice the 500 ms poller's rate
+    'credits': (20, 1),
+}
+
+def load_rate_limits(value):
+    """RATE_LIMITS from its env value; malformed overrides are logged and skipped, keeping the defaults"""
+    if not value:
+        return dict(DEFAULT_RATE_LIMITS)
+    try:
+        overrides = json.loads(value)
+        if not isinstance(overrides, dict):
+            raise ValueError('not a JSON object')
+    except ValueError as e:
+        logger.error(f"Ignoring RATE_LIMITS={value!r}: {e}")
+        return dict(DEFAULT_RATE_LIMITS)
+
+    def positive(number):
+        return isinstance(number, (int, float)) and not isinstance(number, bool) and math.isfinite(number) and number > 0
+
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for group, budget in overrides.items():
+        if group not in DEFAULT_RATE_LIMITS:
+            logger.error(f"Ignoring RATE_LIMITS for unknown group {group!r}; "
+                         f"valid groups are {', '.join(sorted(DEFAULT_RATE_LIMITS))}")
+        elif not (isinstance(budget, list) and len(budget) == 2 and all(positive(n) for n in budget)):
+            logger.error(f"Ignoring RATE_LIMITS[{group!r}]={budget!r}: expected [burst, refills per second], both positive")
+        else:
+            limits[group] = tuple(budget)
+    return limits
+
+app.config['RATE_LIMITS'] = load_rate_limits(os.environ.get('RATE_LIMITS'))
+# Endpoint -> bucket group; endpoints not listed here are not limited
+RATE_LIMIT_ENDPOINTS = {
+    'upload_file': 'upload',
+    'upload_batch': 'upload',
+    'inspect_pdf': 'inspect',
+    'login': 'auth',
+    'signup': 'auth',
+    'get_progress': 'progress',
+    'get_credits': 'credits',
+    'get_dashboard': 'credits',
+}
+
+class MemoryRateLimitBackend:
+    """Token buckets in this process's memory (each worker process limits on its own)"""
+
+    max_buckets = 100_000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}  # key -> (tokens, monotonic time of the last update)
+
+    def take(self, key, capacity, per_second):
+        """Take one token; returns 0 if allowed, otherwise seconds until a token is available"""
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * per_second)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                return (1 - tokens) / per_second
+            self.buckets[key] = (tokens - 1, now)
+            if len(self.buckets) > self.max_buckets:
+                # Forget the longest-idle half; a forgotten bucket just starts full again
+                idle = sorted(self.buckets, key=lambda k: self.buckets[k][1])
+                for stale in idle[:len(idle) // 2]:
+                    del self.buckets[stale]
+            return 0
+
+class RedisRateLimitBackend:
+    """Token buckets in Redis, shared by every worker (needs the `redis` package)"""
+
+    # Refill and take atomically on the server, using the server's clock
+    script = """
+    local capacity, per_second = tonumber(ARGV[1]), tonumber(ARGV[2])
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = math.min(capacity, (tonumber(bucket[1]) or capacity) + (now - (tonumber(bucket[2]) or now)) * per_second)
+    local wait = 0
+    if tokens < 1 then
+        wait = (1 - tokens) / per_second
+    else
+        tokens = tokens - 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / per_second * 1000))
+    return tostring(wait)
+    """
+
+    def __init__(self, url):
+        import redis  # type: ignore[import]
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.take_script = self.client.register_script(self.script)
+
+    def take(self, key, capacity, per_second):
+        """Take one token; returns 0 if allowed, otherwise seconds until a token is available"""
+        return float(self.take_script(keys=[f"jdt:ratelimit:{key}"], args=[capacity, per_second]))
+
+def make_rate_limit_backend(url):
+    """Backend for RATE_LIMIT_STORAGE_URL: Redis for redis:// URLs, process memory otherwise"""
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisRateLimitBackend(url)
+    return MemoryRateLimitBackend()
+
+rate_limit_backend = make_rate_limit_backend(os.environ.get('RATE_LIMIT_STORAGE_URL', ''))
+
+def check_rate_limit():
+    """429 response if the client has used up the budget of this endpoint's group, else None"""
+    group = RATE_LIMIT_ENDPOINTS.get(request.endpoint or '')
+    if group is None or not app.config['RATE_LIMIT_ENABLED']:
+        return None
+
+    user_id = session.get('_user_id')
+    scope, client = ('user', user_id) if user_id and group != 'auth' else ('ip', request.remote_addr)
+    capacity, per_second = app.config['RATE_LIMITS'][group]
+    try:
+        wait = rate_limit_backend.take(f"{group}:{scope}:{client}", capacity, per_second)
+    except Exception as e:
+        # A shared store being down must not take the site with it: let the request through
+        logger.warning(f"Rate limit check failed, allowing request: {e}")
+        return None
+    if not wait:
+        return None
+
+    count_metric('rate_limited', (group, scope))
+    retry_after = max(1, math.ceil(wait))
+    response = jsonify({
+        'error': 'rate_limited',
+        'message': f'Too many requests. Please wait {retry_after} seconds and try again.',
+        'retry_after': retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
 # Email validation regex
 EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
 
+# Fresh referral codes tried when inserting a user before giving up (36^8 codes, so one almost always suffices)
+REFERRAL_CODE_ATTEMPTS = 5
+
+# Credits a new account starts with
+SIGNUP_BONUS_CREDITS = 20
+# Credits awarded to the referrer for each referred signup
+REFERRAL_BONUS_CREDITS = 10
+# Most recent referrals listed by /api/referral-stats (totals come from the user's counters)
+REFERRAL_LIST_LIMIT = 100
+# Credit transactions included in /api/dashboard
+DASHBOARD_HISTORY_LIMIT = 10
+
 # Database Models
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -110,6 +899,12 @@ class User(UserMixin, db.Model):
     total_credits = db.Column(db.Integer, default=20)  # Starting credits
     used_credits = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Usage counters, updated in the same transaction as the rows they count (see reconcile_user_counters)
+    conversion_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    referral_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Credited referrals
+    referral_credits = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Bumped with every credit or counter change; versions the /api/dashboard ETag
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relationships
     referrals = db.relationship('ReferralLog', foreign_keys='ReferralLog.referrer_id', backref='referrer', lazy='dynamic')
@@ -120,8 +915,8 @@ class User(UserMixin, db.Model):
         return max(0, self.total_credits - self.used_credits)
     
     def set_password(self, password):
-        """Hash and set password"""
-        self.password = generate_password_hash(password)
+        """Hash and set password (on the calling thread; requests use hash_password)"""
+        self.password = generate_password_hash(password, PASSWORD_HASH_METHOD)
     
     def check_password(self, password):
         """Check if password matches"""
@@ -129,15 +924,9 @@ class User(UserMixin, db.Model):
     
     @staticmethod
     def generate_referral_code():
-        """Generate unique 8-character referral code"""
+        """Generate a random 8-character referral code (uniqueness is enforced on insert, see add_new_user)"""
         chars = string.ascii_uppercase + string.digits
-        max_attempts = 100
-        for _ in range(max_attempts):
-            code = ''.join(secrets.choice(chars) for _ in range(8))
-            if not User.query.filter_by(referral_code=code).first():
-                return code
-        # Fallback to UUID-based code if random generation fails
-        return uuid.uuid4().hex[:8].upper()
+        return ''.join(secrets.choice(chars) for _ in range(8))
 
 class ReferralLog(db.Model):
     __tablename__ = 'referral_logs'
@@ -147,6 +936,9 @@ class ReferralLog(db.Model):
     referee_email = db.Column(db.String(255), nullable=False)
     signup_date = db.Column(db.DateTime, default=datetime.utcnow)
     credited = db.Column(db.Boolean, default=False)
+    
+    # A referee earns their referrer a bonus once; signup's guarded insert relies on this
+    __table_args__ = (db.Index('uq_referral_logs_referrer_referee', 'referrer_id', 'referee_email', unique=True),)
 
 class Conversion(db.Model):
     __tablename__ = 'conversions'
@@ -156,6 +948,11 @@ class Conversion(db.Model):
     filename = db.Column(db.String(255), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     task_id = db.Column(db.String(100), unique=True, index=True)  # Added index
+    estimated_memory_mb = db.Column(db.Float, nullable=True)  # Admission-control estimate
+    peak_memory_mb = db.Column(db.Float, nullable=True)  # Measured peak RSS rise
+    
+    # Serves /history's keyset pagination (newest first per user)
+    __table_args__ = (db.Index('ix_conversions_user_timestamp_id', 'user_id', 'timestamp', 'id'),)
 
 class CreditTransaction(db.Model):
     __tablename__ = 'credit_transactions'
@@ -170,13 +967,124 @@ class CreditTransaction(db.Model):
     
     # Relationship
     user = db.relationship('User', backref='credit_history')
+    
+    # Serves /api/credit-history's keyset pagination (newest first per user)
+    __table_args__ = (db.Index('ix_credit_transactions_user_timestamp_id', 'user_id', 'timestamp', 'id'),)
+
+class SchemaInfo(db.Model):
+    """Schema versions (see schema_version) already created and upgraded in this database"""
+    __tablename__ = 'schema_info'
+    
+    version = db.Column(db.String(64), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Identity/credit snapshots of logged-in users, so most requests get current_user without a query.
+# Entries expire after USER_CACHE_TTL seconds (0 disables the cache) and are dropped as soon as this
+# process commits a credit change for the user. Changes made by other processes show up once the
+# entry expires; balances are enforced by the database, so a stale snapshot only affects display.
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 10))
+user_snapshot_cache = {}  # user_id -> (expires_at, column values)
+user_snapshot_versions = defaultdict(int)  # user_id -> bumped on every invalidation
+user_snapshot_lock = threading.Lock()
+
+def invalidate_user_snapshot(user_id):
+    """Drop a user's cached snapshot (call after committing changes to the user)"""
+    with user_snapshot_lock:
+        user_snapshot_cache.pop(user_id, None)
+        user_snapshot_versions[user_id] += 1
+
+def mark_user_changed(user_id):
+    """Invalidate the user's snapshot once the current transaction commits"""
+    db.session.info.setdefault('changed_users', set()).add(user_id)
+
+def increment_user_counters(user_id, **deltas):
+    """Add to a user's usage counters in the current transaction (caller must commit).
+
+    A single UPDATE with column arithmetic, so concurrent requests never lose
+    an increment and the counters commit or roll back with the rows they count.
+    """
+    from sqlalchemy import update
+
+    values = {name: getattr(User, name) + delta for name, delta in deltas.items()}
+    values['data_version'] = User.data_version + 1
+    db.session.execute(
+        update(User).where(User.id == user_id).values(**values).execution_options(synchronize_session=False)
+    )
+    mark_user_changed(user_id)
+
+# Read-your-writes for the read replica: when this process last committed a change to each user
+# (and to anyone, for views without a signed-in user). The browser that made a change also carries
+# the time in its session, which covers requests that land on other workers.
+recent_user_writes = {}  # user_id -> monotonic time of the last committed change
+replica_state = {'last_write': 0.0, 'down_until': 0.0}  # monotonic times
+replica_lock = threading.Lock()
+
+def note_user_writes(user_ids):
+    """Keep the changed users' reads on the primary for the next REPLICA_READ_AFTER_WRITE seconds"""
+    now = time.monotonic()
+    with replica_lock:
+        replica_state['last_write'] = now
+        if len(recent_user_writes) > 10000:
+            for key in [k for k, written in recent_user_writes.items() if now - written > REPLICA_READ_AFTER_WRITE]:
+                del recent_user_writes[key]
+        for user_id in user_ids:
+            recent_user_writes[user_id] = now
+    if has_request_context() and session.get('_user_id') and int(session['_user_id']) in user_ids:
+        session['_db_written_at'] = time.time()
+
+@event.listens_for(Engine, 'handle_error')
+def replica_error(context):
+    """Take a failing replica out of rotation; @read_replica reruns the view on the primary"""
+    if not (database_replica_url and has_app_context() and g.get('use_replica')):
+        return
+    if context.engine is not db.engines['replica']:
+        return
+    g.replica_failed = True
+    with replica_lock:
+        replica_state['down_until'] = time.monotonic() + REPLICA_RETRY_SECONDS
+    logger.warning(f"Read replica failed, using the primary for {REPLICA_RETRY_SECONDS:.0f}s: {context.original_exception}")
+
+@event.listens_for(SessionBase, 'after_commit')
+def invalidate_changed_users(session):
+    changed = session.info.pop('changed_users', ())
+    for user_id in changed:
+        invalidate_user_snapshot(user_id)
+    if changed and database_replica_url:
+        note_user_writes(changed)
+
+@event.listens_for(SessionBase, 'after_rollback')
+def forget_changed_users(session):
+    session.info.pop('changed_users', None)
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user from database and verify session validity"""
+    """Load the session's user: from a fresh snapshot if cached, otherwise with one query.
+
+    Flask-Login calls this at most once per request (the result is kept in
+    g._login_user). Cached users are attached to the session without a
+    SELECT, so lazy relationships and UPDATEs on them work as usual.
+    """
     try:
-        user = User.query.get(int(user_id))
-        # Additional session validation can be added here
+        user_id = int(user_id)
+        with user_snapshot_lock:
+            cached = user_snapshot_cache.get(user_id)
+            version = user_snapshot_versions[user_id]
+        if cached and cached[0] > time.monotonic():
+            user = User(**cached[1])
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+        user = db.session.get(User, user_id)
+        if user and USER_CACHE_TTL > 0:
+            snapshot = {attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs}
+            with user_snapshot_lock:
+                # Skip caching if the user changed while we were loading
+                if user_snapshot_versions[user_id] == version:
+                    now = time.monotonic()
+                    if len(user_snapshot_cache) > 10000:
+                        for key in [k for k, (expires, _) in user_snapshot_cache.items() if expires <= now]:
+                            del user_snapshot_cache[key]
+                    user_snapshot_cache[user_id] = (now + USER_CACHE_TTL, snapshot)
         return user
     except Exception as e:
         logger.error(f"Error loading user {user_id}: {e}")
@@ -186,7 +1094,7 @@ def load_user(user_id):
 def unauthorized():
     """Handle unauthorized access attempts"""
     # Check if request is AJAX/API call
-    if request.is_json or request.path.startswith('/api/') or request.path.startswith('/upload') or request.path.startswith('/download') or request.path.startswith('/progress') or request.path.startswith('/preview'):
+    if request.is_json or request.path.startswith('/api/') or request.path.startswith('/upload') or request.path.startswith('/inspect') or request.path.startswith('/download') or request.path.startswith('/progress') or request.path.startswith('/preview'):
         logger.warning(f"Unauthorized API access attempt: {request.path} from {request.remote_addr}")
         return jsonify({
             'error': 'unauthorized',
@@ -205,18 +1113,165 @@ _db_initialized = False
 
 # Defer database initialization to avoid import-time failures
 # This allows the app to import successfully even if database is temporarily unavailable
-def _init_database():
-    """Initialize database tables - called lazily"""
+# Columns added after tables already exist in deployed databases: create_all() only
+# creates missing tables, so these are added with ALTER TABLE at startup (indexes declared
+# on the models are created the same way)
+SCHEMA_UPGRADES = [
+    ('conversions', 'estimated_memory_mb', 'FLOAT'),
+    ('conversions', 'peak_memory_mb', 'FLOAT'),
+    ('users', 'conversion_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('users', 'referral_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('users', 'referral_credits', 'INTEGER NOT NULL DEFAULT 0'),
+    ('users', 'data_version', 'INTEGER NOT NULL DEFAULT 0'),
+]
+
+# Denormalized User counters; adding any of them to an existing database triggers a backfill
+USER_COUNTER_COLUMNS = {'conversion_count', 'referral_count', 'referral_credits'}
+
+# Cold-start mode (default on Vercel): nothing touches the database at import time; the schema is
+# checked on the first request that needs it. Setting SCHEMA_VERSION to the value logged by (or
+# printed by `flask init-db` for) the deployed schema skips the check entirely.
+COLD_START_MODE = os.environ.get('COLD_START_MODE', '1' if is_vercel else '').lower() in ['1', 'true', 'yes']
+DEPLOYED_SCHEMA_VERSION = os.environ.get('SCHEMA_VERSION', '')
+# Endpoints that never query the database, so serving them doesn't trigger initialization
+DB_FREE_ENDPOINTS = {'static', 'index', 'get_metrics', 'admin_test', 'test_endpoint'}
+
+def schema_version():
+    """Fingerprint of the models' tables, columns and indexes plus SCHEMA_UPGRADES"""
+    import hashlib
+
+    parts = [repr(SCHEMA_UPGRADES)]
+    for table in db.metadata.sorted_tables:
+        parts.append(table.name)
+        parts += [f"{column.name} {column.type} {column.nullable}" for column in table.columns]
+        parts += sorted(
+            f"{index.name} {[column.name for column in index.columns]} {index.unique}" for index in table.indexes
+        )
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:16]
+
+def _schema_is_current(version):
+    """Whether this schema version was already applied (one primary-key lookup)"""
+    try:
+        return db.session.get(SchemaInfo, version) is not None
+    except Exception:
+        # schema_info doesn't exist yet
+        db.session.rollback()
+        return False
+
+def _upgrade_schema():
+    """Add SCHEMA_UPGRADES columns and model indexes missing from existing tables; returns the columns added"""
+    from sqlalchemy import inspect, text
+
+    added = []
+    for table, column, column_type in SCHEMA_UPGRADES:
+        existing = {c['name'] for c in inspect(db.engine).get_columns(table)}
+        if column in existing:
+            continue
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+            added.append((table, column))
+            logger.info(f"Added column {table}.{column}")
+        except Exception as e:
+            # Another worker may have added it first
+            if column not in {c['name'] for c in inspect(db.engine).get_columns(table)}:
+                raise
+            logger.info(f"Column {table}.{column} already added: {e}")
+    
+    for table in db.metadata.sorted_tables:
+        existing = {i['name'] for i in inspect(db.engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind=db.engine)
+                logger.info(f"Created index {index.name}")
+            except Exception as e:
+                if index.name in {i['name'] for i in inspect(db.engine).get_indexes(table.name)}:
+                    logger.info(f"Index {index.name} already created: {e}")
+                elif index.unique:
+                    # Existing duplicate rows; the app still works, the constraint just isn't enforced yet
+                    logger.error(f"Could not create unique index {index.name}, remove duplicates and restart: {e}")
+                else:
+                    raise
+    return added
+
+def reconcile_user_counters(batch_size=1000):
+    """Recompute the User usage counters from the rows they count and repair any drift.
+
+    One set-based UPDATE per id range, touching only users whose stored
+    counters differ, so it is cheap to run regularly. A user whose counters
+    change while their range is being processed may need a second run to
+    settle. Returns the number of users repaired.
+    """
+    from sqlalchemy import func, or_, select, update
+
+    conversions = select(func.count(Conversion.id)).where(Conversion.user_id == User.id).scalar_subquery()
+    referrals = select(func.count(ReferralLog.id)).where(
+        ReferralLog.referrer_id == User.id, ReferralLog.credited.is_(True)
+    ).scalar_subquery()
+    counters = {
+        'conversion_count': conversions,
+        'referral_count': referrals,
+        'referral_credits': referrals * REFERRAL_BONUS_CREDITS,
+    }
+
+    max_id = db.session.query(func.max(User.id)).scalar() or 0
+    repaired = 0
+    for start in range(0, max_id + 1, batch_size):
+        statement = (
+            update(User)
+            .where(
+                User.id >= start,
+                User.id < start + batch_size,
+                or_(*(getattr(User, name) != value for name, value in counters.items()))
+            )
+            .values(**counters, data_version=User.data_version + 1)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            user_ids = db.session.execute(statement).scalars().all()
+            for user_id in user_ids:
+                mark_user_changed(user_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        repaired += len(user_ids)
+
+    if repaired:
+        logger.warning(f"Repaired usage counters of {repaired} users")
+    return repaired
+
+def _init_database(force=False):
+    """Initialize database tables - called lazily (force re-runs create/upgrade even for a known schema)"""
     global _db_initialized
-    if _db_initialized:
+    if _db_initialized and not force:
         return
     
     try:
         with app.app_context():
             try:
+                version = schema_version()
+                if not force and (DEPLOYED_SCHEMA_VERSION == version or _schema_is_current(version)):
+                    _db_initialized = True
+                    logger.info(f"Database schema {version} is current")
+                    return
+                
                 db.create_all()
+                added = _upgrade_schema()
+                if any(table == 'users' and column in USER_COUNTER_COLUMNS for table, column in added):
+                    repaired = reconcile_user_counters()
+                    logger.info(f"Backfilled usage counters for {repaired} users")
+                try:
+                    db.session.add(SchemaInfo(version=version))  # type: ignore[call-arg]
+                    db.session.commit()
+                except Exception:
+                    # Recorded by another worker at the same time
+                    db.session.rollback()
                 _db_initialized = True
-                logger.info("Database tables initialized successfully")
+                logger.info(f"Database tables initialized successfully (schema {version})")
             except Exception as e:
                 # Log as ERROR for monitoring/alerting
                 logger.error(f"Database initialization failed: {e}", exc_info=True)
@@ -226,10 +1281,11 @@ def _init_database():
         logger.error(f"App context initialization failed: {e}", exc_info=True)
 
 # Try to initialize, but don't fail if it doesn't work
-try:
-    _init_database()
-except Exception as e:
-    logger.warning(f"Database initialization deferred: {e}")
+if not COLD_START_MODE:
+    try:
+        _init_database()
+    except Exception as e:
+        logger.warning(f"Database initialization deferred: {e}")
 
 # Helper function to log credit transactions
 def log_credit_transaction(user, amount, transaction_type, description):
@@ -244,11 +1300,252 @@ def log_credit_transaction(user, amount, transaction_type, description):
             balance_after=balance_after
         )
         db.session.add(transaction)
+        user.data_version = User.data_version + 1  # Incremented in SQL, so concurrent writers can't lose a bump
+        mark_user_changed(user.id)
+        count_metric('credit_operations', transaction_type)
         logger.info(f"Credit transaction logged: {user.email} - {amount} - {transaction_type}")
     except Exception as e:
         logger.error(f"Failed to log credit transaction: {e}")
         raise  # Re-raise so caller can handle rollback
 
+def charge_credits(user_id, amount, transaction_type, description):
+    """Atomically move credits between a user's available and used balance and log it.
+
+    A positive amount charges, a negative one refunds. The conditional
+    UPDATE ... RETURNING only matches while the balance covers the charge
+    (or the refund leaves used credits >= 0), and the ledger entry is written
+    in the same transaction, so concurrent requests in any worker process can
+    neither overdraw nor lose an update. Commits and returns the new
+    available balance, or rolls back and returns None if the row didn't match.
+    """
+    from sqlalchemy import update
+
+    if amount > 0:
+        condition = User.total_credits - User.used_credits >= amount
+    else:
+        condition = User.used_credits >= -amount
+
+    statement = (
+        update(User)
+        .where(User.id == user_id, condition)
+        .values(used_credits=User.used_credits + amount, data_version=User.data_version + 1)
+        .returning(User.total_credits, User.used_credits)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        row = db.session.execute(statement).first()
+        if row is None:
+            db.session.rollback()
+            return None
+
+        balance_after = max(0, row.total_credits - row.used_credits)
+        db.session.add(CreditTransaction(  # type: ignore[call-arg]
+            user_id=user_id,
+            amount=-amount,
+            transaction_type=transaction_type,
+            description=description,
+            balance_after=balance_after
+        ))
+        mark_user_changed(user_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    count_metric('credit_operations', transaction_type)
+    # Loaded User objects hold the old balance; the commit expired them, so they reload on next access
+    return balance_after
+
+# Users updated per statement/commit by grant_credits
+GRANT_BATCH_SIZE = int(os.environ.get('GRANT_BATCH_SIZE', 1000))
+# Unknown emails listed in a grant summary (the rest are only counted)
+GRANT_NOT_FOUND_LIMIT = 100
+
+def grant_credits(grants=None, credits=0, batch_size=GRANT_BATCH_SIZE):
+    """Add credits to many users with set-based SQL and return a summary.
+
+    grants maps email -> credits; without it every user gets `credits`. Each
+    batch is one UPDATE ... RETURNING over up to batch_size users (grants are
+    grouped by amount) plus one bulk ledger INSERT, committed together, so
+    memory stays flat however many users there are. Batches commit
+    independently: if one fails, the summary's users_updated says how far the
+    grant got and 'error' is set.
+    """
+    from sqlalchemy import insert, update
+
+    summary = {'users_updated': 0, 'credits_granted': 0, 'batches': 0, 'not_found_count': 0, 'not_found': []}
+
+    def apply_batch(amount, condition):
+        statement = (
+            update(User)
+            .where(condition)
+            .values(total_credits=User.total_credits + amount, data_version=User.data_version + 1)
+            .returning(User.id, User.email, User.total_credits, User.used_credits)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            rows = db.session.execute(statement).all()
+            if rows:
+                db.session.execute(insert(CreditTransaction), [{
+                    'user_id': row.id,
+                    'amount': amount,
+                    'transaction_type': 'purchase',
+                    'description': f'Admin credit purchase - {amount} credits',
+                    'balance_after': max(0, row.total_credits - row.used_credits)
+                } for row in rows])
+                for row in rows:
+                    mark_user_changed(row.id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        summary['users_updated'] += len(rows)
+        summary['credits_granted'] += amount * len(rows)
+        summary['batches'] += 1
+        count_metric('credit_operations', 'purchase', len(rows))
+        return rows
+
+    try:
+        if grants is None:
+            from sqlalchemy import func
+            max_id = db.session.query(func.max(User.id)).scalar() or 0
+            for start in range(0, max_id + 1, batch_size):
+                apply_batch(credits, User.id.between(start, start + batch_size - 1))
+        else:
+            by_amount = defaultdict(list)
+            for email, amount in grants.items():
+                by_amount[amount].append(email)
+            for amount, emails in by_amount.items():
+                for start in range(0, len(emails), batch_size):
+                    chunk = emails[start:start + batch_size]
+                    found = {row.email for row in apply_batch(amount, User.email.in_(chunk))}
+                    missing = [email for email in chunk if email not in found]
+                    summary['not_found_count'] += len(missing)
+                    room = GRANT_NOT_FOUND_LIMIT - len(summary['not_found'])
+                    summary['not_found'].extend(missing[:max(0, room)])
+    except Exception as e:
+        logger.error(f"Credit grant failed after {summary['users_updated']} users: {e}", exc_info=True)
+        summary['error'] = str(e)
+
+    logger.info(f"Granted {summary['credits_granted']} credits to {summary['users_updated']} users "
+                f"in {summary['batches']} batches")
+    return summary
+
+def parse_credit_grants(data):
+    """Collect email -> credits grants from an admin request body.
+
+    Accepts 'emails' (a list, all granted 'credits') and/or 'csv' (lines of
+    'email[,credits]', where a missing amount falls back to 'credits'). Emails are
+    lowercased; repeated emails add up. Raises ValueError on malformed input.
+    """
+    default = data.get('credits', 0)
+    entries = [(email, default) for email in data.get('emails') or []]
+    for line_number, row in enumerate(csv.reader(io.StringIO(data.get('csv') or '')), start=1):
+        if not row or not row[0].strip() or row[0].strip().startswith('#'):
+            continue
+        if line_number == 1 and row[0].strip().lower() == 'email':
+            continue  # Header row
+        amount = row[1].strip() if len(row) > 1 and row[1].strip() else default
+        try:
+            amount = int(amount)
+        except (TypeError, ValueError):
+            raise ValueError(f"Line {line_number}: invalid credits amount {amount!r}")
+        entries.append((row[0], amount))
+
+    grants = defaultdict(int)
+    for email, amount in entries:
+        email = str(email).strip().lower()
+        if not validate_email(email):
+            raise ValueError(f"Invalid email: {email}")
+        if not isinstance(amount, int) or isinstance(amount, bool) or amount == 0:
+            raise ValueError(f"Invalid credits amount for {email}")
+        grants[email] += amount
+    return {email: amount for email, amount in grants.items() if amount}
+
+def add_new_user(user):
+    """Insert a new user with a fresh referral code, without looking codes up first (caller must commit).
+
+    The INSERT must be the transaction's first write. If the referral_code
+    unique constraint rejects it, the whole transaction is rolled back and
+    the INSERT retried with a new code. (A savepoint can't scope the retry:
+    pysqlite opens no transaction before a SAVEPOINT, so releasing it would
+    commit the user on its own.) Other integrity errors (e.g. a concurrent
+    signup with the same email) are re-raised.
+    """
+    from sqlalchemy.exc import IntegrityError
+
+    for _ in range(REFERRAL_CODE_ATTEMPTS):
+        user.referral_code = User.generate_referral_code()
+        db.session.add(user)
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            if 'referral_code' not in str(e.orig):
+                raise
+            db.session.rollback()
+            logger.warning(f"Referral code collision on {user.referral_code}, retrying")
+            continue
+        return user
+    raise RuntimeError(f"No free referral code after {REFERRAL_CODE_ATTEMPTS} attempts")
+
+def award_referral(referral_code, referee_id, referee_email):
+    """Credit the owner of referral_code for a new signup, in the current transaction (caller must commit).
+
+    The referrer is resolved inside a single INSERT ... SELECT into
+    referral_logs, which does nothing if (referrer, referee) is already logged,
+    so no pre-check is needed and concurrent signups can't award twice. Then
+    one UPDATE credits the referrer. Returns the ledger row for the bonus, or
+    None if the code matches nobody (or the referral was already logged).
+    """
+    from sqlalchemy import literal, select, update
+
+    source = select(
+        User.id, literal(referee_email), literal(True), literal(datetime.utcnow())
+    ).where(User.referral_code == referral_code, User.id != referee_id)
+    columns = ['referrer_id', 'referee_email', 'credited', 'signup_date']
+
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(ReferralLog).from_select(columns, source).on_conflict_do_nothing()
+        referrer_id = db.session.execute(statement.returning(ReferralLog.referrer_id)).scalar()
+    else:
+        from sqlalchemy import insert
+        from sqlalchemy.exc import IntegrityError
+        try:
+            with db.session.begin_nested():
+                referrer_id = db.session.execute(
+                    insert(ReferralLog).from_select(columns, source).returning(ReferralLog.referrer_id)
+                ).scalar()
+        except IntegrityError:
+            referrer_id = None
+    if referrer_id is None:
+        return None
+
+    row = db.session.execute(
+        update(User)
+        .where(User.id == referrer_id)
+        .values(
+            total_credits=User.total_credits + REFERRAL_BONUS_CREDITS,
+            referral_count=User.referral_count + 1,
+            referral_credits=User.referral_credits + REFERRAL_BONUS_CREDITS,
+            data_version=User.data_version + 1
+        )
+        .returning(User.total_credits, User.used_credits)
+        .execution_options(synchronize_session=False)
+    ).one()
+    mark_user_changed(referrer_id)
+    return {
+        'user_id': referrer_id,
+        'amount': REFERRAL_BONUS_CREDITS,
+        'transaction_type': 'referral',
+        'description': f'Referral bonus from {referee_email}',
+        'balance_after': max(0, row.total_credits - row.used_credits)
+    }
+
 def validate_email(email):
     """Validate email format"""
     if not email or len(email) > 255:
@@ -262,6 +1559,69 @@ def safe_file_path(base_dir, filename):
     real_path = os.path.realpath(filepath)
     return real_path.startswith(real_base) and os.path.dirname(real_path) == real_base
 
+def validate_pdf_upload(file):
+    """Validate an uploaded PDF; returns an error message or None if valid"""
+    if file.filename == '' or file.filename is None:
+        return 'No file selected'
+
+    if not file.filename.lower().endswith('.pdf'):
+        return 'Please upload a PDF file'
+
+    # Validate MIME type
+    if file.content_type and file.content_type not in ['application/pdf', 'application/x-pdf']:
+        return 'Invalid file type. Please upload a PDF file'
+
+    # Validate file size on backend (50MB limit)
+    file.seek(0, 2)  # Seek to end
+    file_size = file.tell()
+    file.seek(0)  # Reset to beginning
+    if file_size > 50 * 1024 * 1024:
+        return 'File size exceeds 50MB limit'
+
+    if file_size == 0:
+        return 'File is empty'
+
+    return None
+
+def save_pdf_upload(file):
+    """Save an uploaded PDF to the upload folder; returns (filename, filepath) or (None, None) if unsafe"""
+    from werkzeug.utils import secure_filename
+
+    filename = secure_filename(file.filename or '')
+    if not filename:
+        filename = 'uploaded.pdf'
+
+    temp_filename = f"{uuid.uuid4().hex}_{filename}"
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
+
+    # Verify path safety
+    if not safe_file_path(app.config['UPLOAD_FOLDER'], temp_filename):
+        return None, None
+
+    file.save(filepath)
+    return filename, filepath
+
+def user_owns_task(task_id, user_id):
+    """Check that a conversion task or batch belongs to the given user"""
+    with conversion_progress_lock:
+        batch = conversion_batches.get(task_id)
+    if batch is not None:
+        return batch['user_id'] == user_id
+    return Conversion.query.filter_by(task_id=task_id, user_id=user_id).first() is not None
+
+def get_conversion_options(form):
+    """Read conversion options from the upload form"""
+    return {
+        'page_range': form.get('page_range', 'all'),
+        'extract_mode': form.get('extract_mode', 'tables'),
+        'merge_tables': form.get('merge_tables') == 'true',
+        'include_headers': form.get('include_headers') == 'true',
+        'clean_data': form.get('clean_data') == 'true',
+        'password': form.get('password', ''),
+        'output_format': form.get('output_format', 'xlsx'),
+        'text_rows': form.get('text_rows', 'pages')
+    }
+
 from functools import wraps
 
 def require_active_session(f):
@@ -271,7 +1631,7 @@ def require_active_session(f):
         # Check if user is authenticated
         if not current_user.is_authenticated:
             logger.warning(f"Unauthenticated access attempt to {request.path} from {request.remote_addr}")
-            if request.is_json or request.path.startswith('/api/') or request.path.startswith('/upload'):
+            if request.is_json or request.path.startswith('/api/') or request.path.startswith('/upload') or request.path.startswith('/inspect'):
                 return jsonify({
                     'error': 'unauthorized',
                     'message': 'You must be logged in to access this resource.',
@@ -282,8 +1642,8 @@ def require_active_session(f):
         
         # Additional session validation
         try:
-            # Verify user still exists in database (not deleted)
-            user = User.query.get(current_user.id)
+            # Verify user still exists (load_user returns None for deleted users; this hits the identity map)
+            user = db.session.get(User, current_user.id)
             if not user:
                 logger.warning(f"Session for deleted user {current_user.id} detected")
                 logout_user()
@@ -310,6 +1670,107 @@ def require_active_session(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def use_replica_for_request():
+    """True if this request's reads may go to the replica: it is configured, healthy, and the
+    client (or, without a signed-in user, anyone in this process) hasn't written recently."""
+    if not database_replica_url:
+        return False
+    now = time.monotonic()
+    user_id = session.get('_user_id')
+    with replica_lock:
+        if replica_state['down_until'] > now:
+            return False
+        last_write = recent_user_writes.get(int(user_id), 0.0) if user_id else replica_state['last_write']
+    if now - last_write < REPLICA_READ_AFTER_WRITE:
+        return False
+    return time.time() - session.get('_db_written_at', 0) >= REPLICA_READ_AFTER_WRITE
+
+def read_replica(f):
+    """Run a read-only view with its SELECTs on the read replica when use_replica_for_request().
+
+    If a replica statement fails (the view may catch the error itself), the
+    replica is skipped for REPLICA_RETRY_SECONDS and the view runs again on
+    the primary. The user loader runs before the view, so current_user and
+    its cached snapshot always come from the primary.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not use_replica_for_request():
+            return f(*args, **kwargs)
+        g.use_replica = True
+        try:
+            response = f(*args, **kwargs)
+        except Exception:
+            if not g.get('replica_failed'):
+                raise
+        finally:
+            g.use_replica = False
+        if not g.pop('replica_failed', False):
+            return response
+        db.session.rollback()
+        return f(*args, **kwargs)
+    return decorated_function
+
+# Largest gap (PDF points) between matching column edges of table fragments on consecutive pages
+TABLE_STITCH_TOLERANCE = 3.0
+
+class PageTable(list):
+    """Rows of one table found on a page, plus the x positions of its column edges"""
+
+    def __init__(self, rows, column_edges):
+        super().__init__(rows)
+        self.column_edges = column_edges
+
+class TableStitcher:
+    """Joins table fragments that continue across page breaks, one fragment at a time.
+
+    A fragment continues the open table when it is the first table on the page
+    right after the open table's page and has the same columns: the same cell
+    count and column edges within TABLE_STITCH_TOLERANCE points. A first row
+    repeating the open table's first row (a header printed on every page) is
+    dropped and the remaining rows are appended to the open table. Anything
+    else closes the open table and starts a new one, so only one table's rows
+    are held here at a time.
+    """
+
+    def __init__(self):
+        self.rows = None
+        self.column_edges = None
+        self.page_number = None
+
+    @staticmethod
+    def row_key(row):
+        return tuple(' '.join((cell or '').split()) for cell in row)
+
+    def continues(self, table, page_number, first_on_page):
+        edges = getattr(table, 'column_edges', None)
+        return (
+            self.rows is not None and first_on_page and edges is not None
+            and page_number == self.page_number + 1
+            and len(table[0]) == len(self.rows[0])
+            and len(edges) == len(self.column_edges)
+            and all(abs(a - b) <= TABLE_STITCH_TOLERANCE for a, b in zip(edges, self.column_edges))
+        )
+
+    def add(self, table, page_number, first_on_page):
+        """Take the next fragment; returns the tables (row lists) this closed, if any"""
+        if self.continues(table, page_number, first_on_page):
+            rows = table[1:] if self.row_key(table[0]) == self.row_key(self.rows[0]) else table
+            self.rows.extend(rows)
+            self.page_number = page_number
+            return []
+        closed = self.finish()
+        self.rows = list(table)
+        self.column_edges = getattr(table, 'column_edges', None)
+        self.page_number = page_number
+        return closed
+
+    def finish(self):
+        """Close the open table; returns it as a one-item list (empty if none is open)"""
+        closed = [self.rows] if self.rows is not None else []
+        self.rows = None
+        return closed
+
 class PDFConverter:
     @staticmethod
     def parse_page_range(page_range_str, total_pages):
@@ -382,284 +1843,978 @@ class PDFConverter:
         df = df.apply(lambda x: x.astype(str).str.strip() if x.dtype == 'object' else x)
         
         return df
-    
     @staticmethod
-    def convert_pdf(pdf_path, options, task_id):
-        """Convert PDF to Excel/CSV with advanced options"""
+    def table_to_dataframe(table, options, timer=None):
+        """Build a DataFrame from a raw extracted table, applying header/clean options"""
+        import pandas as pd
+
+        timer = timer or ConversionTimer()
+
+        with timer.stage('dataframe'):
+            # Check if first row should be header
+            if options.get('include_headers', True) and len(table) > 1:
+                headers = PDFConverter.deduplicate_headers(table[0])
+                df = pd.DataFrame(table[1:], columns=headers)  # type: ignore[arg-type]
+            else:
+                df = pd.DataFrame(table)
+
+        # Clean data if option is enabled
+        if options.get('clean_data', True):
+            with timer.stage('clean_dataframe'):
+                df = PDFConverter.clean_dataframe(df)
+
+        return df
+
+    @staticmethod
+    def extract_page(page, extract_mode):
+        """Extract raw tables and/or text from one page.
+
+        When the page has tables, its characters are indexed once by vertical
+        midpoint and table cells are read from that index, instead of
+        pdfplumber re-scanning every character on the page for each table row
+        (building the index costs less than one such scan). The text is still
+        page.extract_text(): the only thing it shares with the tables is
+        page.chars, which pdfplumber caches per page anyway. Output matches
+        page.extract_tables() and page.extract_text().
+
+        Returns (tables, text); tables is a list of PageTable row lists, text may be None.
+        """
+        from bisect import bisect_left
+        from pdfplumber.table import TableFinder, TableSettings
+        from pdfplumber.utils import extract_text
+
+        tables = []
+        text = None
+        chars = page.chars
+
+        if extract_mode in ["tables", "both"]:
+            settings = TableSettings.resolve(None)
+            text_settings = settings.text_settings or {}
+            found = TableFinder(page, settings).tables
+
+            if found:
+                # Char midpoints and a vertical index, built once per page for all its tables
+                v_mids = [(char["top"] + char["bottom"]) / 2 for char in chars]
+                h_mids = [(char["x0"] + char["x1"]) / 2 for char in chars]
+                by_v_mid = sorted(range(len(chars)), key=v_mids.__getitem__)
+                sorted_v_mids = [v_mids[i] for i in by_v_mid]
+
+                def chars_in_bbox(indices, bbox):
+                    x0, top, x1, bottom = bbox
+                    return [i for i in indices if x0 <= h_mids[i] < x1 and top <= v_mids[i] < bottom]
+
+                for table in found:
+                    rows = []
+                    column_edges = sorted({x for row in table.rows for cell in row.cells if cell is not None for x in (cell[0], cell[2])})
+                    for row in table.rows:
+                        x0, top, x1, bottom = row.bbox
+                        # Keep page order so word clustering sees chars exactly as pdfplumber does
+                        candidates = by_v_mid[bisect_left(sorted_v_mids, top):bisect_left(sorted_v_mids, bottom)]
+                        row_indices = sorted(chars_in_bbox(candidates, row.bbox))
+
+                        cells = []
+                        for cell in row.cells:
+                            if cell is None:
+                                cells.append(None)
+                                continue
+                            cell_chars = [chars[i] for i in chars_in_bbox(row_indices, cell)]
+                            if cell_chars:
+                                cells.append(extract_text(cell_chars, x_shift=cell[0], y_shift=cell[1], **text_settings))
+                            else:
+                                cells.append("")
+                        rows.append(cells)
+                    tables.append(PageTable(rows, column_edges))
+
+        if extract_mode in ["text", "both"]:
+            text = page.extract_text()
+
+        return tables, text
+
+    @staticmethod
+    def extract_pdf(pdf_path, options, task_id, timer=None):
+        """Extract tables and text from the requested pages of a PDF.
+
+        Returns a dict with 'tables', 'text' and 'total_pages'. Text-only
+        extraction goes through the pdfminer text engine. Raises
+        InvalidPageRangeError when the page range selects nothing; PDF/IO errors
+        propagate to the caller. Stage and page timings are added to ``timer``.
+        """
+        import pdfplumber
+
+        timer = timer or ConversionTimer()
+
+        if options.get('extract_mode', 'tables') == 'text':
+            all_text = [
+                {'Page': page_number, 'Text': text}
+                for page_number, text in PDFConverter.iter_text_pages(pdf_path, options, task_id, timer)
+                if text
+            ]
+            return {'tables': [], 'text': all_text, 'total_pages': None}
+
+        password = options.get('password', '').strip() or None
+
+        # Open PDF with optional password
+        set_task_progress(task_id, {'status': 'processing', 'progress': 20, 'message': 'Opening PDF...'})
+
+        with pdfplumber.open(pdf_path, password=password) as pdf:
+            with timer.stage('open'):
+                total_pages = len(pdf.pages)
+
+            # Parse page range
+            page_range_str = options.get('page_range', 'all')
+            pages_to_extract = PDFConverter.parse_page_range(page_range_str, total_pages)
+
+            if not pages_to_extract:
+                raise InvalidPageRangeError(page_range_str)
+
+            all_tables = []
+            all_text = []
+            extract_mode = options.get('extract_mode', 'tables')
+            # Merged output stitches fragments as pages are read instead of concatenating at the end
+            stitcher = TableStitcher() if options.get('merge_tables', False) else None
+
+            # Extract data based on mode
+            set_task_progress(task_id, {
+                'status': 'processing',
+                'progress': 30,
+                'message': f'Extracting data from {len(pages_to_extract)} pages...'
+            })
+
+            progress_increment = 50 / len(pages_to_extract)
+            current_progress = 30
+
+            for page_idx in pages_to_extract:
+                page_started = time.perf_counter()
+                page = pdf.pages[page_idx]
+                with timer.stage('layout'):
+                    page.chars
+                with timer.stage('extract'):
+                    tables, text = PDFConverter.extract_page(page, extract_mode)
+
+                # Extract tables
+                for table_index, table in enumerate(tables):
+                    if not table:
+                        continue
+                    if stitcher:
+                        with timer.stage('merge'):
+                            finished = stitcher.add(table, page_idx + 1, table_index == 0)
+                    else:
+                        finished = [table]
+                    for finished_table in finished:
+                        df = PDFConverter.table_to_dataframe(finished_table, options, timer)
+                        if not df.empty:
+                            all_tables.append(df)
+
+                # Extract text
+                if text:
+                    all_text.append({
+                        'Page': page_idx + 1,
+                        'Text': text
+                    })
+                timer.pages[page_idx + 1] = time.perf_counter() - page_started
+
+                current_progress += progress_increment
+                set_task_progress(task_id, {
+                    'status': 'processing',
+                    'progress': min(80, int(current_progress)),
+                    'message': f'Processing page {page_idx + 1} of {total_pages}...'
+                })
+
+            for finished_table in stitcher.finish() if stitcher else []:
+                df = PDFConverter.table_to_dataframe(finished_table, options, timer)
+                if not df.empty:
+                    all_tables.append(df)
+
+        return {'tables': all_tables, 'text': all_text, 'total_pages': total_pages}
+
+    @staticmethod
+    def iter_text_pages(pdf_path, options, task_id, timer=None):
+        """Yield (page_number, text) for the requested pages using pdfminer directly.
+
+        Text-only conversions don't need pdfplumber's object model: each page is
+        interpreted and laid out by pdfminer (tunable via TEXT_LAPARAMS) and its
+        text yielded before the next page is parsed, so only one page is held
+        in memory.
+        """
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.layout import LAParams, LTTextContainer
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+
+        password = options.get('password', '').strip()
+        timer = timer or ConversionTimer()
+
+        # Open PDF with optional password
+        set_task_progress(task_id, {'status': 'processing', 'progress': 20, 'message': 'Opening PDF...'})
+
+        with open(pdf_path, 'rb') as fp:
+            with timer.stage('open'):
+                document = PDFDocument(PDFParser(fp), password=password)
+                pages = list(PDFPage.create_pages(document))
+                total_pages = len(pages)
+
+            page_range_str = options.get('page_range', 'all')
+            pages_to_extract = PDFConverter.parse_page_range(page_range_str, total_pages)
+            if not pages_to_extract:
+                raise InvalidPageRangeError(page_range_str)
+
+            set_task_progress(task_id, {
+                'status': 'processing',
+                'progress': 30,
+                'message': f'Extracting text from {len(pages_to_extract)} pages...'
+            })
+
+            resource_manager = PDFResourceManager(caching=True)
+            device = PDFPageAggregator(resource_manager, laparams=LAParams(**app.config['TEXT_LAPARAMS']))
+            interpreter = PDFPageInterpreter(resource_manager, device)
+
+            progress_increment = 50 / len(pages_to_extract)
+            current_progress = 30
+
+            for page_idx in pages_to_extract:
+                with timer.stage('extract'):
+                    page_started = time.perf_counter()
+                    interpreter.process_page(pages[page_idx])
+                    layout = device.get_result()
+                    text = ''.join(obj.get_text() for obj in layout if isinstance(obj, LTTextContainer)).strip()
+                    timer.pages[page_idx + 1] = time.perf_counter() - page_started
+
+                current_progress += progress_increment
+                set_task_progress(task_id, {
+                    'status': 'processing',
+                    'progress': min(80, int(current_progress)),
+                    'message': f'Processing page {page_idx + 1} of {total_pages}...'
+                })
+
+                yield page_idx + 1, text
+
+    @staticmethod
+    def text_rows(page_number, text, options):
+        """Output rows for one page of text: one row per page, or one per line if text_rows == 'lines'"""
+        if options.get('text_rows') == 'lines':
+            lines = [line.strip() for line in text.splitlines() if line.strip()]
+            return [[page_number, line_number, line] for line_number, line in enumerate(lines, 1)]
+        return [[page_number, text]]
+
+    @staticmethod
+    def text_columns(options):
+        """Column headers matching text_rows()"""
+        return ['Page', 'Line', 'Text'] if options.get('text_rows') == 'lines' else ['Page', 'Text']
+
+    @staticmethod
+    def text_dataframe(all_text, options):
+        """Build the extracted-text sheet from buffered {'Page', 'Text'} entries"""
+        import pandas as pd
+        rows = [row for entry in all_text for row in PDFConverter.text_rows(entry['Page'], entry['Text'], options)]
+        return pd.DataFrame(rows, columns=PDFConverter.text_columns(options))
+
+    @staticmethod
+    def write_text_stream(pages, options):
+        """Stream (page_number, text) pairs straight into an xlsx/csv file.
+
+        Rows are written as pages arrive, so nothing but the current page and a
+        small preview is kept. Returns (output_path, output_filename, text_count,
+        text_preview).
+        """
+        output_format = options.get('output_format', 'xlsx')
+        output_filename = f"converted_{uuid.uuid4().hex[:8]}.{output_format}"
+        output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
+        text_count = 0
+        text_preview = []
+
+        if output_format == "xlsx":
+            from openpyxl import Workbook
+
+            # Write-only workbooks flush rows to disk as they are appended
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet('Extracted_Text')
+            output_file = None
+
+            def write_rows(rows):
+                for row in rows:
+                    sheet.append(row)
+        else:  # csv format
+            output_file = open(output_path, 'w', newline='', encoding='utf-8')
+            write_rows = csv.writer(output_file).writerows
+
         try:
-            with conversion_progress_lock:
-                conversion_progress[task_id] = {'status': 'processing', 'progress': 10}
-            
-            password = options.get('password', '').strip() or None
-            
-            # Open PDF with optional password
-            with conversion_progress_lock:
-                conversion_progress[task_id] = {'status': 'processing', 'progress': 20, 'message': 'Opening PDF...'}
-            import pdfplumber  # Fix: Ensure pdfplumber is imported
+            write_rows([PDFConverter.text_columns(options)])
+            for page_number, text in pages:
+                if not text:
+                    continue
+                text_count += 1
+                if len(text_preview) < 5:
+                    text_preview.append({'Page': page_number, 'Text': text})
+                write_rows(PDFConverter.text_rows(page_number, text, options))
 
-            try:
-                with pdfplumber.open(pdf_path, password=password) as pdf:
-                    total_pages = len(pdf.pages)
-                    
-                    # Parse page range
-                    page_range_str = options.get('page_range', 'all')
-                    pages_to_extract = PDFConverter.parse_page_range(page_range_str, total_pages)
-                    
-                    if not pages_to_extract:
-                        with conversion_progress_lock:
-                            conversion_progress[task_id] = {
-                                'status': 'error',
-                                'message': 'No valid pages to extract! Please check your page range.',
-                                'error_type': 'invalid_range',
-                                'suggestion': 'Try using "all" or a valid range like "1-3"'
-                            }
-                        return None
-                    
-                    all_tables = []
-                    all_text = []
-                    extract_mode = options.get('extract_mode', 'tables')
-                    
-                    # Extract data based on mode
-                    with conversion_progress_lock:
-                        conversion_progress[task_id] = {
-                            'status': 'processing', 
-                            'progress': 30, 
-                            'message': f'Extracting data from {len(pages_to_extract)} pages...'
-                        }
-                    
-                    progress_increment = 50 / len(pages_to_extract)
-                    current_progress = 30
-                    
-                    for page_idx in pages_to_extract:
-                        page = pdf.pages[page_idx]
-                    
-                        # Extract tables
-                        if extract_mode in ["tables", "both"]:
-                            tables = page.extract_tables()
-                            if tables:
-                                for table in tables:
-                                    if table and len(table) > 0:
-                                        # Check if first row should be header
-                                        if options.get('include_headers', True) and len(table) > 1:
-                                            import pandas as pd  # Fix: Ensure pandas is imported
-                                            headers = PDFConverter.deduplicate_headers(table[0])
-                                            df = pd.DataFrame(table[1:], columns=headers)  # type: ignore[arg-type]
-                                        else:
-                                            import pandas as pd  # Fix: Ensure pandas is imported
-                                            df = pd.DataFrame(table)
-
-                                        # Clean data if option is enabled
-                                        if options.get('clean_data', True):
-                                            df = PDFConverter.clean_dataframe(df)
-                                        
-                                        if not df.empty:
-                                            all_tables.append(df)
-                        
-                        # Extract text
-                        if extract_mode in ["text", "both"]:
-                            text = page.extract_text()
-                            if text:
-                                all_text.append({
-                                    'Page': page_idx + 1,
-                                    'Text': text
-                                })
-                        
-                        current_progress += progress_increment
-                        with conversion_progress_lock:
-                            conversion_progress[task_id] = {
-                                'status': 'processing',
-                                'progress': min(80, int(current_progress)),
-                                'message': f'Processing page {page_idx + 1} of {total_pages}...'
-                            }
-                
-                    # Check if any data was extracted
-                    if not all_tables and not all_text:
-                        with conversion_progress_lock:
-                            conversion_progress[task_id] = {
-                                'status': 'error',
-                                'message': 'No data found in the PDF!',
-                                'error_type': 'no_data',
-                                'suggestion': 'This PDF may contain images or scanned content. Try using "text" extraction mode or ensure the PDF has actual text/tables.'
-                            }
-                        return None
-                    
-                    # Merge tables if option is enabled
-                    if options.get('merge_tables', False) and all_tables:
-                        with conversion_progress_lock:
-                            conversion_progress[task_id] = {
-                                'status': 'processing',
-                                'progress': 85,
-                                'message': 'Merging tables...'
-                            }
-                        all_tables = [pd.concat(all_tables, ignore_index=True)]
-                    
-                    # Save based on format
-                    with conversion_progress_lock:
-                        conversion_progress[task_id] = {
-                            'status': 'processing',
-                            'progress': 90,
-                            'message': 'Saving file...'
-                        }
-                    
-                    output_format = options.get('output_format', 'xlsx')
-                    output_filename = f"converted_{uuid.uuid4().hex[:8]}.{output_format}"
-                    output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-                    
-                    if output_format == "xlsx":
-                        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                            # Write tables
-                            for i, table in enumerate(all_tables):
-                                sheet_name = f'Table_{i+1}' if not options.get('merge_tables', False) else 'Merged_Data'
-                                table.to_excel(writer, sheet_name=sheet_name, index=False)
-                            
-                            # Write text if extracted
-                            if all_text:
-                                text_df = pd.DataFrame(all_text)
-                                text_df.to_excel(writer, sheet_name='Extracted_Text', index=False)
-                    else:  # csv format
-                        if all_tables:
-                            # For CSV, save the first/merged table
-                            all_tables[0].to_csv(output_path, index=False)
-                        elif all_text:
-                            text_df = pd.DataFrame(all_text)
-                            text_df.to_csv(output_path, index=False)
-                    
-                    # Store preview data (first 50 rows)
-                    preview_data = None
-                    if all_tables:
-                        preview_df = all_tables[0].head(50)
-                        # Replace NaN with None for JSON serialization
-                        preview_df = preview_df.fillna('')
-                        preview_data = {
-                            'columns': preview_df.columns.tolist(),
-                            'rows': preview_df.values.tolist(),
-                            'total_rows': len(all_tables[0])
-                        }
-                    elif all_text:
-                        preview_data = {
-                            'text_preview': all_text[:5]  # First 5 pages
-                        }
-                    
-                    with conversion_results_lock:
-                        conversion_results[task_id] = {
-                            'preview_data': preview_data,
-                            'output_path': output_path,
-                            'output_filename': output_filename,
-                            'timestamp': datetime.now()
-                        }
-                    
-                    # Success
-                    with conversion_progress_lock:
-                        conversion_progress[task_id] = {
-                            'status': 'completed',
-                            'progress': 100,
-                            'message': 'Conversion completed successfully!',
-                            'output_file': output_filename,
-                            'table_count': len(all_tables),
-                            'text_count': len(all_text),
-                            'has_preview': preview_data is not None
-                        }
-                    
-                    return output_path
-                    
-            except pdfplumber.pdfminer.pdfdocument.PDFPasswordIncorrect:
-                logger.error(f"Password incorrect for task {task_id}")
-                with conversion_progress_lock:
-                    conversion_progress[task_id] = {
-                        'status': 'error',
-                        'message': 'Incorrect password provided!',
-                        'error_type': 'wrong_password',
-                        'suggestion': 'Please check your password and try again. The PDF is password-protected.'
-                    }
-                return None
-                    
-            except pdfplumber.pdfminer.pdfparser.PDFSyntaxError as e:
-                logger.error(f"Corrupted PDF for task {task_id}: {str(e)}")
-                with conversion_progress_lock:
-                    conversion_progress[task_id] = {
-                        'status': 'error',
-                        'message': 'The PDF file appears to be corrupted or invalid!',
-                        'error_type': 'corrupted_pdf',
-                        'suggestion': 'Please try opening the PDF in a PDF reader to verify it\'s not damaged. You may need to repair or re-download the file.'
-                    }
-                return None
-                    
-            except PermissionError:
-                logger.error(f"Permission denied for task {task_id}")
-                with conversion_progress_lock:
-                    conversion_progress[task_id] = {
+            if output_file is None:
+                workbook.save(output_path)
+        except Exception:
+            # Don't leave a partial output behind when a page fails mid-stream
+            if output_file is None:
+                try:
+                    sheet.close()
+                except Exception:
+                    pass
+            else:
+                output_file.close()
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+        finally:
+            if output_file is not None:
+                output_file.close()
+
+        return output_path, output_filename, text_count, text_preview
+
+    @staticmethod
+    def write_output(all_tables, all_text, options):
+        """Write extracted tables/text to a new xlsx or csv file.
+
+        Returns (output_path, output_filename).
+        """
+        import pandas as pd
+
+        output_format = options.get('output_format', 'xlsx')
+        output_filename = f"converted_{uuid.uuid4().hex[:8]}.{output_format}"
+        output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
+
+        merged = options.get('merge_tables', False)
+
+        if output_format == "xlsx":
+            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+                # Write tables (merging leaves one table per run of stitched fragments)
+                for i, table in enumerate(all_tables):
+                    sheet_name = 'Merged_Data' if merged and len(all_tables) == 1 else f'Table_{i+1}'
+                    table.to_excel(writer, sheet_name=sheet_name, index=False)
+
+                # Write text if extracted
+                if all_text:
+                    text_df = PDFConverter.text_dataframe(all_text, options)
+                    text_df.to_excel(writer, sheet_name='Extracted_Text', index=False)
+        else:  # csv format
+            if all_tables and merged:
+                # Merged CSV: every stitched table with its own header row, separated by a blank line
+                with open(output_path, 'w', newline='', encoding='utf-8') as f:
+                    for i, table in enumerate(all_tables):
+                        if i:
+                            f.write('\n')
+                        table.to_csv(f, index=False)
+            elif all_tables:
+                # For CSV, save the first table
+                all_tables[0].to_csv(output_path, index=False)
+            elif all_text:
+                text_df = PDFConverter.text_dataframe(all_text, options)
+                text_df.to_csv(output_path, index=False)
+
+        return output_path, output_filename
+
+    @staticmethod
+    def build_preview(all_tables, all_text):
+        """Build preview data (first 50 rows of the first table, or first 5 text pages)"""
+        if all_tables:
+            preview_df = all_tables[0].head(50)
+            # Replace NaN with None for JSON serialization
+            preview_df = preview_df.fillna('')
+            return {
+                'columns': preview_df.columns.tolist(),
+                'rows': preview_df.values.tolist(),
+                'total_rows': len(all_tables[0])
+            }
+        elif all_text:
+            return {
+                'text_preview': all_text[:5]  # First 5 pages
+            }
+        return None
+
+    @staticmethod
+    def describe_error(task_id, error):
+        """Log a conversion failure and build the user-facing error progress payload"""
+        from pdfminer.pdfdocument import PDFPasswordIncorrect
+        from pdfminer.pdfparser import PDFSyntaxError
+
+        if isinstance(error, InvalidPageRangeError):
+            logger.warning(f"Invalid page range for task {task_id}: {error}")
+            return {
+                'status': 'error',
+                'message': 'No valid pages to extract! Please check your page range.',
+                'error_type': 'invalid_range',
+                'suggestion': 'Try using "all" or a valid range like "1-3"'
+            }
+
+        if isinstance(error, PDFPasswordIncorrect):
+            logger.error(f"Password incorrect for task {task_id}")
+            return {
+                'status': 'error',
+                'message': 'Incorrect password provided!',
+                'error_type': 'wrong_password',
+                'suggestion': 'Please check your password and try again. The PDF is password-protected.'
+            }
+
+        if isinstance(error, PDFSyntaxError):
+            logger.error(f"Corrupted PDF for task {task_id}: {str(error)}")
+            return {
+                'status': 'error',
+                'message': 'The PDF file appears to be corrupted or invalid!',
+                'error_type': 'corrupted_pdf',
+                'suggestion': 'Please try opening the PDF in a PDF reader to verify it\'s not damaged. You may need to repair or re-download the file.'
+            }
+
+        if isinstance(error, PermissionError):
+            logger.error(f"Permission denied for task {task_id}")
+            return {
+                'status': 'error',
+                'message': 'Cannot access the PDF file!',
+                'error_type': 'permission_denied',
+                'suggestion': 'The file may be locked by another program. Please close any PDF readers and try again.'
+            }
+
+        if isinstance(error, MemoryError):
+            logger.error(f"Memory error for task {task_id}")
+            return {
+                'status': 'error',
+                'message': 'PDF file is too large to process!',
+                'error_type': 'memory_error',
+                'suggestion': 'Try processing fewer pages at a time or splitting the PDF into smaller files.'
+            }
+
+        import pandas as pd
+        if isinstance(error, pd.errors.EmptyDataError):
+            logger.error(f"Empty data error for task {task_id}")
+            return {
+                'status': 'error',
+                'message': 'The extracted data is empty!',
+                'error_type': 'empty_data',
+                'suggestion': 'The PDF may not contain valid table structures. Try switching to "text" extraction mode.'
+            }
+
+        logger.error(f"Conversion error for task {task_id}: {str(error)}", exc_info=error)
+        error_message = str(error)
+
+        # Provide more specific error messages for common issues
+        if 'password' in error_message.lower():
+            friendly_message = 'This PDF requires a password!'
+            suggestion = 'Please enter the PDF password in the "PDF Password" field and try again.'
+            error_type = 'password_required'
+        elif 'encrypted' in error_message.lower():
+            friendly_message = 'This PDF is encrypted!'
+            suggestion = 'The PDF is protected. You need to provide the correct password to extract data.'
+            error_type = 'encrypted'
+        elif 'decode' in error_message.lower() or 'encoding' in error_message.lower():
+            friendly_message = 'Unable to decode PDF content!'
+            suggestion = 'The PDF may have encoding issues. Try re-saving it with a PDF editor first.'
+            error_type = 'encoding_error'
+        elif 'timeout' in error_message.lower():
+            friendly_message = 'Processing took too long!'
+            suggestion = 'The PDF is very complex. Try processing fewer pages or simplifying the document.'
+            error_type = 'timeout'
+        else:
+            friendly_message = f'Conversion failed: {error_message[:100]}'
+            suggestion = 'Please check your PDF file and settings, then try again.'
+            error_type = 'unknown'
+
+        return {
+            'status': 'error',
+            'message': friendly_message,
+            'error_type': error_type,
+            'suggestion': suggestion,
+            'technical_details': error_message if len(error_message) < 200 else error_message[:200] + '...'
+        }
+
+    @staticmethod
+    def estimate_memory_mb(pdf_path, options):
+        """Rough peak-memory estimate (MB) for converting a PDF, from its selected pages and file size.
+
+        The page count comes from the document catalog without parsing any
+        page; if the PDF can't be opened here (e.g. wrong password) pages are
+        guessed from the file size and the conversion reports the real error.
+        """
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdftypes import resolve1
+
+        file_mb = os.path.getsize(pdf_path) / (1024 * 1024)
+        try:
+            with open(pdf_path, 'rb') as fp:
+                document = PDFDocument(PDFParser(fp), password=options.get('password', '').strip())
+                total_pages = int(resolve1(resolve1(document.catalog['Pages'])['Count']))
+            pages = len(PDFConverter.parse_page_range(options.get('page_range', 'all'), total_pages))
+        except Exception:
+            pages = max(1, int(file_mb * 10))
+
+        per_page = MEMORY_PER_PAGE_MB.get(options.get('extract_mode', 'tables'), MEMORY_PER_PAGE_MB['tables'])
+        return round(MEMORY_BASE_MB + pages * per_page + file_mb * MEMORY_PER_FILE_MB, 1)
+
+    @staticmethod
+    def inspect_pdf(pdf_file, options):
+        """Check a PDF before it is converted: page count, encryption, text layer, table density and ETA.
+
+        Opening the document reads only the trailer, xref and page tree. Up to
+        INSPECT_SAMPLE_PAGES of the selected pages (first, middle and last) are
+        then run through the same extraction as a conversion, which gives the
+        text-layer check, the tables and rows per page and the per-page time
+        behind the ETA. Returns a dict whose 'status' is 'ok', or 'error' with
+        the error_type, message and suggestion the conversion would fail with.
+        """
+        import pdfplumber
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.layout import LAParams, LTTextContainer
+        from pdfminer.pdfdocument import PDFPasswordIncorrect
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.psparser import PSException
+        from pdfminer.pdftypes import resolve1
+        from pdfplumber.page import Page
+
+        started = time.perf_counter()
+        password = options.get('password', '').strip()
+        extract_mode = options.get('extract_mode', 'tables')
+        page_range_str = options.get('page_range', 'all')
+
+        try:
+            with pdfplumber.open(pdf_file, password=password or None) as pdf:
+                encrypted = pdf.doc.encryption is not None
+                total_pages = int(resolve1(resolve1(pdf.doc.catalog['Pages'])['Count']))
+                selected = PDFConverter.parse_page_range(page_range_str, total_pages)
+                if not selected:
+                    return {
                         'status': 'error',
-                        'message': 'Cannot access the PDF file!',
-                        'error_type': 'permission_denied',
-                        'suggestion': 'The file may be locked by another program. Please close any PDF readers and try again.'
+                        'message': f'The page range selects none of the {total_pages} pages!',
+                        'error_type': 'invalid_range',
+                        'suggestion': f'Try using "all" or a range within 1-{total_pages}',
+                        'pages': total_pages,
+                        'encrypted': encrypted
                     }
+
+                count = min(INSPECT_SAMPLE_PAGES, len(selected))
+                sample = sorted({selected[round(i * (len(selected) - 1) / max(1, count - 1))] for i in range(count)})
+                page_seconds = []
+                text_pages = table_count = row_count = 0
+
+                if extract_mode == 'text':
+                    # Text conversions lay pages out with pdfminer directly (see iter_text_pages); time that
+                    resource_manager = PDFResourceManager(caching=True)
+                    device = PDFPageAggregator(resource_manager, laparams=LAParams(**app.config['TEXT_LAPARAMS']))
+                    interpreter = PDFPageInterpreter(resource_manager, device)
+
+                # Walk the page tree only as far as the last sampled page
+                for page_idx, page_obj in enumerate(PDFPage.create_pages(pdf.doc)):
+                    if page_idx > sample[-1]:
+                        break
+                    if page_idx not in sample:
+                        continue
+                    page_started = time.perf_counter()
+                    if extract_mode == 'text':
+                        interpreter.process_page(page_obj)
+                        if any(isinstance(obj, LTTextContainer) and obj.get_text().strip() for obj in device.get_result()):
+                            text_pages += 1
+                    else:
+                        page = Page(pdf, page_obj, page_number=page_idx + 1)
+                        if page.chars:
+                            text_pages += 1
+                        tables, _ = PDFConverter.extract_page(page, extract_mode)
+                        table_count += len(tables)
+                        row_count += sum(len(table) for table in tables)
+                        page.flush_cache()
+                    page_seconds.append(time.perf_counter() - page_started)
+        except PDFPasswordIncorrect:
+            if password:
+                return {
+                    'status': 'error',
+                    'message': 'Incorrect password provided!',
+                    'error_type': 'wrong_password',
+                    'suggestion': 'Please check your password and try again. The PDF is password-protected.',
+                    'encrypted': True
+                }
+            return {
+                'status': 'error',
+                'message': 'This PDF requires a password!',
+                'error_type': 'password_required',
+                'suggestion': 'Please enter the PDF password in the "PDF Password" field and try again.',
+                'encrypted': True
+            }
+        except (PSException, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Inspection found an unreadable PDF: {e}")
+            return {
+                'status': 'error',
+                'message': 'The PDF file appears to be corrupted or invalid!',
+                'error_type': 'corrupted_pdf',
+                'suggestion': 'Please try opening the PDF in a PDF reader to verify it\'s not damaged. You may need to repair or re-download the file.'
+            }
+
+        # Jobs that can't start yet wait for a worker, each taking about an average conversion
+        with metrics_lock:
+            backlog = conversion_jobs['queued'] + conversion_jobs['running'] + 1 - CONVERSION_WORKERS
+            history = metrics_registry['conversion_seconds']
+            average_conversion = history.sum / history.count if history.count else 0.0
+        queue_seconds = max(0, backlog) * average_conversion / CONVERSION_WORKERS
+        per_page = sum(page_seconds) / len(page_seconds)
+        eta_seconds = per_page * len(selected) + INSPECT_OUTPUT_SECONDS + queue_seconds
+
+        result = {
+            'status': 'ok',
+            'pages': total_pages,
+            'selected_pages': len(selected),
+            'encrypted': encrypted,
+            'has_text': text_pages > 0,
+            'sampled_pages': [page_idx + 1 for page_idx in sample],
+            'tables_per_page': None,
+            'rows_per_page': None,
+            'eta_seconds': round(eta_seconds, 1),
+            'inspect_seconds': round(time.perf_counter() - started, 3)
+        }
+        if extract_mode != 'text':
+            result['tables_per_page'] = round(table_count / len(sample), 2)
+            result['rows_per_page'] = round(row_count / len(sample), 1)
+        if not text_pages:
+            result['warning'] = {
+                'message': 'No text found on the sampled pages.',
+                'error_type': 'no_data',
+                'suggestion': 'This PDF looks scanned: its pages are images, so a conversion will most likely find no data.'
+            }
+        return result
+
+    @staticmethod
+    def record_job_memory(task_id, peak_mb):
+        """Store a finished job's measured peak memory on its Conversion record"""
+        if peak_mb is None:
+            return
+        with metrics_lock:
+            metrics_registry['job_peak_memory_mb'].observe(max(0.0, peak_mb))
+        try:
+            with app.app_context():
+                Conversion.query.filter_by(task_id=task_id).update({'peak_memory_mb': peak_mb})
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Failed to store peak memory for task {task_id}: {e}")
+
+    @staticmethod
+    def remove_source_pdf(pdf_path):
+        """Delete an uploaded PDF once it has been processed"""
+        try:
+            if os.path.exists(pdf_path):
+                os.remove(pdf_path)
+                logger.info(f"Cleaned up PDF file: {pdf_path}")
+        except Exception as cleanup_error:
+            logger.error(f"Cleanup error for {pdf_path}: {cleanup_error}")
+
+    @staticmethod
+    def convert_pdf(pdf_path, options, task_id):
+        """Convert PDF to Excel/CSV with advanced options.
+
+        The completed progress payload carries per-stage and per-page timings,
+        row count, output size and peak memory; the same figures feed the
+        /metrics histograms and the peak is stored on the Conversion record.
+        """
+        timer = ConversionTimer()
+        memory = MemoryMonitor().start()
+        try:
+            set_task_progress(task_id, {'status': 'processing', 'progress': 10})
+
+            if options.get('extract_mode', 'tables') == 'text':
+                # Text-only: stream pages from the pdfminer engine straight into the output file
+                pages = PDFConverter.iter_text_pages(pdf_path, options, task_id, timer)
+                stream_started = time.perf_counter()
+                output_path, output_filename, text_count, text_preview = PDFConverter.write_text_stream(pages, options)
+                # Extraction interleaves with writing; whatever the pdfminer stages didn't take was the write
+                timer.stages['write'] += time.perf_counter() - stream_started - timer.stages['open'] - timer.stages['extract']
+
+                if not text_count:
+                    os.remove(output_path)
+                    timer.record('no_data')
+                    set_task_progress(task_id, dict(NO_DATA_ERROR))
+                    return None
+
+                table_count = 0
+                row_count = 0
+                preview_data = {'text_preview': text_preview}
+            else:
+                extracted = PDFConverter.extract_pdf(pdf_path, options, task_id, timer)
+                all_tables = extracted['tables']
+                all_text = extracted['text']
+
+                # Check if any data was extracted
+                if not all_tables and not all_text:
+                    timer.record('no_data')
+                    set_task_progress(task_id, dict(NO_DATA_ERROR))
+                    return None
+
+                # Save based on format
+                set_task_progress(task_id, {
+                    'status': 'processing',
+                    'progress': 90,
+                    'message': 'Saving file...'
+                })
+
+                with timer.stage('write'):
+                    output_path, output_filename = PDFConverter.write_output(all_tables, all_text, options)
+                table_count = len(all_tables)
+                text_count = len(all_text)
+                row_count = sum(len(table) for table in all_tables)
+
+                # Store preview data (first 50 rows)
+                with timer.stage('preview'):
+                    preview_data = PDFConverter.build_preview(all_tables, all_text)
+
+            with conversion_results_lock:
+                conversion_results[task_id] = {
+                    'preview_data': preview_data,
+                    'output_path': output_path,
+                    'output_filename': output_filename,
+                    'timestamp': datetime.now()
+                }
+
+            output_bytes = os.path.getsize(output_path)
+            timer.record('completed', row_count, output_bytes)
+
+            # Success
+            set_task_progress(task_id, {
+                'status': 'completed',
+                'progress': 100,
+                'message': 'Conversion completed successfully!',
+                'output_file': output_filename,
+                'table_count': table_count,
+                'text_count': text_count,
+                'row_count': row_count,
+                'output_bytes': output_bytes,
+                'timings': timer.summary(),
+                'peak_memory_mb': memory.peak_mb,
+                'has_preview': preview_data is not None
+            })
+
+            return output_path
+
+        except Exception as e:
+            timer.record('error')
+            set_task_progress(task_id, PDFConverter.describe_error(task_id, e))
+            return None
+        finally:
+            memory.stop()
+            PDFConverter.record_job_memory(task_id, memory.peak_mb)
+            # Always clean up the PDF file
+            PDFConverter.remove_source_pdf(pdf_path)
+
+    @staticmethod
+    def convert_batch_file(pdf_path, options, task_id):
+        """Extract a single file of a batch; runs on a conversion worker.
+
+        Returns the extracted data (tables merged if requested) or None on failure.
+        """
+        timer = ConversionTimer()
+        memory = MemoryMonitor().start()
+        try:
+            set_task_progress(task_id, {'status': 'processing', 'progress': 10})
+
+            extracted = PDFConverter.extract_pdf(pdf_path, options, task_id, timer)
+
+            if not extracted['tables'] and not extracted['text']:
+                timer.record('no_data')
+                set_task_progress(task_id, dict(NO_DATA_ERROR))
                 return None
-                            
-        except MemoryError:
-            logger.error(f"Memory error for task {task_id}")
-            with conversion_progress_lock:
-                conversion_progress[task_id] = {
+
+            row_count = sum(len(table) for table in extracted['tables'])
+            timer.record('completed', row_count)
+
+            set_task_progress(task_id, {
+                'status': 'completed',
+                'progress': 100,
+                'message': 'Extracted, waiting for the rest of the batch...',
+                'table_count': len(extracted['tables']),
+                'text_count': len(extracted['text']),
+                'row_count': row_count,
+                'timings': timer.summary(),
+                'peak_memory_mb': memory.peak_mb
+            })
+            return extracted
+
+        except Exception as e:
+            timer.record('error')
+            set_task_progress(task_id, PDFConverter.describe_error(task_id, e))
+            return None
+        finally:
+            memory.stop()
+            PDFConverter.record_job_memory(task_id, memory.peak_mb)
+            PDFConverter.remove_source_pdf(pdf_path)
+
+    @staticmethod
+    def batch_sheet_name(label, suffix, used_names):
+        """Build a unique Excel sheet name (max 31 chars, no []:*?/\\) for a batch file"""
+        label = re.sub(r'[\[\]:*?/\\]', '_', label).strip("' ") or 'File'
+        base = f"{label[:31 - len(suffix) - 1]}_{suffix}" if suffix else label[:31]
+        name = base
+        counter = 1
+        while name.lower() in used_names:
+            counter += 1
+            tail = f"~{counter}"
+            name = base[:31 - len(tail)] + tail
+        used_names.add(name.lower())
+        return name
+
+    @staticmethod
+    def write_batch_output(results, options):
+        """Write a batch's per-file results into one workbook (xlsx) or a ZIP of CSVs.
+
+        ``results`` is a list of (filename, extracted) for the files that succeeded.
+        Returns (output_path, output_filename).
+        """
+        import pandas as pd
+
+        merged = options.get('merge_tables', False)
+
+        if options.get('output_format', 'xlsx') == 'xlsx':
+            output_filename = f"converted_{uuid.uuid4().hex[:8]}.xlsx"
+            output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
+            used_names = set()
+
+            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+                for filename, extracted in results:
+                    label = Path(filename).stem
+                    for i, table in enumerate(extracted['tables']):
+                        suffix = '' if merged and len(extracted['tables']) == 1 else f'T{i+1}'
+                        sheet_name = PDFConverter.batch_sheet_name(label, suffix, used_names)
+                        table.to_excel(writer, sheet_name=sheet_name, index=False)
+                    if extracted['text']:
+                        sheet_name = PDFConverter.batch_sheet_name(label, 'Text', used_names)
+                        PDFConverter.text_dataframe(extracted['text'], options).to_excel(writer, sheet_name=sheet_name, index=False)
+        else:
+            # CSV holds a single table, so a batch becomes a ZIP with one CSV per table
+            output_filename = f"converted_{uuid.uuid4().hex[:8]}.zip"
+            output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
+            used_names = set()
+
+            with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                for filename, extracted in results:
+                    label = Path(filename).stem
+                    for i, table in enumerate(extracted['tables']):
+                        name = label if merged and len(extracted['tables']) == 1 else f'{label}_table_{i+1}'
+                        while name.lower() in used_names:
+                            name = f'{name}_'
+                        used_names.add(name.lower())
+                        archive.writestr(f'{name}.csv', table.to_csv(index=False))
+                    if extracted['text']:
+                        name = f'{label}_text'
+                        while name.lower() in used_names:
+                            name = f'{name}_'
+                        used_names.add(name.lower())
+                        archive.writestr(f'{name}.csv', PDFConverter.text_dataframe(extracted['text'], options).to_csv(index=False))
+
+        return output_path, output_filename
+
+    @staticmethod
+    def batch_progress(batch_id, files):
+        """Aggregate per-file progress into the batch's progress payload"""
+        file_states = []
+        with conversion_progress_lock:
+            for task_id, _, filename in files:
+                progress = conversion_progress.get(task_id, {})
+                file_states.append({
+                    'task_id': task_id,
+                    'filename': filename,
+                    'status': progress.get('status', 'queued'),
+                    'progress': progress.get('progress', 0),
+                    'message': progress.get('message', '')
+                })
+
+        finished = [f for f in file_states if f['status'] in ('completed', 'error')]
+        failed = [f for f in file_states if f['status'] == 'error']
+        # Extraction covers 0-90%, combining the output the rest
+        overall = sum(100 if f['status'] == 'error' else f['progress'] for f in file_states) / len(file_states)
+
+        return {
+            'status': 'processing',
+            'progress': min(90, int(overall * 0.9)),
+            'message': f'Converted {len(finished)} of {len(file_states)} files...',
+            'files': file_states,
+            'total_files': len(file_states),
+            'completed_files': len(finished) - len(failed),
+            'failed_files': len(failed)
+        }
+
+    @staticmethod
+    def convert_batch(batch_id, files, options, memory_estimates=None):
+        """Convert a batch of PDFs in parallel and combine them into one output.
+
+        ``files`` is a list of (task_id, pdf_path, filename). Each file is extracted
+        on the shared conversion workers under its own task id, admitted against
+        the memory budget with its estimate from ``memory_estimates``; the batch
+        task aggregates their progress and owns the combined output file.
+        """
+        memory_estimates = memory_estimates or {}
+        try:
+            futures = []
+            for task_id, pdf_path, _ in files:
+                set_task_progress(task_id, {'status': 'queued', 'progress': 0, 'message': 'Waiting for a worker...'})
+                futures.append(submit_conversion(
+                    PDFConverter.convert_batch_file, pdf_path, options, task_id,
+                    memory_mb=memory_estimates.get(task_id, 0), task_id=task_id
+                ))
+
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=0.5)
+                set_task_progress(batch_id, PDFConverter.batch_progress(batch_id, files))
+
+            results = [
+                (filename, future.result())
+                for (_, _, filename), future in zip(files, futures)
+                if future.result() is not None
+            ]
+            summary = PDFConverter.batch_progress(batch_id, files)
+
+            if not results:
+                summary.update({
                     'status': 'error',
-                    'message': 'PDF file is too large to process!',
-                    'error_type': 'memory_error',
-                    'suggestion': 'Try processing fewer pages at a time or splitting the PDF into smaller files.'
+                    'message': 'None of the files in the batch could be converted!',
+                    'error_type': 'batch_failed',
+                    'suggestion': 'Check the per-file errors below, fix the affected PDFs and try again.'
+                })
+                set_task_progress(batch_id, summary)
+                return None
+
+            summary.update({'progress': 90, 'message': f'Combining {len(results)} files...'})
+            set_task_progress(batch_id, summary)
+
+            output_path, output_filename = PDFConverter.write_batch_output(results, options)
+
+            all_tables = [table for _, extracted in results for table in extracted['tables']]
+            all_text = [page for _, extracted in results for page in extracted['text']]
+            preview_data = PDFConverter.build_preview(all_tables, all_text)
+
+            with conversion_results_lock:
+                conversion_results[batch_id] = {
+                    'preview_data': preview_data,
+                    'output_path': output_path,
+                    'output_filename': output_filename,
+                    'timestamp': datetime.now()
                 }
-            return None
-        
-        except pd.errors.EmptyDataError:
-            logger.error(f"Empty data error for task {task_id}")
+
+            # Point every converted file at the combined output so history can re-download it
             with conversion_progress_lock:
-                conversion_progress[task_id] = {
-                    'status': 'error',
-                    'message': 'The extracted data is empty!',
-                    'error_type': 'empty_data',
-                    'suggestion': 'The PDF may not contain valid table structures. Try switching to "text" extraction mode.'
-                }
-            return None
-        
+                for task_id, _, _ in files:
+                    progress = conversion_progress.get(task_id)
+                    if progress and progress.get('status') == 'completed':
+                        progress['output_file'] = output_filename
+                        progress['message'] = 'Conversion completed successfully!'
+
+            summary = PDFConverter.batch_progress(batch_id, files)
+            summary.update({
+                'status': 'completed',
+                'progress': 100,
+                'message': f'Batch completed: {summary["completed_files"]} of {summary["total_files"]} files converted',
+                'output_file': output_filename,
+                'table_count': len(all_tables),
+                'text_count': len(all_text),
+                'has_preview': preview_data is not None
+            })
+            set_task_progress(batch_id, summary)
+
+            return output_path
+
         except Exception as e:
-            logger.error(f"Conversion error for task {task_id}: {str(e)}", exc_info=True)
-            error_message = str(e)
-            
-            # Provide more specific error messages for common issues
-            if 'password' in error_message.lower():
-                friendly_message = 'This PDF requires a password!'
-                suggestion = 'Please enter the PDF password in the "PDF Password" field and try again.'
-                error_type = 'password_required'
-            elif 'encrypted' in error_message.lower():
-                friendly_message = 'This PDF is encrypted!'
-                suggestion = 'The PDF is protected. You need to provide the correct password to extract data.'
-                error_type = 'encrypted'
-            elif 'decode' in error_message.lower() or 'encoding' in error_message.lower():
-                friendly_message = 'Unable to decode PDF content!'
-                suggestion = 'The PDF may have encoding issues. Try re-saving it with a PDF editor first.'
-                error_type = 'encoding_error'
-            elif 'timeout' in error_message.lower():
-                friendly_message = 'Processing took too long!'
-                suggestion = 'The PDF is very complex. Try processing fewer pages or simplifying the document.'
-                error_type = 'timeout'
-            else:
-                friendly_message = f'Conversion failed: {error_message[:100]}'
-                suggestion = 'Please check your PDF file and settings, then try again.'
-                error_type = 'unknown'
-            
-            with conversion_progress_lock:
-                conversion_progress[task_id] = {
-                    'status': 'error',
-                    'message': friendly_message,
-                    'error_type': error_type,
-                    'suggestion': suggestion,
-                    'technical_details': error_message if len(error_message) < 200 else error_message[:200] + '...'
-                }
+            set_task_progress(batch_id, PDFConverter.describe_error(batch_id, e))
             return None
-        finally:
-            # Always clean up the PDF file
-            try:
-                if os.path.exists(pdf_path):
-                    os.remove(pdf_path)
-                    logger.info(f"Cleaned up PDF file: {pdf_path}")
-            except Exception as cleanup_error:
-                logger.error(f"Cleanup error for {pdf_path}: {cleanup_error}")
 
 @app.route('/')
 def index():
@@ -667,13 +2822,142 @@ def index():
     logger.info("Index page accessed")
     return render_template('index.html')
 
+@app.before_request
+def start_request_timer():
+    """Note when the request started, for the per-route latency metrics"""
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record request latency and DB usage by route template; log slow or chatty requests.
+
+    Registered first, so it runs after the other after_request hooks.
+    """
+    started = g.get('request_started')
+    if started is None:
+        return response
+
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    queries = g.get('db_queries', 0)
+    db_seconds = g.get('db_seconds', 0.0)
+
+    with metrics_lock:
+        metrics_registry['request_seconds'][(request.method, route)].observe(elapsed)
+        metrics_registry['requests'][(request.method, route, response.status_code)] += 1
+        metrics_registry['request_queries'][(request.method, route)].observe(queries)
+        metrics_registry['request_db_seconds'][(request.method, route)].observe(db_seconds)
+
+    if elapsed * 1000 > app.config['SLOW_REQUEST_MS'] or queries > app.config['SLOW_REQUEST_QUERIES']:
+        # Most repeated statements first: that's where N+1 patterns show up
+        statements = sorted(g.get('db_statements', {}).items(), key=lambda item: (-item[1][0], -item[1][1]))
+        details = ''.join(
+            f"\n  {count}x {seconds * 1000:.1f} ms  {fingerprint[:500]}"
+            for fingerprint, (count, seconds) in statements[:10]
+        )
+        logger.warning(
+            f"Slow request {request.method} {route}: {elapsed * 1000:.0f} ms, "
+            f"{queries} queries ({db_seconds * 1000:.0f} ms in DB){details}"
+        )
+
+    if app.debug or app.config['QUERY_STATS_HEADERS']:
+        response.headers['X-DB-Query-Count'] = str(queries)
+        response.headers['X-DB-Time-Ms'] = f"{db_seconds * 1000:.1f}"
+        response.headers['Server-Timing'] = f"db;dur={db_seconds * 1000:.1f}, total;dur={elapsed * 1000:.1f}"
+
+    return response
+
+# ==================== Response compression ====================
+# Text responses (HTML, JSON, CSS/JS) of at least COMPRESSION_MIN_SIZE bytes are compressed with the
+# best encoding the client accepts: brotli when the `brotli` package is installed, else gzip. Other
+# types, which covers the xlsx/zip downloads (already compressed), pass through untouched. Static
+# files with a .br/.gz copy written by build_assets.py are served from that copy instead.
+app.config['COMPRESSION_ENABLED'] = os.environ.get('COMPRESSION_ENABLED', '1').lower() in ['1', 'true', 'yes']
+app.config['COMPRESSION_MIN_SIZE'] = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+app.config['COMPRESSION_GZIP_LEVEL'] = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'application/javascript',
+    'application/json', 'image/svg+xml',
+}
+try:
+    import brotli  # type: ignore[import]
+except ImportError:
+    brotli = None
+COMPRESSION_ENCODINGS = ['br', 'gzip'] if brotli else ['gzip']
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+def compress_body(data, encoding):
+    """Compress a response body with 'br' or 'gzip'"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=app.config['COMPRESSION_BROTLI_QUALITY'])
+    import gzip
+    return gzip.compress(data, compresslevel=app.config['COMPRESSION_GZIP_LEVEL'], mtime=0)
+
+def precompressed_static(encoding):
+    """Path of a precompressed copy of the requested static file, if one exists"""
+    filename = (request.view_args or {}).get('filename', '')
+    path = os.path.join(app.static_folder or 'static', filename + PRECOMPRESSED_SUFFIXES[encoding])
+    return path if os.path.isfile(path) else None
+
+@app.after_request
+def compress_response(response):
+    """Compress eligible responses for clients that accept it.
+
+    Registered right after the metrics hook, so it runs after every hook that
+    may still change the body.
+    """
+    if not app.config['COMPRESSION_ENABLED'] or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code in (204, 206, 304) or response.status_code < 200
+            or 'Content-Encoding' in response.headers or 'Range' in request.headers):
+        return response
+    encoding = request.accept_encodings.best_match(COMPRESSION_ENCODINGS)
+    if encoding is None:
+        return response
+
+    is_static = request.endpoint == 'static'
+    if response.direct_passthrough and not is_static:
+        return response  # send_file downloads stream from disk
+    if response.content_length is not None and response.content_length < app.config['COMPRESSION_MIN_SIZE']:
+        return response
+
+    response.direct_passthrough = False
+    data = response.get_data()
+    variant = precompressed_static(encoding) if is_static else None
+    if variant:
+        with open(variant, 'rb') as f:
+            compressed = f.read()
+    elif len(data) < app.config['COMPRESSION_MIN_SIZE']:
+        return response
+    else:
+        compressed = compress_body(data, encoding)
+        if len(compressed) >= len(data):
+            return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    # The bytes differ per encoding, so a strong ETag no longer identifies them exactly
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    count_metric('compression_bytes', (encoding, 'original'), len(data))
+    count_metric('compression_bytes', (encoding, 'compressed'), len(compressed))
+    return response
+
 @app.before_request
 def before_request_security():
     """Global security checks before each request"""
+    # Rate limits first: they need no database access and spare it for rejected clients
+    limited = check_rate_limit()
+    if limited is not None:
+        return limited
+
     # Retry database initialization if it failed at startup
     # Use lock to prevent race conditions when multiple concurrent requests check/modify _db_initialized
     global _db_initialized
-    if not _db_initialized:
+    if not _db_initialized and request.endpoint not in DB_FREE_ENDPOINTS:
         # Acquire lock to ensure only one thread initializes the database
         with db_initialization_lock:
             # Double-check pattern: re-check after acquiring lock in case another thread already initialized
@@ -685,7 +2969,7 @@ def before_request_security():
                     logger.error(f"Database initialization retry failed: {e}", exc_info=True)
     
     # Skip security checks for static files and public endpoints
-    public_endpoints = ['index', 'signup', 'login', 'static', 'get_user_status', 'admin_test', 'test_endpoint', 'admin_check_credits', 'admin_add_credits', 'admin_panel']
+    public_endpoints = ['index', 'signup', 'login', 'static', 'get_user_status', 'get_dashboard', 'admin_test', 'test_endpoint', 'admin_check_credits', 'admin_add_credits', 'admin_reconcile_counters', 'admin_panel', 'get_metrics']
     
     if request.endpoint in public_endpoints:
         return None
@@ -695,14 +2979,14 @@ def before_request_security():
         # Check if this is a protected route (has @login_required)
         protected_routes = [
             'get_credits', 'get_referral_stats', 'get_profile', 'upload_file',
-            'get_progress', 'download_file', 'preview_data', 'get_history',
-            'get_credit_history', 'logout'
+            'upload_batch', 'get_progress', 'download_file', 'preview_data', 'get_history',
+            'get_credit_history', 'logout', 'inspect_pdf'
         ]
         
         if request.endpoint in protected_routes:
             if not current_user.is_authenticated:
                 logger.warning(f"Blocked unauthenticated request to {request.endpoint} from {request.remote_addr}")
-                if request.is_json or request.path.startswith('/api/') or request.path.startswith('/upload'):
+                if request.is_json or request.path.startswith('/api/') or request.path.startswith('/upload') or request.path.startswith('/inspect'):
                     return jsonify({
                         'error': 'unauthorized',
                         'message': 'Your session has expired. Please log in again.',
@@ -716,11 +3000,22 @@ def before_request_security():
 @app.after_request
 def after_request_security(response):
     """Add security headers to all responses"""
-    # Prevent caching of sensitive data for authenticated routes
-    if current_user.is_authenticated:
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, private'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
+    # Prevent caching of sensitive data for authenticated routes. Use the user Flask-Login already
+    # loaded (if any) or the session cookie, so static files and public pages never load the user.
+    login_user_obj = g.get('_login_user')
+    if request.endpoint == 'static':
+        # Static files are the same for everyone; built ones never change under their hashed name
+        filename = (request.view_args or {}).get('filename', '')
+        if filename.startswith(STATIC_DIST_PREFIX) and response.status_code == 200:
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    elif (login_user_obj is not None and login_user_obj.is_authenticated) or '_user_id' in session:
+        if response.get_etag()[0]:
+            # Versioned responses may be kept by the browser, but are revalidated on every use
+            response.headers['Cache-Control'] = 'private, no-cache'
+        else:
+            response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, private'
+            response.headers['Pragma'] = 'no-cache'
+            response.headers['Expires'] = '0'
     
     # Add security headers
     response.headers['X-Content-Type-Options'] = 'nosniff'
@@ -737,6 +3032,15 @@ def test_endpoint():
 
 # ==================== Authentication Routes ====================
 
+def auth_busy_response():
+    """503 for sign-ups/logins turned away because the password hashing pool is full"""
+    response = jsonify({
+        'error': 'busy',
+        'message': 'Too many sign-ins at the moment. Please try again in a few seconds.'
+    })
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
 @app.route('/auth/signup', methods=['POST'])
 def signup():
     """Create new user account"""
@@ -760,62 +3064,48 @@ def signup():
         if referral_code and (len(referral_code) != 8 or not referral_code.isalnum()):
             return jsonify({'error': 'Invalid referral code format'}), 400
         
-        # Check if user already exists
-        if User.query.filter_by(email=email).first():
-            return jsonify({'error': 'Email already registered'}), 400
-        
-        # Create new user
+        # Create new user (a taken email is caught by the unique constraint on insert)
         user = User(  # type: ignore[call-arg]
             email=email,
-            referral_code=User.generate_referral_code(),
             referred_by_code=referral_code if referral_code else None,
-            total_credits=20,
-            used_credits=0
+            total_credits=SIGNUP_BONUS_CREDITS,
+            used_credits=0,
+            data_version=1
         )
-        user.set_password(password)
+        user.password = hash_password(password)
         
+        # User, signup bonus, referral log and the referrer's bonus commit together or not at all
+        from sqlalchemy import insert
+        from sqlalchemy.exc import IntegrityError
         try:
-            db.session.add(user)
-            db.session.flush()  # Flush to get user.id before logging transaction
-            # Log signup bonus before commit for atomic operation
-            log_credit_transaction(user, 20, 'signup', 'Welcome bonus - 20 credits')
+            add_new_user(user)
+            ledger = [{
+                'user_id': user.id,
+                'amount': SIGNUP_BONUS_CREDITS,
+                'transaction_type': 'signup',
+                'description': f'Welcome bonus - {SIGNUP_BONUS_CREDITS} credits',
+                'balance_after': SIGNUP_BONUS_CREDITS
+            }]
+            referral = award_referral(referral_code, user.id, email) if referral_code else None
+            if referral:
+                ledger.append(referral)
+            db.session.execute(insert(CreditTransaction), ledger)
             db.session.commit()
+        except IntegrityError as db_error:
+            db.session.rollback()
+            if 'email' in str(db_error.orig):
+                return jsonify({'error': 'Email already registered'}), 400
+            logger.error(f"Database error during signup: {db_error}", exc_info=True)
+            return jsonify({'error': 'Registration failed. Please try again.'}), 500
         except Exception as db_error:
             db.session.rollback()
             logger.error(f"Database error during signup: {db_error}", exc_info=True)
             return jsonify({'error': 'Registration failed. Please try again.'}), 500
         
-        # Award referral credits if referred
-        if referral_code:
-            referrer = User.query.filter_by(referral_code=referral_code).first()
-            if referrer and referrer.email != email:
-                # Check if not already logged
-                existing_log = ReferralLog.query.filter_by(
-                    referrer_id=referrer.id,
-                    referee_email=email
-                ).first()
-                
-                if not existing_log:
-                    try:
-                        # Award 10 credits to referrer
-                        referrer.total_credits += 10
-                        
-                        # Log the referral
-                        ref_log = ReferralLog(  # type: ignore[call-arg]
-                            referrer_id=referrer.id,
-                            referee_email=email,
-                            credited=True
-                        )
-                        db.session.add(ref_log)
-                        
-                        # Log referral transaction before commit
-                        log_credit_transaction(referrer, 10, 'referral', f'Referral bonus from {email}')
-                        db.session.commit()
-                        logger.info(f"Awarded 10 credits to {referrer.email} for referring {email}")
-                    except Exception as ref_error:
-                        logger.error(f"Error awarding referral credits: {ref_error}")
-                        db.session.rollback()
-                        # Continue anyway - user is created
+        for entry in ledger:
+            count_metric('credit_operations', entry['transaction_type'])
+        if referral:
+            logger.info(f"Awarded {REFERRAL_BONUS_CREDITS} credits to user {referral['user_id']} for referring {email}")
         
         # Log user in
         login_user(user, remember=True)
@@ -830,6 +3120,8 @@ def signup():
             }
         }), 201
         
+    except PasswordHashBusy:
+        return auth_busy_response()
     except Exception as e:
         logger.error(f"Signup error: {str(e)}", exc_info=True)
         db.session.rollback()
@@ -853,9 +3145,26 @@ def login():
         # Find user
         user = User.query.filter_by(email=email).first()
         
-        if not user or not user.check_password(password):
+        if not user:
+            return jsonify({'error': 'Invalid email or password'}), 401
+        
+        valid, new_hash = verify_password(user.password, password)
+        if not valid:
             return jsonify({'error': 'Invalid email or password'}), 401
         
+        if new_hash:
+            # Upgrade the stored hash to the current PASSWORD_HASH_METHOD (unless it changed meanwhile)
+            from sqlalchemy import update
+            db.session.execute(
+                update(User)
+                .where(User.id == user.id, User.password == user.password)
+                .values(password=new_hash)
+                .execution_options(synchronize_session=False)
+            )
+            mark_user_changed(user.id)
+            db.session.commit()
+            logger.info(f"Upgraded password hash for {email}")
+        
         # Log user in
         login_user(user, remember=True)
         logger.info(f"User logged in: {email}")
@@ -869,6 +3178,8 @@ def login():
             }
         }), 200
         
+    except PasswordHashBusy:
+        return auth_busy_response()
     except Exception as e:
         logger.error(f"Login error: {str(e)}", exc_info=True)
         return jsonify({'error': 'Login failed'}), 500
@@ -896,9 +3207,7 @@ def logout():
         try:
             # Clear any user-specific cache or temporary data
             # This ensures logged-out users cannot access their previous session data
-            with conversion_progress_lock:
-                # Don't delete progress data, but we could track logged-out sessions
-                pass
+            invalidate_user_snapshot(user_id)
         except Exception as cache_error:
             logger.warning(f"Error clearing user cache: {cache_error}")
     
@@ -927,31 +3236,18 @@ def logout():
 
 @app.route('/api/credits')
 @login_required
+@read_replica
 def get_credits():
     """Get user's credit information"""
     try:
-        # Force fresh data from database
-        try:
-            db.session.expire(current_user)
-            db.session.refresh(current_user)
-        except:
-            pass  # Continue with cached data if refresh fails
         available = current_user.get_available_credits()
-        total_referrals = ReferralLog.query.filter_by(
-            referrer_id=current_user.id,
-            credited=True
-        ).count()
-        
-        total_conversions = Conversion.query.filter_by(
-            user_id=current_user.id
-        ).count()
         
         return jsonify({
             'available': available,
             'total_earned': current_user.total_credits,
             'used': current_user.used_credits,
-            'referrals_count': total_referrals,
-            'conversions_count': total_conversions,
+            'referrals_count': current_user.referral_count,
+            'conversions_count': current_user.conversion_count,
             'email': current_user.email,
             'referral_code': current_user.referral_code
         }), 200
@@ -965,12 +3261,6 @@ def get_user_status():
     """Get current user status (for frontend checks)"""
     try:
         if current_user.is_authenticated:
-            # Force fresh data from database
-            try:
-                db.session.expire(current_user)
-                db.session.refresh(current_user)
-            except:
-                pass  # Continue with cached data if refresh fails
             return jsonify({
                 'logged_in': True,
                 'email': current_user.email,
@@ -984,12 +3274,77 @@ def get_user_status():
         logger.debug(f"User status check error (likely during logout): {e}")
         return jsonify({'logged_in': False}), 200
 
+@app.route('/api/dashboard')
+def get_dashboard():
+    """Status, credits, counters, recent credit history and referrals in one response.
+
+    The ETag is the user's data_version, which every credit or counter change
+    bumps, so an unchanged dashboard is answered with 304 straight from the
+    (usually cached) user row, without further queries.
+    """
+    try:
+        if not current_user.is_authenticated:
+            return jsonify({'logged_in': False}), 200
+
+        etag = f"{current_user.id}-{current_user.data_version}"
+        if request.if_none_match.contains_weak(etag):  # Compressed responses carry it as a weak ETag
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        transactions = CreditTransaction.query.filter_by(user_id=current_user.id)\
+            .order_by(CreditTransaction.timestamp.desc())\
+            .limit(DASHBOARD_HISTORY_LIMIT)\
+            .all()
+        referrals = ReferralLog.query.filter_by(referrer_id=current_user.id)\
+            .order_by(ReferralLog.signup_date.desc())\
+            .limit(REFERRAL_LIST_LIMIT)\
+            .all()
+
+        response = jsonify({
+            'logged_in': True,
+            'version': current_user.data_version,
+            'email': current_user.email,
+            'referral_code': current_user.referral_code,
+            'available_credits': current_user.get_available_credits(),
+            'total_credits': current_user.total_credits,
+            'used_credits': current_user.used_credits,
+            'conversions_count': current_user.conversion_count,
+            'referrals_count': current_user.referral_count,
+            'referral_credits': current_user.referral_credits,
+            'history': [{
+                'id': t.id,
+                'amount': t.amount,
+                'type': t.transaction_type,
+                'description': t.description,
+                'balance_after': t.balance_after,
+                'timestamp': t.timestamp.isoformat()
+            } for t in transactions],
+            'referrals': [{
+                'email': ref.referee_email,
+                'signup_date': ref.signup_date.isoformat(),
+                'credited': ref.credited
+            } for ref in referrals]
+        })
+        response.set_etag(etag)
+        return response
+
+    except Exception as e:
+        logger.error(f"Dashboard error: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/referral-stats')
 @login_required
+@read_replica
 def get_referral_stats():
-    """Get detailed referral statistics"""
+    """Get detailed referral statistics (totals from the user's counters, most recent referrals listed)"""
     try:
-        referrals = ReferralLog.query.filter_by(referrer_id=current_user.id).all()
+        referrals = (
+            ReferralLog.query.filter_by(referrer_id=current_user.id)
+            .order_by(ReferralLog.signup_date.desc())
+            .limit(REFERRAL_LIST_LIMIT)
+            .all()
+        )
         
         referral_list = [{
             'email': ref.referee_email,
@@ -998,9 +3353,9 @@ def get_referral_stats():
         } for ref in referrals]
         
         return jsonify({
-            'total_referrals': len(referrals),
+            'total_referrals': current_user.referral_count,
             'referrals': referral_list,
-            'credits_earned_from_referrals': len([r for r in referrals if r.credited]) * 10
+            'credits_earned_from_referrals': current_user.referral_credits
         }), 200
         
     except Exception as e:
@@ -1009,23 +3364,10 @@ def get_referral_stats():
 
 @app.route('/api/profile')
 @login_required
+@read_replica
 def get_profile():
     """Get user profile information"""
     try:
-        # Force fresh data from database
-        try:
-            db.session.expire(current_user)
-            db.session.refresh(current_user)
-        except:
-            pass  # Continue with cached data if refresh fails
-        # Get referral stats
-        referrals = ReferralLog.query.filter_by(referrer_id=current_user.id).all()
-        total_referrals = len(referrals)
-        referral_credits = len([r for r in referrals if r.credited]) * 10
-        
-        # Get conversions count
-        total_conversions = Conversion.query.filter_by(user_id=current_user.id).count()
-        
         # Get who referred this user
         referred_by = None
         if current_user.referred_by_code:
@@ -1040,9 +3382,9 @@ def get_profile():
             'total_credits': current_user.total_credits,
             'used_credits': current_user.used_credits,
             'available_credits': current_user.get_available_credits(),
-            'total_conversions': total_conversions,
-            'total_referrals': total_referrals,
-            'referral_credits': referral_credits,
+            'total_conversions': current_user.conversion_count,
+            'total_referrals': current_user.referral_count,
+            'referral_credits': current_user.referral_credits,
             'referred_by': referred_by
         }), 200
         
@@ -1050,6 +3392,26 @@ def get_profile():
         logger.error(f"Profile error: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/inspect', methods=['POST'])
+@login_required
+def inspect_pdf():
+    """Check an uploaded PDF against the conversion options without converting it or charging a credit"""
+    try:
+        if 'pdf_file' not in request.files:
+            return jsonify({'error': 'No file uploaded'}), 400
+
+        file = request.files['pdf_file']
+        validation_error = validate_pdf_upload(file)
+        if validation_error:
+            return jsonify({'error': validation_error}), 400
+
+        # Read straight from the upload stream: nothing is written to the upload folder
+        return jsonify(PDFConverter.inspect_pdf(file.stream, get_conversion_options(request.form))), 200
+
+    except Exception as e:
+        logger.error(f"Inspect error: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Could not inspect the PDF'}), 500
+
 @app.route('/upload', methods=['POST'])
 @login_required
 def upload_file():
@@ -1058,79 +3420,42 @@ def upload_file():
     task_id = None
     credit_deducted = False
     
+    out_of_credits = {
+        'error': 'out_of_credits',
+        'message': 'You have no credits left! Share your referral link to earn more.'
+    }
+    
     try:
-        # Thread-safe credit check and deduction
-        with credit_operation_lock:
-            # Refresh user data to prevent race conditions
-            db.session.refresh(current_user)
-            available_credits = current_user.get_available_credits()
-            
-            if available_credits < 1:
-                return jsonify({
-                    'error': 'out_of_credits',
-                    'message': 'You have no credits left! Share your referral link to earn more.',
-                    'referral_code': current_user.referral_code
-                }), 403
-            
-            # Validate file presence
-            if 'pdf_file' not in request.files:
-                return jsonify({'error': 'No file uploaded'}), 400
-            
-            file = request.files['pdf_file']
-            if file.filename == '' or file.filename is None:
-                return jsonify({'error': 'No file selected'}), 400
-            
-            if not file.filename.lower().endswith('.pdf'):
-                return jsonify({'error': 'Please upload a PDF file'}), 400
-            
-            # Validate MIME type
-            if file.content_type and file.content_type not in ['application/pdf', 'application/x-pdf']:
-                return jsonify({'error': 'Invalid file type. Please upload a PDF file'}), 400
-            
-            # Validate file size on backend (50MB limit)
-            file.seek(0, 2)  # Seek to end
-            file_size = file.tell()
-            file.seek(0)  # Reset to beginning
-            if file_size > 50 * 1024 * 1024:
-                return jsonify({'error': 'File size exceeds 50MB limit'}), 400
-            
-            if file_size == 0:
-                return jsonify({'error': 'File is empty'}), 400
-            # Save uploaded file
-            from werkzeug.utils import secure_filename
-
-            filename = secure_filename(file.filename or '')
-            if not filename:
-                filename = 'uploaded.pdf'
-
-            temp_filename = f"{uuid.uuid4().hex}_{filename}"
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
-            
-            # Verify path safety
-            if not safe_file_path(app.config['UPLOAD_FOLDER'], temp_filename):
-                return jsonify({'error': 'Invalid filename'}), 400
-            
-            file.save(filepath)
-            
-            # Deduct credit AFTER file is saved successfully
-            current_user.used_credits += 1
-            
-            # Log credit usage before commit for atomic operation
-            log_credit_transaction(current_user, -1, 'conversion', f'PDF conversion: {filename}')
-            db.session.commit()
-            credit_deducted = True
-            logger.info(f"Credit deducted for {current_user.email}. Remaining: {current_user.get_available_credits()}")
+        # Cheap early exit; the atomic deduction below is what actually enforces the balance
+        if current_user.get_available_credits() < 1:
+            return jsonify({**out_of_credits, 'referral_code': current_user.referral_code}), 403
+        
+        # Validate file presence
+        if 'pdf_file' not in request.files:
+            return jsonify({'error': 'No file uploaded'}), 400
+        
+        file = request.files['pdf_file']
+        validation_error = validate_pdf_upload(file)
+        if validation_error:
+            return jsonify({'error': validation_error}), 400
+        
+        # Save uploaded file (no lock or transaction held during file I/O)
+        filename, filepath = save_pdf_upload(file)
+        if not filepath:
+            return jsonify({'error': 'Invalid filename'}), 400
+        
+        # Deduct credit AFTER file is saved successfully: one conditional UPDATE plus ledger entry
+        credits_remaining = charge_credits(current_user.id, 1, 'conversion', f'PDF conversion: {filename}')
+        if credits_remaining is None:
+            os.remove(filepath)
+            filepath = None
+            return jsonify({**out_of_credits, 'referral_code': current_user.referral_code}), 403
+        credit_deducted = True
+        logger.info(f"Credit deducted for {current_user.email}. Remaining: {credits_remaining}")
         
         # Get conversion options from form
-        options = {
-            'page_range': request.form.get('page_range', 'all'),
-            'extract_mode': request.form.get('extract_mode', 'tables'),
-            'merge_tables': request.form.get('merge_tables') == 'true',
-            'include_headers': request.form.get('include_headers') == 'true',
-            'clean_data': request.form.get('clean_data') == 'true',
-            'password': request.form.get('password', ''),
-            'output_format': request.form.get('output_format', 'xlsx')
-        }
+        options = get_conversion_options(request.form)
+        memory_mb = PDFConverter.estimate_memory_mb(filepath, options)
         
         # Generate task ID
         task_id = str(uuid.uuid4())
@@ -1142,35 +3467,31 @@ def upload_file():
         conversion = Conversion(  # type: ignore[call-arg]
             user_id=current_user.id,
             filename=filename,
-            task_id=task_id
+            task_id=task_id,
+            estimated_memory_mb=memory_mb
         )
         db.session.add(conversion)
+        increment_user_counters(current_user.id, conversion_count=1)
         db.session.commit()
         
-        # Start conversion in background thread
-        thread = threading.Thread(
-            target=PDFConverter.convert_pdf,
-            args=(filepath, options, task_id),
-            daemon=True
-        )
-        thread.start()
+        # Queue conversion on the shared worker pool (held back while it doesn't fit the memory budget)
+        submit_conversion(PDFConverter.convert_pdf, filepath, options, task_id, memory_mb=memory_mb, task_id=task_id)
         
         return jsonify({
             'task_id': task_id,
-            'credits_remaining': current_user.get_available_credits()
+            'credits_remaining': credits_remaining
         }), 200
         
     except Exception as e:
         logger.error(f"Upload error: {str(e)}", exc_info=True)
+        db.session.rollback()
         
         # Refund credit on error if it was deducted
         if credit_deducted:
             try:
-                with credit_operation_lock:
-                    db.session.refresh(current_user)
-                    current_user.used_credits = max(0, current_user.used_credits - 1)
-                    log_credit_transaction(current_user, 1, 'refund', f'Refund due to upload error')
-                    db.session.commit()
+                if charge_credits(current_user.id, -1, 'refund', 'Refund due to upload error') is None:
+                    logger.error(f"Credit refund for user {current_user.id} did not apply")
+                else:
                     logger.info(f"Credit refunded for {current_user.email}")
             except Exception as refund_error:
                 logger.error(f"Failed to refund credit: {refund_error}")
@@ -1192,14 +3513,144 @@ def upload_file():
         
         return jsonify({'error': str(e)}), 500
 
+@app.route('/upload-batch', methods=['POST'])
+@login_required
+def upload_batch():
+    """Handle a multi-PDF upload: one credit transaction, parallel conversion, one combined output"""
+    saved_files = []
+    batch_id = None
+    credits_deducted = 0
+    
+    try:
+        files = request.files.getlist('pdf_files')
+        if not files:
+            return jsonify({'error': 'No files uploaded'}), 400
+        
+        if len(files) > MAX_BATCH_FILES:
+            return jsonify({'error': f'Too many files. A batch can contain at most {MAX_BATCH_FILES} PDFs'}), 400
+        
+        # Validate every file before charging anything
+        for file in files:
+            validation_error = validate_pdf_upload(file)
+            if validation_error:
+                return jsonify({'error': f'{file.filename or "File"}: {validation_error}'}), 400
+        
+        def out_of_credits(available_credits):
+            return jsonify({
+                'error': 'out_of_credits',
+                'message': f'This batch needs {len(files)} credits but you have {available_credits}. Share your referral link to earn more.',
+                'referral_code': current_user.referral_code,
+                'required_credits': len(files),
+                'available_credits': available_credits
+            }), 403
+        
+        # Cheap early exit; the atomic deduction below is what actually enforces the balance
+        if current_user.get_available_credits() < len(files):
+            return out_of_credits(current_user.get_available_credits())
+        
+        # Save every file first (no lock or transaction held during file I/O)
+        for file in files:
+            filename, filepath = save_pdf_upload(file)
+            if not filepath:
+                raise ValueError('Invalid filename')
+            saved_files.append((str(uuid.uuid4()), filepath, filename))
+        
+        # Deduct all credits in one conditional UPDATE plus ledger entry AFTER files are saved
+        credits_remaining = charge_credits(
+            current_user.id, len(saved_files), 'conversion', f'Batch PDF conversion: {len(saved_files)} files'
+        )
+        if credits_remaining is None:
+            for _, filepath, _ in saved_files:
+                os.remove(filepath)
+            saved_files = []
+            return out_of_credits(current_user.get_available_credits())
+        credits_deducted = len(saved_files)
+        logger.info(f"{credits_deducted} credits deducted for batch by {current_user.email}. Remaining: {credits_remaining}")
+        
+        # Shared options for every file in the batch
+        options = get_conversion_options(request.form)
+        memory_estimates = {
+            task_id: PDFConverter.estimate_memory_mb(filepath, options)
+            for task_id, filepath, _ in saved_files
+        }
+        
+        batch_id = str(uuid.uuid4())
+        with conversion_progress_lock:
+            now = datetime.now()
+            conversion_batches[batch_id] = {
+                'user_id': current_user.id,
+                'task_ids': [task_id for task_id, _, _ in saved_files]
+            }
+            conversion_progress[batch_id] = {'status': 'started', 'progress': 0, 'total_files': len(saved_files)}
+            task_timestamps[batch_id] = now
+            for task_id, _, _ in saved_files:
+                conversion_progress[task_id] = {'status': 'queued', 'progress': 0}
+                task_timestamps[task_id] = now
+        
+        # Log one conversion per file
+        for task_id, _, filename in saved_files:
+            db.session.add(Conversion(  # type: ignore[call-arg]
+                user_id=current_user.id,
+                filename=filename,
+                task_id=task_id,
+                estimated_memory_mb=memory_estimates[task_id]
+            ))
+        increment_user_counters(current_user.id, conversion_count=len(saved_files))
+        db.session.commit()
+        
+        # The coordinator only waits on the workers, so it gets its own thread
+        thread = threading.Thread(
+            target=PDFConverter.convert_batch,
+            args=(batch_id, saved_files, options, memory_estimates),
+            daemon=True
+        )
+        thread.start()
+        
+        return jsonify({
+            'task_id': batch_id,
+            'files': [{'task_id': task_id, 'filename': filename} for task_id, _, filename in saved_files],
+            'credits_remaining': credits_remaining
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Batch upload error: {str(e)}", exc_info=True)
+        db.session.rollback()
+        
+        # Refund credits on error if they were deducted
+        if credits_deducted:
+            try:
+                if charge_credits(current_user.id, -credits_deducted, 'refund', 'Refund due to batch upload error') is None:
+                    logger.error(f"Batch credit refund for user {current_user.id} did not apply")
+                else:
+                    logger.info(f"{credits_deducted} credits refunded for {current_user.email}")
+            except Exception as refund_error:
+                logger.error(f"Failed to refund credits: {refund_error}")
+        
+        # Clean up uploaded files on error
+        for _, filepath, _ in saved_files:
+            if os.path.exists(filepath):
+                try:
+                    os.remove(filepath)
+                except Exception as cleanup_error:
+                    logger.error(f"Failed to clean up file: {cleanup_error}")
+        
+        # Mark batch as failed if it was created
+        if batch_id:
+            with conversion_progress_lock:
+                conversion_progress[batch_id] = {
+                    'status': 'error',
+                    'message': 'Upload failed. Credits have been refunded.'
+                }
+        
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/progress/<task_id>')
 @login_required
 def get_progress(task_id):
     """Get conversion progress - only for user's own tasks"""
     try:
         # Verify task belongs to current user
-        conversion = Conversion.query.filter_by(task_id=task_id, user_id=current_user.id).first()
-        if not conversion:
+        if not user_owns_task(task_id, current_user.id):
             return jsonify({'status': 'not_found', 'message': 'Task not found or unauthorized'}), 404
         
         with conversion_progress_lock:
@@ -1222,23 +3673,21 @@ def download_file(filename):
         if not filename or '..' in filename or '/' in filename:
             return jsonify({'error': 'Invalid filename'}), 400
         
-        # Find the task that generated this file
+        # Find the tasks that generated this file (batch outputs are shared by several)
         with conversion_progress_lock:
-            user_task_id = None
-            for task_id, progress_data in conversion_progress.items():
-                if progress_data.get('output_file') == filename:
-                    # Verify this task belongs to the current user
-                    conversion = Conversion.query.filter_by(
-                        task_id=task_id,
-                        user_id=current_user.id
-                    ).first()
-                    if conversion:
-                        user_task_id = task_id
-                        break
-            
-            if not user_task_id:
-                logger.warning(f"Unauthorized download attempt: {current_user.email} tried to access {filename}")
-                return jsonify({'error': 'Unauthorized access'}), 403
+            candidate_task_ids = [
+                task_id for task_id, progress_data in conversion_progress.items()
+                if progress_data.get('output_file') == filename
+            ]
+        
+        # Verify one of them belongs to the current user
+        user_task_id = next(
+            (task_id for task_id in candidate_task_ids if user_owns_task(task_id, current_user.id)),
+            None
+        )
+        if not user_task_id:
+            logger.warning(f"Unauthorized download attempt: {current_user.email} tried to access {filename}")
+            return jsonify({'error': 'Unauthorized access'}), 403
         
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         
@@ -1251,6 +3700,9 @@ def download_file(filename):
             if filename.endswith('.xlsx'):
                 mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
                 download_name = 'converted.xlsx'
+            elif filename.endswith('.zip'):
+                mimetype = 'application/zip'
+                download_name = 'converted.zip'
             else:
                 mimetype = 'text/csv'
                 download_name = 'converted.csv'
@@ -1286,8 +3738,7 @@ def preview_data(task_id):
     """Get preview of converted data before download - user-isolated"""
     try:
         # Verify task belongs to current user
-        conversion = Conversion.query.filter_by(task_id=task_id, user_id=current_user.id).first()
-        if not conversion:
+        if not user_owns_task(task_id, current_user.id):
             return jsonify({'error': 'Unauthorized access'}), 403
         
         with conversion_results_lock:
@@ -1306,26 +3757,61 @@ def preview_data(task_id):
         logger.error(f"Preview error: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+# Page sizes of /history and /api/credit-history
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+def keyset_page(query, model):
+    """Fetch one newest-first page of a per-user query; returns (rows, next_cursor).
+
+    Pages are addressed by an opaque cursor holding the (timestamp, id) of the
+    last row served, so each page is an index range scan on
+    (user_id, timestamp, id) however deep the user pages. Reads the 'cursor'
+    and 'limit' query parameters; raises ValueError on a malformed cursor.
+    """
+    import base64
+    from sqlalchemy import tuple_
+
+    limit = max(1, min(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), HISTORY_MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            query = query.filter(tuple_(model.timestamp, model.id) < (datetime.fromisoformat(timestamp), int(row_id)))
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError('Invalid cursor') from e
+    
+    rows = query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = base64.urlsafe_b64encode(f"{last.timestamp.isoformat()}|{last.id}".encode()).decode()
+    return rows, next_cursor
+
 @app.route('/history')
 @login_required
+@read_replica
 def get_history():
-    """Get user's conversion history"""
+    """Get a page of the user's conversion history (newest first; pass next_cursor as ?cursor= for more)"""
     try:
         # Get conversions from database
-        conversions = Conversion.query.filter_by(user_id=current_user.id)\
-            .order_by(Conversion.timestamp.desc())\
-            .limit(50)\
-            .all()
+        try:
+            conversions, next_cursor = keyset_page(Conversion.query.filter_by(user_id=current_user.id), Conversion)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Snapshot the live status of this page's jobs under one lock acquisition
+        with conversion_progress_lock:
+            live = {
+                conv.task_id: (progress.get('status', 'completed'), progress.get('output_file'))
+                for conv in conversions if (progress := conversion_progress.get(conv.task_id))
+            }
         
         history = []
         for conv in conversions:
             task_id = conv.task_id
-            
-            # Get current status from memory if available
-            with conversion_progress_lock:
-                progress = conversion_progress.get(task_id, {})
-                status = progress.get('status', 'completed')  # Assume completed if not in memory
-                output_file = progress.get('output_file')
+            status, output_file = live.get(task_id, ('completed', None))  # Assume completed if not in memory
             
             history.append({
                 'task_id': task_id,
@@ -1336,7 +3822,7 @@ def get_history():
                 'can_download': status == 'completed' and output_file is not None
             })
         
-        return jsonify({'history': history}), 200
+        return jsonify({'history': history, 'next_cursor': next_cursor}), 200
         
     except Exception as e:
         logger.error(f"History error: {str(e)}", exc_info=True)
@@ -1353,6 +3839,7 @@ def admin_test():
 
 @app.route('/admin/check_credits', methods=['POST'])
 @csrf.exempt
+@read_replica
 def admin_check_credits():
     """Admin endpoint to check user credits - requires admin key"""
     try:
@@ -1406,40 +3893,42 @@ def admin_add_credits():
         email = request.json.get('email') if request.json else None  # type: ignore[union-attr]
         credits = request.json.get('credits', 0) if request.json else 0  # type: ignore[union-attr]
         add_to_all = request.json.get('add_to_all', False) if request.json else False  # type: ignore[union-attr]
+        bulk = bool(request.json.get('emails') or request.json.get('csv')) if request.json else False  # type: ignore[union-attr]
+        
+        if bulk:
+            # Explicit list / CSV of grants, applied set-based in batches
+            try:
+                grants = parse_credit_grants(request.json)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if not grants:
+                return jsonify({'error': 'No grants to apply'}), 400
+            
+            summary = grant_credits(grants)
+            logger.info(f"Admin granted credits to {summary['users_updated']} of {len(grants)} listed users")
+            return jsonify({
+                'success': 'error' not in summary,
+                'message': f"Granted {summary['credits_granted']} credits to {summary['users_updated']} users",
+                'requested': len(grants),
+                **summary
+            }), 200 if 'error' not in summary else 500
         
         if not isinstance(credits, int) or credits == 0:
             return jsonify({'error': 'Invalid credits amount'}), 400
         
         if not email and not add_to_all:
-            return jsonify({'error': 'Email or add_to_all required'}), 400
+            return jsonify({'error': 'Email, emails, csv or add_to_all required'}), 400
         
         if add_to_all:
-            # Add credits to all users
-            users = User.query.all()
-            updated_users = []
-            
-            for user in users:
-                old_total = user.total_credits
-                user.total_credits += credits
-                # Log transaction before commit for atomic operation
-                log_credit_transaction(user, credits, 'purchase', f'Admin credit purchase - {credits} credits')
-                updated_users.append({
-                    'email': user.email,
-                    'old_total': old_total,
-                    'new_total': user.total_credits,
-                    'available': user.get_available_credits()
-                })
-            
-            db.session.commit()
-            # Expire all cached user objects so logged-in users see updated credits
-            db.session.expire_all()
-            logger.info(f"Admin added {credits} credits to all {len(users)} users")
+            # Add credits to all users, set-based in batches (only a summary is returned)
+            summary = grant_credits(credits=credits)
+            logger.info(f"Admin added {credits} credits to all {summary['users_updated']} users")
             
             return jsonify({
-                'success': True,
-                'message': f'Added {credits} credits to all {len(users)} users',
-                'updated_users': updated_users
-            }), 200
+                'success': 'error' not in summary,
+                'message': f"Added {credits} credits to all {summary['users_updated']} users",
+                **summary
+            }), 200 if 'error' not in summary else 500
         else:
             # Validate email
             if not validate_email(email):
@@ -1477,21 +3966,51 @@ def admin_add_credits():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/admin/reconcile_counters', methods=['POST'])
+@csrf.exempt
+def admin_reconcile_counters():
+    """Admin endpoint to repair drifted usage counters - requires admin key"""
+    try:
+        admin_key = request.json.get('admin_key', '').strip() if request.json else ''  # type: ignore[union-attr]
+        expected_key = os.environ.get('ADMIN_KEY', 'your_secure_admin_key_here').strip()
+
+        if not admin_key or admin_key != expected_key:
+            logger.warning(f"Unauthorized admin reconcile attempt")
+            return jsonify({'error': 'Unauthorized - Invalid admin key'}), 403
+
+        repaired = reconcile_user_counters()
+        return jsonify({'success': True, 'repaired_users': repaired}), 200
+
+    except Exception as e:
+        logger.error(f"Reconcile counters error: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create/upgrade the schema and print its version (for SCHEMA_VERSION)"""
+    _init_database(force=True)
+    if not _db_initialized:
+        raise SystemExit(1)
+    print(schema_version())
+
+@app.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Repair drifted per-user conversion and referral counters"""
+    repaired = reconcile_user_counters()
+    print(f"Repaired usage counters of {repaired} users")
+
 @app.route('/api/credit-history')
 @login_required
+@read_replica
 def get_credit_history():
-    """Get user's credit transaction history"""
+    """Get a page of the user's credit transaction history (newest first; pass next_cursor as ?cursor= for more)"""
     try:
-        # Force fresh data from database
         try:
-            db.session.expire(current_user)
-            db.session.refresh(current_user)
-        except:
-            pass  # Continue with cached data if refresh fails
-        transactions = CreditTransaction.query.filter_by(user_id=current_user.id)\
-            .order_by(CreditTransaction.timestamp.desc())\
-            .limit(50)\
-            .all()
+            transactions, next_cursor = keyset_page(
+                CreditTransaction.query.filter_by(user_id=current_user.id), CreditTransaction
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         history = []
         for t in transactions:
@@ -1506,6 +4025,7 @@ def get_credit_history():
         
         return jsonify({
             'history': history,
+            'next_cursor': next_cursor,
             'current_balance': current_user.get_available_credits()
         }), 200
         
@@ -1547,6 +4067,7 @@ def cleanup_old_files():
                     del conversion_progress[task_id]
                 if task_id in task_timestamps:
                     del task_timestamps[task_id]
+                conversion_batches.pop(task_id, None)
                 deleted_tasks += 1
         
         # Clean up old conversion results
@@ -1590,6 +4111,22 @@ def admin_panel():
     """Render the admin panel interface"""
     return render_template('admin.html')
 
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus metrics - requires the admin key (Authorization: Bearer <key> or X-Admin-Key header)"""
+    expected_key = os.environ.get('ADMIN_KEY', '').strip()
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        admin_key = authorization[len('Bearer '):].strip()
+    else:
+        admin_key = request.headers.get('X-Admin-Key', '').strip()
+
+    if not expected_key or not admin_key or not secrets.compare_digest(admin_key, expected_key):
+        logger.warning(f"Unauthorized metrics access attempt from {request.remote_addr}")
+        return jsonify({'error': 'Unauthorized - Invalid admin key'}), 403
+
+    return app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/test-db-connection')
 def test_db_connection():
     """Test endpoint to verify database connection"""
@@ -1647,6 +4184,7 @@ def test_db_connection():
             'database_url': masked_url,
             'port': port,
             'database_url_set': bool(os.environ.get('DATABASE_URL')),
+            'db_pool_mode': DB_POOL_MODE,
             'vercel_env': bool(os.environ.get('VERCEL'))
         }), 200
         
@@ -1682,6 +4220,7 @@ def test_db_connection():
             'database_url': masked_url,
             'port': port,
             'database_url_set': bool(os.environ.get('DATABASE_URL')),
+            'db_pool_mode': DB_POOL_MODE,
             'vercel_env': bool(os.environ.get('VERCEL'))
         }), 500
 
@@ -0,0 +1,129 @@
+"""Response compression benchmark: bytes and latency saved per endpoint.
+
+Sets up a user with a full page of conversion and credit history and a
+converted file's preview (50 rows x --columns), then requests the main page,
+the JSON endpoints and the static bundles with each encoding through the
+Flask test client. For every endpoint it reports the response size, the
+server time, and the estimated time to fetch it over a slow link
+(--bandwidth-kbps, one --rtt-ms round trip). The saving is the transfer time
+saved minus the extra server time spent compressing.
+
+Usage:
+    python benchmarks/bench_compression.py [--runs 20] [--columns 12] [--bandwidth-kbps 1600] [--rtt-ms 150]
+"""
+import argparse
+import logging
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'bench-compression-1'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20, help='requests per endpoint and encoding')
+    parser.add_argument('--columns', type=int, default=12, help='columns of the preview table')
+    parser.add_argument('--bandwidth-kbps', type=float, default=1600, help='link speed for the transfer estimate')
+    parser.add_argument('--rtt-ms', type=float, default=150, help='round trip added to each transfer estimate')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='jdt-bench-compression-')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(work_dir, 'compression.db')}",
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'RATE_LIMIT_ENABLED': '0',
+    })
+    sys.path.insert(0, ROOT)
+    logging.disable(logging.CRITICAL)
+
+    try:
+        import app as app_module
+        from sqlalchemy import insert
+
+        app, db = app_module.app, app_module.db
+        app.config['WTF_CSRF_ENABLED'] = False
+        email = f"compression-{uuid.uuid4().hex[:8]}@example.com"
+        task_id = uuid.uuid4().hex
+
+        with app.app_context():
+            app_module._init_database(force=True)
+            user = app_module.User(  # type: ignore[call-arg]
+                email=email, referral_code=app_module.User.generate_referral_code(),
+                total_credits=500, used_credits=0
+            )
+            user.set_password(PASSWORD)
+            app_module.add_new_user(user)
+            db.session.commit()
+            start = datetime.utcnow() - timedelta(days=30)
+            db.session.execute(insert(app_module.Conversion), [{
+                'user_id': user.id,
+                'filename': f"statement-{i:03d}-{uuid.uuid4().hex[:6]}.pdf",
+                'timestamp': start + timedelta(hours=i),
+                'task_id': task_id if i == 0 else uuid.uuid4().hex,
+            } for i in range(app_module.HISTORY_PAGE_SIZE)])
+            db.session.execute(insert(app_module.CreditTransaction), [{
+                'user_id': user.id,
+                'amount': -1,
+                'transaction_type': 'conversion',
+                'description': f"Converted statement-{i:03d}.pdf",
+                'timestamp': start + timedelta(hours=i),
+                'balance_after': 500 - i,
+            } for i in range(app_module.HISTORY_PAGE_SIZE)])
+            db.session.commit()
+
+        def cell(row, col):
+            return [f"2024-{row % 12 + 1:02d}-{row % 28 + 1:02d}", f"PAYMENT TO VENDOR {row * 37 % 101}",
+                    f"REF{row * 7919:08d}", f"{row * 13.37:.2f}", '', f"{10000 - row * 13.37:.2f}"][col % 6]
+
+        columns = ['Date', 'Description', 'Reference', 'Debit', 'Credit', 'Balance']
+        app_module.conversion_results[task_id] = {'preview_data': {
+            'columns': [columns[col % 6] for col in range(args.columns)],
+            'rows': [[cell(row, col) for col in range(args.columns)] for row in range(50)],
+            'total_rows': 400,
+        }}
+
+        client = app.test_client()
+        client.post('/auth/login', json={'email': email, 'password': PASSWORD})
+        html = client.get('/').get_data(as_text=True)
+        assets = re.findall(r'(?:href|src)="(/static/[^"]+)"', html)
+        endpoints = ['/', '/history', '/api/credit-history', f"/preview-data/{task_id}", '/api/dashboard'] + assets
+
+        encodings = ['identity', 'gzip'] + (['br'] if app_module.brotli else [])
+        bytes_per_ms = args.bandwidth_kbps * 1000 / 8 / 1000
+
+        print(f"link: {args.bandwidth_kbps:.0f} kbit/s, {args.rtt_ms:.0f} ms RTT; "
+              f"{args.runs} runs each; encodings: {', '.join(encodings)}")
+        print(f"{'endpoint':<42} {'encoding':<9} {'bytes':>9} {'ratio':>6} {'server ms':>10} {'fetch ms':>9} {'saved ms':>9}")
+        for endpoint in endpoints:
+            baseline = None
+            for encoding in encodings:
+                timings, size = [], 0
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    response = client.get(endpoint, headers={'Accept-Encoding': encoding})
+                    timings.append((time.perf_counter() - started) * 1000)
+                    size = len(response.get_data())
+                    if response.status_code != 200:
+                        sys.exit(f"{endpoint}: HTTP {response.status_code}")
+                served = response.headers.get('Content-Encoding', 'identity')
+                server_ms = statistics.median(timings)
+                fetch_ms = server_ms + args.rtt_ms + size / bytes_per_ms
+                if baseline is None:
+                    baseline = (size, fetch_ms)
+                label = endpoint if len(endpoint) <= 42 else endpoint[:39] + '...'
+                print(f"{label:<42} {served:<9} {size:>9,} {size / baseline[0]:>6.2f} {server_ms:>10.2f} "
+                      f"{fetch_ms:>9.1f} {baseline[1] - fetch_ms:>9.1f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""Conversion micro-benchmarks over the synthetic PDF corpus.
+
+Times every stage of PDFConverter.convert_pdf (open, layout, extract_tables,
+extract_text, deduplicate_headers, dataframe, clean_dataframe, xlsx and csv
+write, the streaming text engine) plus the end-to-end conversion, and records
+peak traced memory. Results are saved as JSON; ``compare`` flags stages that
+got slower (or hungrier) than a stored baseline.
+
+Conversions use the form's default options, so merge_tables is off. With
+--merge tables are stitched across pages, which adds the merge stage and
+builds fewer, larger DataFrames. Only compare runs made with the same setting.
+
+Usage:
+    python benchmarks/bench_convert.py run [--output results.json] [--repeat 5] [--scale 1] [--only ruled_small,text_only] [--merge]
+    python benchmarks/bench_convert.py compare baseline.json results.json [--threshold 0.15]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logging.disable(logging.CRITICAL)
+
+import pandas as pd  # noqa: E402
+import pdfplumber  # noqa: E402
+
+from app import PDFConverter, TableStitcher, app  # noqa: E402
+from corpus import CORPUS, write_corpus  # noqa: E402
+
+# Extraction mode benchmarked for each corpus layout
+LAYOUT_MODES = {'ruled': 'tables', 'borderless': 'tables', 'text': 'text', 'mixed': 'both'}
+
+BASE_OPTIONS = {
+    'page_range': 'all',
+    'include_headers': True,
+    'clean_data': True,
+    'merge_tables': False,
+    'text_rows': 'pages',
+}
+
+
+class StageTimer:
+    """Accumulates wall-clock seconds per stage for one run"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+
+def run_stages(path, options):
+    """Run the conversion pipeline stage by stage; returns {stage: seconds}"""
+    timer = StageTimer()
+    mode = options['extract_mode']
+
+    if mode == 'text':
+        # Text-only conversions stream through the pdfminer engine, so extraction and writing interleave
+        for output_format in ['xlsx', 'csv']:
+            with timer.stage(f'text_stream_{output_format}'):
+                pages = PDFConverter.iter_text_pages(path, options, 'bench')
+                output_path, _, _, _ = PDFConverter.write_text_stream(pages, {**options, 'output_format': output_format})
+            os.remove(output_path)
+        return dict(timer.seconds)
+
+    tables = []
+    text = []
+    password = options.get('password') or None
+    stitcher = TableStitcher() if options['merge_tables'] else None
+
+    def add_table(table):
+        with timer.stage('deduplicate_headers'):
+            headers = PDFConverter.deduplicate_headers(table[0])
+        with timer.stage('dataframe'):
+            df = pd.DataFrame(table[1:], columns=headers)
+        with timer.stage('clean_dataframe'):
+            df = PDFConverter.clean_dataframe(df)
+        if not df.empty:
+            tables.append(df)
+
+    with timer.stage('open'):
+        pdf = pdfplumber.open(path, password=password)
+        pages = list(pdf.pages)
+
+    try:
+        for page in pages:
+            with timer.stage('layout'):
+                page.chars
+
+            with timer.stage('extract_tables'):
+                raw_tables, _ = PDFConverter.extract_page(page, 'tables')
+
+            if mode == 'both':
+                with timer.stage('extract_text'):
+                    page_text = page.extract_text()
+                if page_text:
+                    text.append({'Page': page.page_number, 'Text': page_text})
+
+            # With merge_tables on, fragments continuing across pages are stitched as they arrive
+            for table_index, table in enumerate(raw_tables):
+                if not table:
+                    continue
+                if stitcher:
+                    with timer.stage('merge'):
+                        finished = stitcher.add(table, page.page_number, table_index == 0)
+                else:
+                    finished = [table]
+                for finished_table in finished:
+                    add_table(finished_table)
+    finally:
+        pdf.close()
+
+    for finished_table in stitcher.finish() if stitcher else []:
+        add_table(finished_table)
+
+    if not tables and not text:
+        # convert_pdf stops with a no_data error before writing anything
+        return dict(timer.seconds)
+
+    for output_format in ['xlsx', 'csv']:
+        with timer.stage(f'write_{output_format}'):
+            output_path, _ = PDFConverter.write_output(tables, text, {**options, 'output_format': output_format})
+        os.remove(output_path)
+
+    return dict(timer.seconds)
+
+
+def run_end_to_end(path, options, work_dir):
+    """Time PDFConverter.convert_pdf on a copy of the file (it deletes its input)"""
+    copy_path = os.path.join(work_dir, f"{uuid.uuid4().hex}.pdf")
+    shutil.copyfile(path, copy_path)
+    start = time.perf_counter()
+    output_path = PDFConverter.convert_pdf(copy_path, options, f'bench-{uuid.uuid4().hex}')
+    elapsed = time.perf_counter() - start
+    if output_path and os.path.exists(output_path):
+        os.remove(output_path)
+    return elapsed
+
+
+def peak_memory_mb(path, options, work_dir):
+    """Peak traced Python memory of one end-to-end conversion"""
+    tracemalloc.start()
+    try:
+        run_end_to_end(path, options, work_dir)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def benchmark(args):
+    work_dir = tempfile.mkdtemp(prefix='jdt-bench-')
+    app.config['UPLOAD_FOLDER'] = work_dir
+    names = args.only.split(',') if args.only else None
+
+    try:
+        corpus = write_corpus(os.path.join(work_dir, 'corpus'), args.scale, names)
+        results = {}
+
+        for name, (path, spec) in corpus.items():
+            options = {
+                **BASE_OPTIONS,
+                'merge_tables': args.merge,
+                'extract_mode': LAYOUT_MODES[spec['layout']],
+                'password': spec.get('password', ''),
+                'output_format': 'xlsx',
+            }
+
+            stage_runs = defaultdict(list)
+            totals = []
+            for _ in range(args.repeat):
+                for stage, seconds in run_stages(path, options).items():
+                    stage_runs[stage].append(seconds)
+                totals.append(run_end_to_end(path, options, work_dir))
+
+            page_count = max(1, int(spec['pages'] * args.scale))
+            total = statistics.median(totals)
+            results[name] = {
+                'pages': page_count,
+                'mode': options['extract_mode'],
+                'stages': {stage: statistics.median(runs) for stage, runs in stage_runs.items()},
+                'total': total,
+                'pages_per_second': page_count / total if total else None,
+                'peak_memory_mb': peak_memory_mb(path, options, work_dir),
+            }
+            print(f"{name:<24} {options['extract_mode']:<7} {total:>8.3f}s  {results[name]['peak_memory_mb']:>7.1f} MB")
+
+        return {
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'pdfplumber': pdfplumber.__version__,
+                'pandas': pd.__version__,
+                'repeat': args.repeat,
+                'scale': args.scale,
+                'merge_tables': args.merge,
+            },
+            'results': results,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare(baseline, current, threshold, min_delta):
+    """Return a list of regression descriptions (empty if none)"""
+    regressions = []
+    for name, base in baseline['results'].items():
+        cur = current['results'].get(name)
+        if cur is None:
+            continue
+
+        checks = [(f'stage {stage}', seconds, cur['stages'].get(stage), min_delta) for stage, seconds in base['stages'].items()]
+        checks.append(('total', base['total'], cur['total'], min_delta))
+        checks.append(('peak memory (MB)', base['peak_memory_mb'], cur['peak_memory_mb'], 1.0))
+
+        for label, old, new, floor in checks:
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0
+            marker = ''
+            if change > threshold and new - old > floor:
+                marker = '  REGRESSION'
+                regressions.append(f"{name}: {label} {old:.4f} -> {new:.4f} (+{change:.0%})")
+            print(f"{name:<24} {label:<28} {old:>9.4f} {new:>9.4f} {change:>+7.0%}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks and save JSON results')
+    run_parser.add_argument('--output', default=None, help='results file (default: bench-<timestamp>.json)')
+    run_parser.add_argument('--repeat', type=int, default=5, help='runs per document (median is kept)')
+    run_parser.add_argument('--scale', type=float, default=1, help='multiply every document\'s page count')
+    run_parser.add_argument('--only', default='', help='comma-separated corpus documents to run')
+    run_parser.add_argument('--merge', action='store_true', help='convert with merge_tables on (stitches tables across pages)')
+
+    compare_parser = subparsers.add_parser('compare', help='compare results against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.15, help='allowed relative slowdown')
+    compare_parser.add_argument('--min-delta', type=float, default=0.005, help='ignore slowdowns smaller than this many seconds')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        unknown = set(filter(None, args.only.split(','))) - set(CORPUS)
+        if unknown:
+            parser.error(f"unknown corpus documents: {', '.join(sorted(unknown))}")
+        results = benchmark(args)
+        output = args.output or f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved {output}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        # Results from before the --merge option were always recorded with merging on
+        merge_settings = [results['meta'].get('merge_tables', True) for results in (baseline, current)]
+        if merge_settings[0] != merge_settings[1]:
+            print(f"WARNING: baseline ran with merge_tables={merge_settings[0]}, current with merge_tables={merge_settings[1]}; "
+                  "table stages are not comparable\n")
+        regressions = compare(baseline, current, args.threshold, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == '__main__':
+    main()
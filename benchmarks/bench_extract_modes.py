@@ -0,0 +1,86 @@
+"""Compare extraction cost of the "tables", "text" and "both" modes.
+
+Runs each mode per PDF with pdfplumber's page.extract_tables() /
+page.extract_text() calls (the previous code path) and with
+PDFConverter.extract_page(), which reads table cells from a per-page index of
+the characters; text goes through page.extract_text() on both sides, so the
+"text" rows show the measurement noise. The two paths alternate runs and the
+garbage collector is paused while timing. Outputs are checked to be identical.
+
+Usage:
+    python benchmarks/bench_extract_modes.py statement.pdf [more.pdf ...] [--repeat 5]
+"""
+import argparse
+import gc
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+import pdfplumber  # noqa: E402
+
+from app import PDFConverter  # noqa: E402
+
+MODES = ["tables", "text", "both"]
+
+
+def separate_calls(page, mode):
+    """The previous per-page extraction: each call does its own pass"""
+    tables = page.extract_tables() if mode in ["tables", "both"] else []
+    text = page.extract_text() if mode in ["text", "both"] else None
+    return tables, text
+
+
+def time_run(pdf_path, mode, extractor):
+    """Seconds to parse and then extract every page, and the extracted results"""
+    with pdfplumber.open(pdf_path) as pdf:
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for page in pdf.pages:
+                page.chars  # Parse the layout first so it is timed separately
+            parsed = time.perf_counter()
+            results = [extractor(page, mode) for page in pdf.pages]
+            done = time.perf_counter()
+        finally:
+            gc.enable()
+    return (parsed - start, done - parsed), results
+
+
+def time_mode(pdf_path, mode, repeat):
+    """Best-of-N (parse, separate, indexed) seconds, each the fastest run of its own, alternating the two paths, and both results"""
+    best = {}
+    results = {}
+    for _ in range(repeat):
+        for name, extractor in [('separate', separate_calls), ('indexed', PDFConverter.extract_page)]:
+            timing, results[name] = time_run(pdf_path, mode, extractor)
+            best[name] = tuple(map(min, zip(best.get(name, timing), timing)))
+    return (best['separate'][0], best['separate'][1], best['indexed'][1]), results['separate'], results['indexed']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pdfs', nargs='+', help='PDF files to benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per mode and path (best is reported)')
+    args = parser.parse_args()
+
+    print(f"{'file':<30} {'mode':<7} {'parse s':>8} {'separate s':>11} {'indexed s':>10} {'speedup':>8}")
+    for pdf_path in args.pdfs:
+        for mode in MODES:
+            (parse, old, new), old_results, new_results = time_mode(pdf_path, mode, args.repeat)
+
+            if old_results != new_results:
+                print(f"MISMATCH: {pdf_path} ({mode}) indexed extraction differs from pdfplumber output")
+                sys.exit(1)
+
+            speedup = old / new if new else float('inf')
+            print(f"{os.path.basename(pdf_path)[:30]:<30} {mode:<7} {parse:>8.3f} {old:>11.3f} {new:>10.3f} {speedup:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""PDF inspection benchmark: inspection time and ETA against the real conversion.
+
+For every corpus document, runs PDFConverter.inspect_pdf and then the full
+PDFConverter.convert_pdf with the same options, and reports the inspection
+time as a share of the conversion and the ETA next to the measured time.
+Fails (exit 1) if:
+
+  - an inspection of a document with at least --min-pages selected pages takes
+    more than --max-share of its conversion time
+  - an encrypted document isn't reported as password_required without the
+    password, or as wrong_password with a wrong one
+
+Usage:
+    python benchmarks/bench_inspect.py [--scale 2] [--max-share 0.25] [--min-pages 20]
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logging.disable(logging.CRITICAL)
+
+from app import PDFConverter, app  # noqa: E402
+from bench_convert import BASE_OPTIONS, LAYOUT_MODES  # noqa: E402
+from corpus import write_corpus  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=1, help='corpus size multiplier')
+    parser.add_argument('--max-share', type=float, default=0.25, help='largest inspection/conversion time ratio')
+    parser.add_argument('--min-pages', type=int, default=20, help='selected pages from which --max-share applies')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='jdt-bench-inspect-')
+    app.config['UPLOAD_FOLDER'] = work_dir
+    problems = []
+
+    try:
+        corpus = write_corpus(os.path.join(work_dir, 'corpus'), args.scale)
+        print(f"{'document':<24} {'mode':<7} {'pages':>5} {'inspect s':>10} {'convert s':>10} {'share':>6} {'eta s':>6} {'text':>5} {'tables/pg':>10}")
+        for name, (path, spec) in corpus.items():
+            options = {
+                **BASE_OPTIONS,
+                'extract_mode': LAYOUT_MODES[spec['layout']],
+                'password': spec.get('password', ''),
+                'output_format': 'xlsx',
+            }
+
+            if spec.get('password'):
+                for password, expected in [('', 'password_required'), (spec['password'] + 'x', 'wrong_password')]:
+                    error_type = PDFConverter.inspect_pdf(path, {**options, 'password': password}).get('error_type')
+                    if error_type != expected:
+                        problems.append(f"{name}: {error_type} with password {password!r}, expected {expected}")
+
+            report = PDFConverter.inspect_pdf(path, options)
+            if report['status'] != 'ok':
+                problems.append(f"{name}: inspection failed with {report['error_type']}")
+                continue
+
+            copy_path = os.path.join(work_dir, f"{uuid.uuid4().hex}.pdf")
+            shutil.copyfile(path, copy_path)
+            start = time.perf_counter()
+            output_path = PDFConverter.convert_pdf(copy_path, options, f'bench-{uuid.uuid4().hex}')
+            convert_seconds = time.perf_counter() - start
+            if output_path and os.path.exists(output_path):
+                os.remove(output_path)
+
+            share = report['inspect_seconds'] / convert_seconds
+            tables = '-' if report['tables_per_page'] is None else f"{report['tables_per_page']:.2f}"
+            print(f"{name:<24} {options['extract_mode']:<7} {report['selected_pages']:>5} {report['inspect_seconds']:>10.3f} "
+                  f"{convert_seconds:>10.3f} {share:>6.2f} {report['eta_seconds']:>6.1f} {'yes' if report['has_text'] else 'no':>5} {tables:>10}")
+            if report['selected_pages'] >= args.min_pages and share > args.max_share:
+                problems.append(f"{name}: inspection took {share:.0%} of the conversion time")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK: inspections well under conversion time, password problems caught before converting")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""Login throughput benchmark for the password hashing pool.
+
+Creates users on a throwaway SQLite database, then logs them in from many
+client threads through the Flask test client for a fixed time. Reports logins
+per second, logins per second per hashing core, latency percentiles and 503
+rejections. While the burst runs, a probe thread keeps calling a cheap
+endpoint, to show how far auth load slows everything else. With
+--legacy-method the users start with hashes from older parameters, so their
+first logins also exercise the transparent rehash.
+
+Also prints the single-thread cost of each hash setting in --methods, which
+bounds logins/sec/core for that setting.
+
+Usage:
+    python benchmarks/bench_login.py [--users 50] [--threads 16] [--duration 10] [--workers 2]
+                                     [--method pbkdf2:sha256:600000] [--legacy-method pbkdf2:sha256:260000]
+                                     [--methods pbkdf2:sha256:600000,scrypt]
+"""
+import argparse
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'bench-password-1'
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def hash_cost(methods, rounds=3):
+    """Median seconds to hash one password with each method on this thread"""
+    from werkzeug.security import generate_password_hash
+
+    costs = {}
+    for method in methods:
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            generate_password_hash(PASSWORD, method)
+            timings.append(time.perf_counter() - start)
+        costs[method] = statistics.median(timings)
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=16, help='concurrent login clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of login burst')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help='PASSWORD_HASH_WORKERS for the run')
+    parser.add_argument('--queue', type=int, default=None, help='PASSWORD_HASH_QUEUE (default: enough for every thread)')
+    parser.add_argument('--method', default='pbkdf2:sha256:600000', help='PASSWORD_HASH_METHOD for the run')
+    parser.add_argument('--legacy-method', default='', help='hash the users with this method first (exercises rehash)')
+    parser.add_argument('--methods', default='', help='comma-separated hash methods to cost on one thread')
+    args = parser.parse_args()
+
+    if args.methods:
+        print("Single-thread hash cost:")
+        for method, seconds in hash_cost(args.methods.split(',')).items():
+            print(f"  {method:<28} {seconds * 1000:8.1f} ms  -> at most {1 / seconds:6.1f} logins/sec/core")
+        print()
+
+    work_dir = tempfile.mkdtemp(prefix='jdt-bench-login-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'login.db')}"
+    os.environ['PASSWORD_HASH_WORKERS'] = str(args.workers)
+    os.environ['PASSWORD_HASH_QUEUE'] = str(args.queue if args.queue is not None else args.threads)
+    os.environ['PASSWORD_HASH_METHOD'] = args.method
+    os.environ['RATE_LIMIT_ENABLED'] = '0'  # Every client logs in from one address
+    sys.path.insert(0, ROOT)
+    logging.disable(logging.CRITICAL)
+
+    try:
+        import app as app_module
+        from sqlalchemy import insert
+        from werkzeug.security import generate_password_hash
+
+        app = app_module.app
+        app.config['WTF_CSRF_ENABLED'] = False  # In-process clients; the benchmark is about hashing
+        User, db = app_module.User, app_module.db
+
+        stored_hash = generate_password_hash(PASSWORD, args.legacy_method or args.method)
+        emails = [f"login-{i}@example.com" for i in range(args.users)]
+        with app.app_context():
+            app_module._init_database()
+            db.session.execute(insert(User), [{
+                'email': email,
+                'password': stored_hash,
+                'referral_code': f"L{i:07d}",
+                'total_credits': 20,
+                'used_credits': 0,
+            } for i, email in enumerate(emails)])
+            db.session.commit()
+
+        # Probe latency with no auth load, for comparison
+        probe_client = app.test_client()
+        baseline = []
+        deadline = time.perf_counter() + 1
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            probe_client.get('/api/dashboard')
+            baseline.append(time.perf_counter() - start)
+
+        latencies, statuses = [], {}
+        probe = []
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def login_loop(index):
+            client = app.test_client()
+            n = index
+            while not stop.is_set():
+                email = emails[n % len(emails)]
+                n += args.threads
+                start = time.perf_counter()
+                response = client.post('/auth/login', json={'email': email, 'password': PASSWORD})
+                elapsed = time.perf_counter() - start
+                client.post('/auth/logout')
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        def probe_loop():
+            while not stop.is_set():
+                start = time.perf_counter()
+                probe_client.get('/api/dashboard')
+                probe.append(time.perf_counter() - start)
+                time.sleep(0.01)
+
+        threads = [threading.Thread(target=login_loop, args=(i,)) for i in range(args.threads)]
+        threads.append(threading.Thread(target=probe_loop))
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        logins = statuses.get(200, 0)
+        cores = min(args.workers, os.cpu_count() or 1)
+        print(f"method {args.method}, {args.workers} hashing workers, {args.threads} clients, {elapsed:.1f}s")
+        print(f"logins: {logins} ok ({logins / elapsed:.1f}/s, {logins / elapsed / cores:.1f}/s per hashing core)")
+        print(f"responses: {dict(sorted(statuses.items()))}")
+        print(f"login latency  p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  "
+              f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms")
+        print(f"probe latency  p50 {percentile(baseline, 0.5) * 1000:7.1f} ms idle -> "
+              f"{percentile(probe, 0.5) * 1000:7.1f} ms under load (p95 {percentile(probe, 0.95) * 1000:.1f} ms)")
+
+        if args.legacy_method:
+            with app.app_context():
+                upgraded = User.query.filter(User.password != stored_hash).count()
+            print(f"rehashed: {upgraded} of {args.users} users now use {args.method}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""Deterministic synthetic PDF corpus for conversion benchmarks.
+
+Writes small hand-built PDFs (no third-party dependencies, no network) with
+ruled tables, borderless tables, text-only pages and password-protected
+variants. The same spec always produces byte-identical files, so timings are
+comparable between runs and machines.
+
+Usage:
+    python benchmarks/corpus.py OUTPUT_DIR [--scale 2]
+"""
+import argparse
+import hashlib
+import os
+import random
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 40
+
+WORDS = (
+    "account balance credit debit ledger interest statement monthly opening "
+    "closing transfer deposit withdrawal invoice payment reference branch "
+    "summary total charges fee period customer"
+).split()
+
+# Corpus documents: name -> generation parameters
+CORPUS = {
+    'ruled_small': {'pages': 5, 'layout': 'ruled', 'rows': 20, 'cols': 5},
+    'ruled_wide': {'pages': 5, 'layout': 'ruled', 'rows': 40, 'cols': 12},
+    'ruled_long': {'pages': 50, 'layout': 'ruled', 'rows': 30, 'cols': 6},
+    'borderless': {'pages': 5, 'layout': 'borderless', 'rows': 25, 'cols': 6},
+    'text_only': {'pages': 20, 'layout': 'text'},
+    'mixed': {'pages': 10, 'layout': 'mixed', 'rows': 20, 'cols': 5},
+    'ruled_small_encrypted': {'pages': 5, 'layout': 'ruled', 'rows': 20, 'cols': 5, 'password': 'secret'},
+    'text_only_encrypted': {'pages': 20, 'layout': 'text', 'password': 'secret'},
+}
+
+# Standard security handler padding string (PDF 1.7, 7.6.3.3)
+PASSWORD_PADDING = bytes([
+    0x28, 0xBF, 0x4E, 0x5E, 0x4E, 0x75, 0x8A, 0x41, 0x64, 0x00, 0x4E, 0x56,
+    0xFF, 0xFA, 0x01, 0x08, 0x2E, 0x2E, 0x00, 0xB6, 0xD0, 0x68, 0x3E, 0x80,
+    0x2F, 0x0C, 0xA9, 0xFE, 0x64, 0x53, 0x69, 0x7A,
+])
+
+
+def rc4(key, data):
+    """Plain RC4, as used by the PDF standard security handler"""
+    state = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j + state[i] + key[i % len(key)]) % 256
+        state[i], state[j] = state[j], state[i]
+    out = bytearray()
+    i = j = 0
+    for byte in data:
+        i = (i + 1) % 256
+        j = (j + state[i]) % 256
+        state[i], state[j] = state[j], state[i]
+        out.append(byte ^ state[(state[i] + state[j]) % 256])
+    return bytes(out)
+
+
+class StandardEncryption:
+    """RC4 128-bit (V=2, R=3) encryption with a user password and no owner restrictions"""
+
+    permissions = -4  # All permissions granted
+
+    def __init__(self, user_password, file_id):
+        self.file_id = file_id
+        padded_user = (user_password.encode('latin-1') + PASSWORD_PADDING)[:32]
+
+        # Owner entry (Algorithm 3), owner password = user password
+        digest = hashlib.md5(padded_user).digest()
+        for _ in range(50):
+            digest = hashlib.md5(digest).digest()
+        owner_value = rc4(digest, padded_user)
+        for i in range(1, 20):
+            owner_value = rc4(bytes(b ^ i for b in digest), owner_value)
+        self.owner_value = owner_value
+
+        # File key (Algorithm 2)
+        digest = hashlib.md5(
+            padded_user + self.owner_value + self.permissions.to_bytes(4, 'little', signed=True) + file_id
+        ).digest()
+        for _ in range(50):
+            digest = hashlib.md5(digest).digest()
+        self.key = digest[:16]
+
+        # User entry (Algorithm 5)
+        user_value = rc4(self.key, hashlib.md5(PASSWORD_PADDING + file_id).digest())
+        for i in range(1, 20):
+            user_value = rc4(bytes(b ^ i for b in self.key), user_value)
+        self.user_value = user_value + bytes(16)
+
+    def encrypt(self, object_number, data):
+        """Encrypt a string or stream belonging to an indirect object"""
+        object_key = hashlib.md5(self.key + object_number.to_bytes(3, 'little') + bytes(2)).digest()
+        return rc4(object_key, data)
+
+    def dictionary(self):
+        return (
+            b'<< /Filter /Standard /V 2 /R 3 /Length 128 /P ' + str(self.permissions).encode()
+            + b' /O <' + self.owner_value.hex().encode() + b'> /U <' + self.user_value.hex().encode() + b'> >>'
+        )
+
+
+def escape_text(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def text_op(x, y, text, size=9):
+    return f"BT /F1 {size} Tf {x:.2f} {y:.2f} Td ({escape_text(text)}) Tj ET"
+
+
+def table_ops(rng, top, rows, cols, ruled, page_number):
+    """Content operators for one table; returns (ops, bottom y)"""
+    width = PAGE_WIDTH - 2 * MARGIN
+    col_width = width / cols
+    row_height = min(16.0, (top - MARGIN) / (rows + 1))
+    ops = []
+
+    for r in range(rows + 1):
+        y = top - (r + 1) * row_height + 4
+        for c in range(cols):
+            if r == 0:
+                value = f"Column {c + 1}"
+            elif c == 0:
+                value = f"{page_number:03d}-{r:04d}"
+            elif c % 3 == 1:
+                value = rng.choice(WORDS)
+            else:
+                value = f"{rng.uniform(-9999, 9999):.2f}"
+            ops.append(text_op(MARGIN + c * col_width + 3, y, value, size=min(9.0, row_height - 5)))
+
+    bottom = top - (rows + 1) * row_height
+    if ruled:
+        ops.append("0.5 w")
+        for r in range(rows + 2):
+            y = top - r * row_height
+            ops.append(f"{MARGIN:.2f} {y:.2f} m {PAGE_WIDTH - MARGIN:.2f} {y:.2f} l S")
+        for c in range(cols + 1):
+            x = MARGIN + c * col_width
+            ops.append(f"{x:.2f} {top:.2f} m {x:.2f} {bottom:.2f} l S")
+    return ops, bottom
+
+
+def text_page_ops(rng, top):
+    ops = []
+    y = top
+    while y > MARGIN:
+        line = ' '.join(rng.choice(WORDS) for _ in range(14))
+        ops.append(text_op(MARGIN, y, line.capitalize()))
+        y -= 12
+    return ops
+
+
+def page_content(spec, page_number, rng):
+    """Build the content stream for one page"""
+    layout = spec['layout']
+    if layout == 'mixed':
+        layout = 'ruled' if page_number % 2 else 'text'
+
+    top = PAGE_HEIGHT - MARGIN
+    ops = [text_op(MARGIN, top, f"Synthetic statement - page {page_number}", size=12)]
+    top -= 24
+
+    if layout == 'text':
+        ops += text_page_ops(rng, top)
+    else:
+        table, _ = table_ops(rng, top, spec['rows'], spec['cols'], layout == 'ruled', page_number)
+        ops += table
+    # Trailing newline: pdfminer drops a final operator that runs into the end of the stream
+    return ('\n'.join(ops) + '\n').encode('latin-1')
+
+
+def build_pdf(name, spec, scale=1):
+    """Return the bytes of a deterministic synthetic PDF"""
+    rng = random.Random(name)
+    page_count = max(1, int(spec['pages'] * scale))
+    file_id = hashlib.md5(f"{name}:{page_count}".encode()).digest()
+    encryption = StandardEncryption(spec['password'], file_id) if spec.get('password') else None
+
+    # Object numbers: 1 catalog, 2 pages, 3 font, then (page, content) pairs
+    objects = {
+        1: b'<< /Type /Catalog /Pages 2 0 R >>',
+        3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    }
+    kids = []
+    for index in range(page_count):
+        page_number = 4 + index * 2
+        content_number = page_number + 1
+        kids.append(f"{page_number} 0 R".encode())
+
+        content = page_content(spec, index + 1, rng)
+        if encryption:
+            content = encryption.encrypt(content_number, content)
+        objects[content_number] = (
+            b'<< /Length ' + str(len(content)).encode() + b' >>\nstream\n' + content + b'\nendstream'
+        )
+        objects[page_number] = (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 ' + f"{PAGE_WIDTH} {PAGE_HEIGHT}".encode()
+            + b'] /Resources << /Font << /F1 3 0 R >> >> /Contents ' + str(content_number).encode() + b' 0 R >>'
+        )
+    objects[2] = b'<< /Type /Pages /Kids [' + b' '.join(kids) + b'] /Count ' + str(page_count).encode() + b' >>'
+
+    encrypt_number = None
+    if encryption:
+        encrypt_number = max(objects) + 1
+        objects[encrypt_number] = encryption.dictionary()
+
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += f"{number} 0 obj\n".encode() + objects[number] + b'\nendobj\n'
+
+    xref_offset = len(out)
+    size = max(objects) + 1
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for number in range(1, size):
+        out += f"{offsets[number]:010d} 00000 n \n".encode()
+
+    trailer = b'<< /Size ' + str(size).encode() + b' /Root 1 0 R /ID [<' + file_id.hex().encode() + b'> <' + file_id.hex().encode() + b'>]'
+    if encrypt_number:
+        trailer += b' /Encrypt ' + str(encrypt_number).encode() + b' 0 R'
+    out += b'trailer\n' + trailer + b' >>\nstartxref\n' + str(xref_offset).encode() + b'\n%%EOF\n'
+    return bytes(out)
+
+
+def write_corpus(output_dir, scale=1, names=None):
+    """Write the corpus to output_dir; returns {name: (path, spec)}"""
+    os.makedirs(output_dir, exist_ok=True)
+    written = {}
+    for name, spec in CORPUS.items():
+        if names and name not in names:
+            continue
+        path = os.path.join(output_dir, f"{name}.pdf")
+        with open(path, 'wb') as f:
+            f.write(build_pdf(name, spec, scale))
+        written[name] = (path, spec)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output_dir', help='directory to write the PDFs to')
+    parser.add_argument('--scale', type=float, default=1, help='multiply every document\'s page count')
+    args = parser.parse_args()
+
+    for name, (path, spec) in write_corpus(args.output_dir, args.scale).items():
+        print(f"{name:<24} {os.path.getsize(path):>9} bytes  {path}")
+
+
+if __name__ == '__main__':
+    main()
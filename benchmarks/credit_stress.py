@@ -0,0 +1,167 @@
+"""Multi-process stress check for atomic credit deduction.
+
+Several processes, each with several threads, hammer one account through
+app.charge_credits: mostly single-credit charges, with some refunds of
+charges they made. Afterwards the account and its ledger must agree with
+what the workers observed:
+
+  - no overdraft: used credits never exceed total credits
+  - no lost update: used credits == successful charges - successful refunds
+  - ledger: transaction amounts sum to the final balance
+  - every charge made while credits remained succeeded (total successes == credits)
+
+Uses a throwaway SQLite database unless --database-url points at e.g. a
+PostgreSQL test database (the account is created fresh either way).
+
+Usage:
+    python benchmarks/credit_stress.py [--processes 4] [--threads 8] [--credits 200] [--refund-rate 0.1]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(database_url):
+    os.environ['DATABASE_URL'] = database_url
+    sys.path.insert(0, ROOT)
+    logging.disable(logging.CRITICAL)
+    import app as app_module
+    return app_module
+
+
+def worker(database_url, user_id, threads, refund_rate, seed, results):
+    """One process: threads charge until the account runs dry, refunding some of their own charges"""
+    app_module = load_app(database_url)
+    counts = {'charged': 0, 'refunded': 0, 'rejected': 0, 'errors': 0}
+    counts_lock = threading.Lock()
+
+    def run(thread_index):
+        rng = random.Random(f"{seed}-{thread_index}")
+        own_charges = 0
+        consecutive_rejections = 0
+        with app_module.app.app_context():
+            # Stop after a few rejections in a row: the account is empty and nobody is refunding
+            while consecutive_rejections < 3:
+                try:
+                    if own_charges and rng.random() < refund_rate:
+                        if app_module.charge_credits(user_id, -1, 'refund', 'stress refund') is not None:
+                            own_charges -= 1
+                            with counts_lock:
+                                counts['refunded'] += 1
+                        continue
+                    if app_module.charge_credits(user_id, 1, 'conversion', 'stress charge') is None:
+                        consecutive_rejections += 1
+                        with counts_lock:
+                            counts['rejected'] += 1
+                    else:
+                        consecutive_rejections = 0
+                        own_charges += 1
+                        with counts_lock:
+                            counts['charged'] += 1
+                except Exception:
+                    # e.g. SQLite "database is locked" under heavy contention: not a correctness failure
+                    app_module.db.session.rollback()
+                    with counts_lock:
+                        counts['errors'] += 1
+                    time.sleep(0.01)
+
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8, help='threads per process')
+    parser.add_argument('--credits', type=int, default=200, help='starting credits of the account')
+    parser.add_argument('--refund-rate', type=float, default=0.1, help='chance an operation refunds an earlier charge')
+    parser.add_argument('--database-url', help='database to use instead of a throwaway SQLite file')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='jdt-credit-stress-')
+    database_url = args.database_url or f"sqlite:///{os.path.join(work_dir, 'stress.db')}"
+    try:
+        app_module = load_app(database_url)
+        User, CreditTransaction, db = app_module.User, app_module.CreditTransaction, app_module.db
+
+        with app_module.app.app_context():
+            app_module._init_database()
+            user = User(  # type: ignore[call-arg]
+                email=f"stress-{uuid.uuid4().hex[:8]}@example.com",
+                referral_code=User.generate_referral_code(),
+                total_credits=args.credits,
+                used_credits=0
+            )
+            user.set_password(uuid.uuid4().hex)
+            db.session.add(user)
+            db.session.flush()
+            app_module.log_credit_transaction(user, args.credits, 'signup', 'stress starting balance')
+            db.session.commit()
+            user_id = user.id
+
+        results = multiprocessing.Queue()
+        start = time.perf_counter()
+        processes = [
+            multiprocessing.Process(
+                target=worker, args=(database_url, user_id, args.threads, args.refund_rate, i, results)
+            )
+            for i in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        totals = {'charged': 0, 'refunded': 0, 'rejected': 0, 'errors': 0}
+        for _ in processes:
+            for key, value in results.get().items():
+                totals[key] += value
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        with app_module.app.app_context():
+            user = db.session.get(User, user_id)
+            transactions = CreditTransaction.query.filter_by(user_id=user_id).all()
+            ledger_sum = sum(t.amount for t in transactions)
+            total, used = user.total_credits, user.used_credits
+
+        operations = totals['charged'] + totals['refunded'] + totals['rejected']
+        print(f"{args.processes} processes x {args.threads} threads, {operations} operations in {elapsed:.1f}s "
+              f"({operations / elapsed:.0f}/s)")
+        print(f"charged {totals['charged']}, refunded {totals['refunded']}, rejected {totals['rejected']}, "
+              f"errors {totals['errors']}")
+        print(f"account: total {total}, used {used}; ledger sum {ledger_sum} over {len(transactions)} entries")
+
+        problems = []
+        if used > total:
+            problems.append(f"overdraft: used {used} > total {total}")
+        if used != totals['charged'] - totals['refunded']:
+            problems.append(f"lost update: used {used} != charged {totals['charged']} - refunded {totals['refunded']}")
+        if ledger_sum != total - used:
+            problems.append(f"ledger sum {ledger_sum} != balance {total - used}")
+        if used != total:
+            problems.append(f"account not drained: {total - used} credits left although charges were rejected")
+
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        if problems:
+            sys.exit(1)
+        print("OK: no overdraft, no lost updates, ledger consistent")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
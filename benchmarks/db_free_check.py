@@ -0,0 +1,118 @@
+"""Correctness check for the endpoints served without the database (DB_FREE_ENDPOINTS).
+
+Counts the SQL statements and user loads of each request on a throwaway
+SQLite database in cold-start mode, with the user cache off
+(USER_CACHE_TTL=0) so a loaded user always costs a query. Fails (exit 1)
+unless every endpoint in app.DB_FREE_ENDPOINTS makes no query and loads no
+user:
+
+  - before the database is initialized, signed out and with a signed-in
+    session cookie, and without triggering the initialization
+  - after initialization, signed out and for a real signed-in session
+
+Usage:
+    python benchmarks/db_free_check.py
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'db-free-check-1'
+ADMIN_KEY = uuid.uuid4().hex
+
+# Endpoint -> (path, headers) of a request it serves with 200
+REQUESTS = {
+    'static': ('/static/style.css', {}),
+    'index': ('/', {}),
+    'get_metrics': ('/metrics', {'X-Admin-Key': ADMIN_KEY}),
+    'admin_test': ('/admin/test', {}),
+    'test_endpoint': ('/test-endpoint', {}),
+}
+
+
+def main():
+    work_dir = tempfile.mkdtemp(prefix='jdt-db-free-check-')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(work_dir, 'db-free.db')}",
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'RATE_LIMIT_ENABLED': '0',
+        'USER_CACHE_TTL': '0',
+        'COLD_START_MODE': '1',
+        'ADMIN_KEY': ADMIN_KEY,
+    })
+    sys.path.insert(0, ROOT)
+    logging.disable(logging.CRITICAL)
+
+    try:
+        import app as app_module
+        from sqlalchemy import event
+
+        app, db, login_manager = app_module.app, app_module.db, app_module.login_manager
+        app.config['WTF_CSRF_ENABLED'] = False
+        problems = []
+
+        missing = sorted(set(app_module.DB_FREE_ENDPOINTS) - set(REQUESTS))
+        if missing:
+            problems.append(f"no request to check for {', '.join(missing)}; add one to REQUESTS")
+
+        counts = {'queries': 0, 'user loads': 0}
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute',
+                         lambda *a, **kw: counts.__setitem__('queries', counts['queries'] + 1))
+        load_user = login_manager._user_callback
+
+        def counted_load_user(user_id):
+            counts['user loads'] += 1
+            return load_user(user_id)
+
+        login_manager.user_loader(counted_load_user)
+
+        def check_all(label, client):
+            for endpoint in sorted(app_module.DB_FREE_ENDPOINTS & set(REQUESTS)):
+                path, headers = REQUESTS[endpoint]
+                before = dict(counts)
+                response = client.get(path, headers=headers)
+                used = {name: counts[name] - before[name] for name in counts}
+                print(f"  {label:<28} {endpoint:<14} HTTP {response.status_code}  {used['queries']} queries, "
+                      f"{used['user loads']} user loads")
+                if response.status_code != 200:
+                    problems.append(f"{label} {endpoint}: HTTP {response.status_code}")
+                for name, used_count in used.items():
+                    if used_count:
+                        problems.append(f"{label} {endpoint}: {used_count} {name}, expected none")
+
+        check_all('cold, signed out', app.test_client())
+        client = app.test_client()
+        with client:
+            client.get('/test-endpoint')
+            # The client's fingerprint, which strong session protection compares with the session's _id
+            session_id = login_manager._session_identifier_generator()
+        with client.session_transaction() as client_session:
+            client_session.update({'_user_id': '1', '_fresh': True, '_id': session_id})
+        check_all('cold, session cookie', client)
+        if app_module._db_initialized:
+            problems.append("a database-free endpoint initialized the database")
+
+        client = app.test_client()
+        response = client.post('/auth/signup', json={'email': 'db-free@example.com', 'password': PASSWORD})
+        if response.status_code != 201:
+            problems.append(f"signup returned HTTP {response.status_code}")
+        else:
+            check_all('signed out', app.test_client())
+            check_all('signed in', client)
+
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        if problems:
+            sys.exit(1)
+        print("OK: every DB_FREE_ENDPOINTS endpoint made no query and loaded no user")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
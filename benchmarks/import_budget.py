@@ -0,0 +1,110 @@
+"""Import-time budget check for the serverless entry point.
+
+Imports the app in fresh interpreters in cold-start mode, as a serverless cold
+start would. Fails (exit 1) if:
+
+  - the median `import app` time exceeds the budget
+  - a conversion-only module (pandas, pdfplumber, openpyxl, ...) was imported
+  - the import opened the database (the throwaway SQLite file must not appear)
+
+On failure it prints the slowest imports from `python -X importtime` to show
+where the time went.
+
+Usage:
+    python benchmarks/import_budget.py [--budget-ms 800] [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the conversion path may load these
+HEAVY_MODULES = ['pandas', 'numpy', 'pdfplumber', 'pdfminer', 'openpyxl', 'PIL']
+
+CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'heavy': [name for name in %r if name in sys.modules],
+    'db_opened': os.path.exists(%r),
+}))
+"""
+
+
+def child_env(db_path):
+    env = dict(os.environ)
+    env.update({
+        'COLD_START_MODE': '1',
+        'DATABASE_URL': f"sqlite:///{db_path}",
+    })
+    env.pop('SCHEMA_VERSION', None)
+    return env
+
+
+def slowest_imports(db_path, count=15):
+    """(cumulative microseconds, module) of the slowest imports under -X importtime"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=ROOT, env=child_env(db_path), capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=800, help='maximum median import time')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to time')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='jdt-import-') as work_dir:
+        db_path = os.path.join(work_dir, 'budget.db')
+        samples = []
+        for _ in range(args.runs):
+            result = subprocess.run(
+                [sys.executable, '-c', CHILD % (HEAVY_MODULES, db_path)],
+                cwd=ROOT, env=child_env(db_path), capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                print(result.stderr)
+                sys.exit(f"FAIL: import app raised (exit {result.returncode})")
+            samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        median_ms = statistics.median(sample['seconds'] for sample in samples) * 1000
+        heavy = sorted({name for sample in samples for name in sample['heavy']})
+        db_opened = any(sample['db_opened'] for sample in samples)
+        print(f"import app: median {median_ms:.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+
+        problems = []
+        if median_ms > args.budget_ms:
+            problems.append(f"import took {median_ms:.0f} ms, budget is {args.budget_ms:.0f} ms")
+        if heavy:
+            problems.append(f"heavy modules imported: {', '.join(heavy)}")
+        if db_opened:
+            problems.append("the database was opened during import")
+
+        if problems:
+            for problem in problems:
+                print(f"FAIL: {problem}")
+            print("\nSlowest imports (cumulative):")
+            for microseconds, name in slowest_imports(db_path):
+                print(f"  {microseconds / 1000:8.1f} ms  {name}")
+            sys.exit(1)
+        print("OK: within budget, no heavy modules, no database access")
+
+
+if __name__ == '__main__':
+    main()
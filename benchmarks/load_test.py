@@ -0,0 +1,372 @@
+"""End-to-end HTTP load test for the Flask app.
+
+Starts the app in a child process (werkzeug threaded server) against a fresh
+SQLite database, signs up N users through /auth/signup and drives them with
+a configurable number of client threads:
+
+  convert  upload a corpus PDF, poll /progress, fetch the preview, download,
+           with /api/credits reads in between
+  deduct   fire more simultaneous uploads at one account than it has credits
+
+Reports p50/p95/p99 latency per endpoint, throughput and error rates, then
+checks the credit ledger in the database: every account's transactions must
+sum to its balance, and accepted uploads must match the credits charged.
+
+Usage:
+    python benchmarks/load_test.py [--users 10] [--concurrency 8] [--iterations 3] [--scenario convert,deduct]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests  # noqa: E402
+
+from corpus import write_corpus  # noqa: E402
+
+SCENARIOS = ['convert', 'deduct']
+PASSWORD = 'load-test-password'
+CSRF_META = re.compile(r'<meta name="csrf-token" content="([^"]+)"')
+
+
+def serve(args):
+    """Child process: run the app on a werkzeug threaded server and print the bound port"""
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(args.db)}"
+    os.environ.setdefault('SECRET_KEY', uuid.uuid4().hex)
+    os.environ['RATE_LIMIT_ENABLED'] = '0'  # Measures capacity, not the limiter; every client is 127.0.0.1
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from werkzeug.serving import make_server
+
+    from app import app
+
+    app.config['UPLOAD_FOLDER'] = args.upload_dir
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    print(server.port, flush=True)
+    server.serve_forever()
+
+
+class Recorder:
+    """Collects (endpoint, seconds, status) samples from all client threads"""
+
+    def __init__(self):
+        self.samples = []
+        self.lock = threading.Lock()
+
+    def add(self, endpoint, seconds, status):
+        with self.lock:
+            self.samples.append((endpoint, seconds, status))
+
+
+class Client:
+    """One signed-in user: a requests.Session carrying its cookies and CSRF token"""
+
+    def __init__(self, base_url, recorder, cookies=None, csrf_token=None):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.session = requests.Session()
+        if cookies:
+            self.session.cookies.update(cookies)
+        self.csrf_token = csrf_token
+
+    def request(self, method, endpoint, path, **kwargs):
+        headers = kwargs.pop('headers', {})
+        if self.csrf_token and method != 'GET':
+            headers['X-CSRFToken'] = self.csrf_token
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, headers=headers, timeout=120, **kwargs)
+        except requests.RequestException:
+            self.recorder.add(endpoint, time.perf_counter() - start, 'exception')
+            return None
+        self.recorder.add(endpoint, time.perf_counter() - start, response.status_code)
+        return response
+
+    def clone(self):
+        """A separate session for the same account (requests.Session is not thread-safe)"""
+        return Client(self.base_url, self.recorder, self.session.cookies.get_dict(), self.csrf_token)
+
+    def signup(self, email):
+        response = self.request('GET', 'GET /', '/')
+        if response is None or response.status_code != 200:
+            return False
+        match = CSRF_META.search(response.text)
+        self.csrf_token = match.group(1) if match else None
+        response = self.request('POST', 'POST /auth/signup', '/auth/signup', json={'email': email, 'password': PASSWORD})
+        return response is not None and response.status_code == 201
+
+    def upload(self, pdf_path):
+        with open(pdf_path, 'rb') as f:
+            return self.request(
+                'POST', 'POST /upload', '/upload',
+                files={'pdf_file': (os.path.basename(pdf_path), f, 'application/pdf')},
+                data={'extract_mode': 'tables', 'output_format': 'xlsx', 'page_range': 'all'},
+            )
+
+
+def run_convert(client, pdf_path, iterations, poll_interval, stats):
+    """Upload, poll until done, preview, download; repeated per user"""
+    for _ in range(iterations):
+        client.request('GET', 'GET /api/credits', '/api/credits')
+        response = client.upload(pdf_path)
+        if response is None or response.status_code != 200:
+            continue
+        stats['accepted'][client.email] += 1
+        task_id = response.json()['task_id']
+
+        progress = {}
+        deadline = time.time() + 300
+        while time.time() < deadline:
+            response = client.request('GET', 'GET /progress', f'/progress/{task_id}')
+            if response is None or response.status_code != 200:
+                break
+            progress = response.json()
+            if progress.get('status') in ['completed', 'error']:
+                break
+            time.sleep(poll_interval)
+
+        if progress.get('status') != 'completed':
+            stats['failed_conversions'] += 1
+            continue
+        stats['completed_conversions'] += 1
+
+        client.request('GET', 'GET /preview-data', f'/preview-data/{task_id}')
+        client.request('GET', 'GET /download', f"/download/{progress['output_file']}")
+
+
+def run_deduct(client, pdf_path, extra, stats):
+    """Fire (available credits + extra) uploads at once; exactly `available` may succeed"""
+    response = client.request('GET', 'GET /api/credits', '/api/credits')
+    if response is None or response.status_code != 200:
+        return
+    available = response.json()['available']
+    attempts = available + extra
+    barrier = threading.Barrier(attempts)
+    clones = [client.clone() for _ in range(attempts)]
+
+    def attempt(clone):
+        barrier.wait()
+        return clone.upload(pdf_path)
+
+    with ThreadPoolExecutor(max_workers=attempts) as pool:
+        responses = list(pool.map(attempt, clones))
+
+    accepted = sum(1 for r in responses if r is not None and r.status_code == 200)
+    rejected = sum(1 for r in responses if r is not None and r.status_code == 403)
+    stats['accepted'][client.email] += accepted
+    if accepted != available or rejected != extra:
+        stats['deduct_mismatches'].append(
+            f"{client.email}: {available} credits, {attempts} uploads -> {accepted} accepted, {rejected} rejected"
+        )
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    by_endpoint = defaultdict(list)
+    for endpoint, seconds, status in samples:
+        by_endpoint[endpoint].append((seconds, status))
+
+    report = {}
+    for endpoint, entries in sorted(by_endpoint.items()):
+        latencies = sorted(seconds for seconds, _ in entries)
+        errors = sum(1 for _, status in entries if status == 'exception' or status >= 500)
+        client_errors = sum(1 for _, status in entries if status != 'exception' and 400 <= status < 500)
+        report[endpoint] = {
+            'count': len(entries),
+            'errors': errors,
+            'client_errors': client_errors,
+            'error_rate': errors / len(entries),
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'throughput_rps': len(entries) / elapsed if elapsed else 0.0,
+        }
+    return report
+
+
+def check_ledger(db_path, accepted):
+    """Cross-check balances, transactions and accepted uploads; returns a list of problems"""
+    problems = []
+    connection = sqlite3.connect(db_path)
+    try:
+        rows = connection.execute(
+            """
+            SELECT u.email, u.total_credits, u.used_credits,
+                   COALESCE((SELECT SUM(amount) FROM credit_transactions t WHERE t.user_id = u.id), 0),
+                   (SELECT balance_after FROM credit_transactions t WHERE t.user_id = u.id ORDER BY t.id DESC LIMIT 1),
+                   (SELECT COUNT(*) FROM conversions c WHERE c.user_id = u.id)
+            FROM users u
+            """
+        ).fetchall()
+    finally:
+        connection.close()
+
+    for email, total, used, ledger_sum, last_balance, conversions in rows:
+        balance = total - used
+        if balance < 0:
+            problems.append(f"{email}: negative balance ({total} total, {used} used)")
+        if ledger_sum != balance:
+            problems.append(f"{email}: transactions sum to {ledger_sum}, balance is {balance}")
+        if last_balance is not None and last_balance != balance:
+            problems.append(f"{email}: last balance_after is {last_balance}, balance is {balance}")
+        if email in accepted and accepted[email] != used:
+            problems.append(f"{email}: {accepted[email]} uploads accepted, {used} credits charged")
+        if email in accepted and accepted[email] != conversions:
+            problems.append(f"{email}: {accepted[email]} uploads accepted, {conversions} conversions recorded")
+    return problems, len(rows)
+
+
+def start_server(work_dir):
+    db_path = os.path.join(work_dir, 'load_test.db')
+    upload_dir = os.path.join(work_dir, 'uploads')
+    os.makedirs(upload_dir)
+    log = open(os.path.join(work_dir, 'server.log'), 'w')
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), 'serve', '--db', db_path, '--upload-dir', upload_dir],
+        stdout=subprocess.PIPE, stderr=log, text=True,
+    )
+    port = process.stdout.readline().strip()
+    if not port:
+        process.wait()
+        raise RuntimeError(f"server failed to start, see {log.name}")
+    return process, f"http://127.0.0.1:{port}", db_path
+
+
+def run(args):
+    scenarios = [s for s in args.scenario.split(',') if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    work_dir = tempfile.mkdtemp(prefix='jdt-load-')
+    process = None
+    try:
+        pdf_path, _ = write_corpus(os.path.join(work_dir, 'corpus'), names=[args.document])[args.document]
+        process, base_url, db_path = start_server(work_dir)
+        recorder = Recorder()
+        stats = {
+            'accepted': defaultdict(int),
+            'completed_conversions': 0,
+            'failed_conversions': 0,
+            'deduct_mismatches': [],
+        }
+
+        # Sign up every user concurrently
+        start = time.perf_counter()
+        run_id = uuid.uuid4().hex[:8]
+        clients = [Client(base_url, recorder) for _ in range(args.users)]
+        for index, client in enumerate(clients):
+            client.email = f"load-{run_id}-{index}@example.com"
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            signed_up = list(pool.map(lambda c: c.signup(c.email), clients))
+        clients = [client for client, ok in zip(clients, signed_up) if ok]
+        print(f"Signed up {len(clients)}/{args.users} users")
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = []
+            if 'convert' in scenarios:
+                futures += [
+                    pool.submit(run_convert, client, pdf_path, args.iterations, args.poll_interval, stats)
+                    for client in clients
+                ]
+            for future in futures:
+                future.result()
+        if 'deduct' in scenarios:
+            # Bursts run one account at a time so each gets the full barrier
+            for client in clients[:args.burst_users]:
+                run_deduct(client, pdf_path, args.burst_extra, stats)
+        elapsed = time.perf_counter() - start
+
+        report = summarize(recorder.samples, elapsed)
+        problems, accounts = check_ledger(db_path, stats['accepted'])
+        problems += stats['deduct_mismatches']
+
+        total_requests = sum(r['count'] for r in report.values())
+        total_errors = sum(r['errors'] for r in report.values())
+        error_rate = total_errors / total_requests if total_requests else 0.0
+
+        print(f"\n{'endpoint':<22} {'count':>6} {'5xx':>5} {'4xx':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7}")
+        for endpoint, r in report.items():
+            print(f"{endpoint:<22} {r['count']:>6} {r['errors']:>5} {r['client_errors']:>5} "
+                  f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['throughput_rps']:>7.1f}")
+        print(f"\n{total_requests} requests in {elapsed:.1f}s ({total_requests / elapsed:.1f} req/s), "
+              f"error rate {error_rate:.2%}")
+        print(f"Conversions: {stats['completed_conversions']} completed, {stats['failed_conversions']} failed "
+              f"({stats['completed_conversions'] / elapsed:.2f}/s)")
+        print(f"Ledger: {accounts} accounts checked, {len(problems)} problem(s)")
+        for problem in problems:
+            print(f"  {problem}")
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({
+                    'config': {k: v for k, v in vars(args).items() if k != 'func'},
+                    'elapsed': elapsed,
+                    'error_rate': error_rate,
+                    'conversions': {'completed': stats['completed_conversions'], 'failed': stats['failed_conversions']},
+                    'endpoints': report,
+                    'ledger_problems': problems,
+                }, f, indent=2)
+            print(f"Saved {args.output}")
+
+        if problems or error_rate > args.max_error_rate:
+            sys.exit(1)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+        if args.keep:
+            print(f"Kept {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help=argparse.SUPPRESS)
+    serve_parser.add_argument('--db', required=True)
+    serve_parser.add_argument('--upload-dir', required=True)
+    serve_parser.add_argument('--port', type=int, default=0)
+
+    parser.add_argument('--users', type=int, default=10, help='accounts to sign up')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--iterations', type=int, default=3, help='conversions per user in the convert scenario')
+    parser.add_argument('--scenario', default=','.join(SCENARIOS), help='comma-separated: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--document', default='ruled_small', help='corpus document to upload')
+    parser.add_argument('--poll-interval', type=float, default=0.25, help='seconds between progress polls')
+    parser.add_argument('--burst-users', type=int, default=3, help='accounts used for the deduct scenario')
+    parser.add_argument('--burst-extra', type=int, default=5, help='uploads beyond the available credits per burst')
+    parser.add_argument('--max-error-rate', type=float, default=0.0, help='fail above this share of 5xx/connection errors')
+    parser.add_argument('--output', help='save the report as JSON')
+    parser.add_argument('--keep', action='store_true', help='keep the database and server log')
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(args)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Correctness check for read-replica routing.
+
+Uses two SQLite files: the primary, and a replica that is a copy of it taken
+after setup and never updated again, so it behaves like a lagging replica.
+Fails (exit 1) unless:
+
+  - read-only endpoints (/api/credit-history, /admin/check_credits) run
+    their queries on the replica when the client hasn't written recently
+  - right after a credit charge the client's reads go to the primary and show
+    the charge (read-your-writes), both for writes made in this process and
+    for a session that carries the write time from another worker
+  - once the read-after-write window passes, reads go back to the replica
+  - when the replica breaks, requests still succeed from the primary and the
+    replica is skipped until the retry interval passes
+
+Usage:
+    python benchmarks/replica_check.py [--window 1.0]
+"""
+import argparse
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'replica-check-1'
+ADMIN_KEY = uuid.uuid4().hex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--window', type=float, default=1.0, help='REPLICA_READ_AFTER_WRITE for the run (seconds)')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='jdt-replica-check-')
+    primary_path = os.path.join(work_dir, 'primary.db')
+    replica_path = os.path.join(work_dir, 'replica.db')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{primary_path}",
+        'DATABASE_REPLICA_URL': f"sqlite:///{replica_path}",
+        'REPLICA_READ_AFTER_WRITE': str(args.window),
+        'REPLICA_RETRY_SECONDS': str(args.window),
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'RATE_LIMIT_ENABLED': '0',
+        'ADMIN_KEY': ADMIN_KEY,
+    })
+    sys.path.insert(0, ROOT)
+    logging.disable(logging.CRITICAL)
+
+    try:
+        import app as app_module
+        from flask import session
+        from sqlalchemy import event
+
+        app, db = app_module.app, app_module.db
+        app.config['WTF_CSRF_ENABLED'] = False
+        email = f"replica-{uuid.uuid4().hex[:8]}@example.com"
+
+        with app.app_context():
+            app_module._init_database(force=True)
+            user = app_module.User(  # type: ignore[call-arg]
+                email=email, referral_code=app_module.User.generate_referral_code(),
+                total_credits=20, used_credits=0
+            )
+            user.set_password(PASSWORD)
+            app_module.add_new_user(user)
+            app_module.log_credit_transaction(user, 20, 'signup', 'replica check balance')
+            db.session.commit()
+            user_id = user.id
+
+            statements = {'primary': 0, 'replica': 0}
+            engines = {'primary': db.engines[None], 'replica': db.engines['replica']}
+            for name, engine in engines.items():
+                event.listen(engine, 'before_cursor_execute',
+                             lambda *a, name=name, **kw: statements.__setitem__(name, statements[name] + 1))
+
+        def snapshot_replica():
+            source, target = sqlite3.connect(primary_path), sqlite3.connect(replica_path)
+            source.backup(target)
+            source.close()
+            target.close()
+
+        def charge():
+            with app.app_context():
+                app_module.charge_credits(user_id, 1, 'conversion', 'replica check charge')
+
+        def wait_out_window():
+            time.sleep(args.window + 0.1)
+
+        problems = []
+
+        def check(label, path, expect, expect_entries=None, method='get', **kwargs):
+            before = dict(statements)
+            response = getattr(client, method)(path, **kwargs)
+            used = {name: statements[name] - before[name] for name in statements}
+            # The user loader always reads the primary (before the view runs); the view's reads decide
+            routed = 'replica' if used['replica'] else 'primary'
+            entries = len(response.get_json().get('history', [])) if response.status_code == 200 else None
+            print(f"  {label:<44} {response.status_code}  {routed:<7}  primary {used['primary']}, "
+                  f"replica {used['replica']} statements" + (f", {entries} entries" if entries is not None else ""))
+            if response.status_code != 200:
+                problems.append(f"{label}: HTTP {response.status_code}")
+            if routed != expect:
+                problems.append(f"{label}: read from the {routed}, expected the {expect}")
+            if expect_entries is not None and entries != expect_entries:
+                problems.append(f"{label}: {entries} ledger entries, expected {expect_entries}")
+            return response
+
+        snapshot_replica()
+        client = app.test_client()
+        client.post('/auth/login', json={'email': email, 'password': PASSWORD})
+        wait_out_window()
+
+        print("routing:")
+        check('history, no recent writes', '/api/credit-history', 'replica', expect_entries=1)
+        check('admin lookup', '/admin/check_credits', 'replica', method='post',
+              json={'admin_key': ADMIN_KEY, 'email': email})
+
+        charge()
+        check('history right after a charge', '/api/credit-history', 'primary', expect_entries=2)
+        wait_out_window()
+        check('history after the window (stale replica)', '/api/credit-history', 'replica', expect_entries=1)
+
+        # A charge made on another worker: only the session cookie knows about it
+        with app.test_request_context():
+            session['_user_id'] = str(user_id)
+            charge()
+            written_at = session.get('_db_written_at')
+        if written_at is None:
+            problems.append("a charge in a request didn't record the write time in the session")
+        app_module.recent_user_writes.clear()
+        with client.session_transaction() as client_session:
+            client_session['_db_written_at'] = written_at or time.time()
+        check('history, write time from the session', '/api/credit-history', 'primary', expect_entries=3)
+        wait_out_window()
+
+        print("fallback:")
+        os.remove(replica_path)
+        os.mkdir(replica_path)  # sqlite can't open a directory: every replica connection now fails
+        with app.app_context():
+            db.engines['replica'].dispose()
+        check('history with the replica down', '/api/credit-history', 'primary', expect_entries=3)
+        if app_module.replica_state['down_until'] <= time.monotonic():
+            problems.append("the failed replica was not taken out of rotation")
+        check('history while the replica is skipped', '/api/credit-history', 'primary', expect_entries=3)
+
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        if problems:
+            sys.exit(1)
+        print("OK: reads routed to the replica, read-your-writes held, replica failure fell back to the primary")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Correctness check for signup atomicity.
+
+Signs up on a throwaway SQLite database with the referral step forced to fail
+after it has written (the referral log and the referrer's bonus are already
+in the transaction, the user row sits in its referral-code savepoint), once
+plainly and once with a referral-code collision on the first attempt so the
+savepoint retry runs too. Fails (exit 1) unless:
+
+  - each failed signup returns 500 and leaves no user, ledger or referral rows,
+    and the referrer's credits untouched
+  - the same email can then sign up (again past a code collision), with
+    exactly one user, its signup and referral ledger entries and one
+    referral log
+
+Usage:
+    python benchmarks/signup_atomicity_check.py
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'signup-check-1'
+REFERRER_EMAIL = 'referrer@example.com'
+REFEREE_EMAIL = 'referee@example.com'
+
+
+def main():
+    work_dir = tempfile.mkdtemp(prefix='jdt-signup-check-')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(work_dir, 'signup.db')}",
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'RATE_LIMIT_ENABLED': '0',
+    })
+    sys.path.insert(0, ROOT)
+    logging.disable(logging.CRITICAL)
+
+    try:
+        import app as app_module
+
+        app, db = app_module.app, app_module.db
+        User, CreditTransaction, ReferralLog = app_module.User, app_module.CreditTransaction, app_module.ReferralLog
+        app.config['WTF_CSRF_ENABLED'] = False
+        problems = []
+
+        with app.app_context():
+            app_module._init_database(force=True)
+        client = app.test_client()
+        response = client.post('/auth/signup', json={'email': REFERRER_EMAIL, 'password': PASSWORD})
+        if response.status_code != 201:
+            print(f"FAIL: referrer signup returned HTTP {response.status_code}")
+            sys.exit(1)
+        client.post('/auth/logout')
+
+        def counts():
+            with app.app_context():
+                referrer = User.query.filter_by(email=REFERRER_EMAIL).one()
+                referee = User.query.filter_by(email=REFEREE_EMAIL).all()
+                return {
+                    'users': len(referee),
+                    'ledger': CreditTransaction.query.filter(CreditTransaction.user_id != referrer.id).count(),
+                    'referrer ledger': CreditTransaction.query.filter_by(user_id=referrer.id).count(),
+                    'referral logs': ReferralLog.query.count(),
+                    'referrer credits': referrer.total_credits,
+                }, referrer.referral_code
+
+        before, referral_code = counts()
+
+        real_award_referral = app_module.award_referral
+        real_generate = User.generate_referral_code
+
+        def failing_award_referral(*args, **kwargs):
+            real_award_referral(*args, **kwargs)
+            raise RuntimeError('forced referral failure')
+
+        # The first savepoint is the only one without a collision; with one, a second savepoint nests in it
+        for label, first_codes in [('failed signup', []), ('failed signup, code collision', [referral_code])]:
+            codes = iter(first_codes)
+            User.generate_referral_code = staticmethod(lambda: next(codes, None) or real_generate())
+            app_module.award_referral = failing_award_referral
+            try:
+                response = client.post('/auth/signup', json={
+                    'email': REFEREE_EMAIL, 'password': PASSWORD, 'referral_code': referral_code
+                })
+            finally:
+                User.generate_referral_code = staticmethod(real_generate)
+                app_module.award_referral = real_award_referral
+            after, _ = counts()
+            print(f"  {label:<30} HTTP {response.status_code}  {after}")
+            if response.status_code != 500:
+                problems.append(f"{label}: HTTP {response.status_code}, expected 500")
+            if next(codes, None) is not None:
+                problems.append(f"{label}: the colliding referral code was never drawn")
+            for name, value in before.items():
+                if after[name] != value:
+                    problems.append(f"{label}: left {name} at {after[name]}, expected {value}")
+
+        codes = iter([referral_code])
+        User.generate_referral_code = staticmethod(lambda: next(codes, None) or real_generate())
+        try:
+            response = client.post('/auth/signup', json={
+                'email': REFEREE_EMAIL, 'password': PASSWORD, 'referral_code': referral_code
+            })
+        finally:
+            User.generate_referral_code = staticmethod(real_generate)
+        retried, _ = counts()
+        print(f"  {'signup again':<30} HTTP {response.status_code}  {retried}")
+        if response.status_code != 201:
+            problems.append(f"signing up again after the failure returned HTTP {response.status_code}, expected 201")
+        if next(codes, None) is not None:
+            problems.append("signing up again: the colliding referral code was never drawn")
+        expected = {
+            'users': 1,
+            'ledger': 1,
+            'referrer ledger': before['referrer ledger'] + 1,
+            'referral logs': before['referral logs'] + 1,
+            'referrer credits': before['referrer credits'] + app_module.REFERRAL_BONUS_CREDITS,
+        }
+        for name, value in expected.items():
+            if retried[name] != value:
+                problems.append(f"signup after the failure left {name} at {retried[name]}, expected {value}")
+
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        if problems:
+            sys.exit(1)
+        print("OK: a failed signup rolled back completely and the email could register again")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
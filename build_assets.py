@@ -0,0 +1,274 @@
+"""Build minified, content-hashed copies of the static assets
+
+Writes static/dist/<name>.<hash>.<ext> for each asset and static/dist/manifest.json
+mapping the source name to the built file and the content hash of the source
+it was built from. Templates link assets with asset_url('style.css'), which
+uses the built file while the source still has that hash, and the app serves
+the hashed files with a one-year immutable Cache-Control. Vercel runs it as
+the deploy's build command (see vercel.json); elsewhere, run it before
+deploying and again after changing an asset:
+
+    python build_assets.py
+
+Each built file also gets .gz (and, with the brotli package, .br) copies
+that the app serves to clients accepting that encoding.
+
+Uses rjsmin / rcssmin when installed; otherwise a built-in minifier that
+only removes comments and whitespace, keeping line breaks in scripts so
+automatic semicolon insertion is unaffected.
+"""
+import hashlib
+import json
+import os
+import re
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+ASSETS = ['style.css', 'script.js']
+
+# Characters around which a space in code can be dropped without joining two tokens
+JS_PUNCTUATORS = set('{}()[];,:=<>+-*%&|!?~^.')
+CSS_PUNCTUATORS = set('{};,>')
+# Words after which a `/` starts a regular expression rather than a division
+JS_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw', 'instanceof'}
+JS_WORD = re.compile(r'[\w$]+$')
+
+
+class JSStripper:
+    """Comment and whitespace remover that understands strings, nested template literals and regex literals"""
+
+    def __init__(self, source):
+        self.source = source
+        self.out = []
+
+    def last_significant(self):
+        for chunk in reversed(self.out):
+            stripped = chunk.rstrip()
+            if stripped:
+                return stripped
+        return ''
+
+    def regex_allowed(self):
+        previous = self.last_significant()
+        if not previous:
+            return True
+        word = JS_WORD.search(previous)
+        if word:
+            return word.group() in JS_REGEX_KEYWORDS
+        return previous[-1] in '(,=:[!&|?{};+-*%<>~^'
+
+    def emit_space(self, i, newline):
+        if newline:
+            if self.out and self.out[-1] == ' ':
+                self.out.pop()
+            if self.out and not self.out[-1].endswith('\n'):
+                self.out.append('\n')
+            return
+        previous = self.out[-1][-1:] if self.out else ''
+        following = self.source[i:i + 1]
+        if not previous or previous == '\n' or not following:
+            return
+        if previous + following in ('++', '--') or '/' in (previous, following):
+            self.out.append(' ')
+        elif previous not in JS_PUNCTUATORS and following not in JS_PUNCTUATORS:
+            self.out.append(' ')
+
+    def quoted(self, i, quote):
+        """Copy a string literal starting at i; returns the index after it"""
+        j = i + 1
+        while j < len(self.source) and self.source[j] != quote:
+            j += 2 if self.source[j] == '\\' else 1
+        self.out.append(self.source[i:j + 1])
+        return j + 1
+
+    def template(self, i):
+        """Copy a template literal starting at i, stripping the code inside ${...}"""
+        self.out.append('`')
+        j = i + 1
+        while j < len(self.source):
+            char = self.source[j]
+            if char == '\\':
+                self.out.append(self.source[j:j + 2])
+                j += 2
+            elif char == '`':
+                self.out.append('`')
+                return j + 1
+            elif self.source.startswith('${', j):
+                self.out.append('${')
+                j = self.code(j + 2, inside_template=True)
+                self.out.append('}')
+                j += 1
+            else:
+                self.out.append(char)
+                j += 1
+        return j
+
+    def regex(self, i):
+        """Copy a regex literal (with flags) starting at i"""
+        j = i + 1
+        in_class = False
+        while j < len(self.source):
+            char = self.source[j]
+            if char == '\\':
+                j += 2
+                continue
+            if char == '[':
+                in_class = True
+            elif char == ']':
+                in_class = False
+            elif char == '/' and not in_class:
+                break
+            j += 1
+        j += 1
+        while j < len(self.source) and self.source[j].isalpha():
+            j += 1
+        self.out.append(self.source[i:j])
+        return j
+
+    def code(self, i, inside_template=False):
+        """Strip code from i; inside a template stops at the `}` closing the ${ (returns its index)"""
+        depth = 0
+        source = self.source
+        while i < len(source):
+            char = source[i]
+            if char in '\'"':
+                i = self.quoted(i, char)
+            elif char == '`':
+                i = self.template(i)
+            elif source.startswith('//', i):
+                end = source.find('\n', i)
+                i = len(source) if end < 0 else end
+            elif source.startswith('/*', i):
+                end = source.find('*/', i + 2)
+                end = len(source) if end < 0 else end + 2
+                newline = '\n' in source[i:end]
+                i = end
+                j = i
+                while j < len(source) and source[j] in ' \t\r\n':
+                    newline = newline or source[j] == '\n'
+                    j += 1
+                i = j
+                self.emit_space(i, newline)
+            elif char == '/' and self.regex_allowed():
+                i = self.regex(i)
+            elif char in ' \t\r\n':
+                j = i
+                newline = False
+                while j < len(source) and source[j] in ' \t\r\n':
+                    newline = newline or source[j] == '\n'
+                    j += 1
+                i = j
+                self.emit_space(i, newline)
+            else:
+                if inside_template:
+                    if char == '{':
+                        depth += 1
+                    elif char == '}':
+                        if depth == 0:
+                            return i
+                        depth -= 1
+                self.out.append(char)
+                i += 1
+        return i
+
+    def strip(self):
+        self.code(0)
+        return ''.join(self.out).strip() + '\n'
+
+
+def minify_js(source):
+    try:
+        import rjsmin  # type: ignore[import]
+        return rjsmin.jsmin(source)
+    except ImportError:
+        return JSStripper(source).strip()
+
+
+def minify_css(source):
+    try:
+        import rcssmin  # type: ignore[import]
+        return rcssmin.cssmin(source)
+    except ImportError:
+        pass
+    out = []
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char in '\'"':
+            j = i + 1
+            while j < len(source) and source[j] != char:
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = len(source) if end < 0 else end + 2
+        elif char.isspace():
+            while i < len(source) and source[i].isspace():
+                i += 1
+            previous = out[-1][-1:] if out else ''
+            following = source[i:i + 1]
+            if previous and following and previous not in CSS_PUNCTUATORS | {':'} and following not in CSS_PUNCTUATORS:
+                out.append(' ')
+        else:
+            if char == '}' and out and out[-1] == ';':
+                out.pop()  # The last declaration in a block needs no semicolon
+            if char in CSS_PUNCTUATORS and out and out[-1] == ' ':
+                out.pop()
+            out.append(char)
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+MINIFIERS = {'.js': minify_js, '.css': minify_css}
+
+
+def precompress(path, data):
+    """Write the maximum-effort .gz (and .br, with the brotli package) copies the app serves
+    to clients that accept them; returns [(suffix, size)]"""
+    import gzip
+
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    try:
+        import brotli  # type: ignore[import]
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    except ImportError:
+        pass
+    for suffix, compressed in variants:
+        with open(path + suffix, 'wb') as f:
+            f.write(compressed)
+    return [(suffix, len(compressed)) for suffix, compressed in variants]
+
+
+def build():
+    os.makedirs(DIST_DIR, exist_ok=True)
+    manifest = {}
+    for name in ASSETS:
+        with open(os.path.join(STATIC_DIR, name), 'rb') as f:
+            raw = f.read()
+        source = raw.decode('utf-8')
+        stem, ext = os.path.splitext(name)
+        minified = MINIFIERS[ext](source).encode('utf-8')
+        digest = hashlib.sha256(minified).hexdigest()[:12]
+        built = f"{stem}.{digest}{ext}"
+        with open(os.path.join(DIST_DIR, built), 'wb') as f:
+            f.write(minified)
+        # Same digest as the app's asset_url() computes for the source, to tell whether this build is current
+        manifest[name] = {'file': f"dist/{built}", 'source_hash': hashlib.sha256(raw).hexdigest()[:12]}
+        sizes = ', '.join(f"{suffix} {size:,}" for suffix, size in precompress(os.path.join(DIST_DIR, built), minified))
+        print(f"{name}: {len(raw):,} -> {len(minified):,} bytes ({sizes})  static/dist/{built}")
+
+    # Drop bundles from earlier builds; the manifest only points at the new ones
+    current = {os.path.basename(entry['file']) for entry in manifest.values()}
+    for entry in os.listdir(DIST_DIR):
+        if entry != 'manifest.json' and os.path.splitext(entry)[0] not in current and entry not in current:
+            os.remove(os.path.join(DIST_DIR, entry))
+    with open(os.path.join(DIST_DIR, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return manifest
+
+
+if __name__ == '__main__':
+    build()
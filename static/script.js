@@ -20,6 +20,7 @@
         PROGRESS_CHECK_INTERVAL: 500, // 500ms
         UPLOAD_TIMEOUT: 60000, // 60 seconds
         MAX_FILE_SIZE: 50 * 1024 * 1024, // 50MB
+        MAX_BATCH_FILES: 50,
         UPI_ID: 'jerinad123@pingpay' // Centralized configuration
     };
 
@@ -35,7 +36,9 @@
         currentUser: null,
         userReferralCode: null,
         currentAuthMode: 'login',
-        isCheckingStatus: false // Prevent race conditions
+        isCheckingStatus: false, // Prevent race conditions
+        inspection: null, // Last /inspect request: { key, promise }
+        inspectTimer: null
     };
 
     // ========================================================================
@@ -54,6 +57,7 @@
         progressSection: null,
         progressBar: null,
         statusMessage: null,
+        batchFileList: null,
         resultSection: null,
         resultDetails: null,
         errorSection: null,
@@ -218,6 +222,7 @@
         elements.progressSection = document.getElementById('progressSection');
         elements.progressBar = document.getElementById('progressBar');
         elements.statusMessage = document.getElementById('statusMessage');
+        elements.batchFileList = document.getElementById('batchFileList');
         elements.resultSection = document.getElementById('resultSection');
         elements.resultDetails = document.getElementById('resultDetails');
         elements.errorSection = document.getElementById('errorSection');
@@ -260,31 +265,117 @@
     // FILE UPLOAD HANDLING
     // ========================================================================
 
-    function handleFileSelect(file) {
-        if (!file) return;
+    function handleFileSelect(files) {
+        if (!files || files.length === 0) return;
 
-        if (file.type !== 'application/pdf') {
-            showToast('Please select a valid PDF file', 'error');
+        if (files.length > CONFIG.MAX_BATCH_FILES) {
+            showToast(`You can convert at most ${CONFIG.MAX_BATCH_FILES} PDFs at once`, 'error');
             resetFileInput();
             return;
         }
 
-        if (file.size > CONFIG.MAX_FILE_SIZE) {
-            showToast('File size exceeds 50MB limit', 'error');
-            resetFileInput();
-            return;
+        let totalSize = 0;
+        for (const file of files) {
+            if (file.type !== 'application/pdf') {
+                showToast('Please select a valid PDF file', 'error');
+                resetFileInput();
+                return;
+            }
+
+            if (file.size > CONFIG.MAX_FILE_SIZE) {
+                showToast('File size exceeds 50MB limit', 'error');
+                resetFileInput();
+                return;
+            }
+
+            if (file.size === 0) {
+                showToast('File is empty', 'error');
+                resetFileInput();
+                return;
+            }
+
+            totalSize += file.size;
         }
 
-        if (file.size === 0) {
-            showToast('File is empty', 'error');
-            resetFileInput();
+        if (files.length === 1) {
+            elements.fileName.textContent = escapeHtml(files[0].name);
+        } else {
+            elements.fileName.textContent = `${files.length} PDF files selected`;
+        }
+        elements.fileInfo.textContent = `Size: ${formatFileSize(totalSize)}`;
+        document.querySelector('.file-upload-label')?.classList.add('has-file');
+        refreshInspection();
+    }
+
+    // ========================================================================
+    // PDF INSPECTION (page count, password, text layer and ETA before upload)
+    // ========================================================================
+
+    function inspectionOptions() {
+        return {
+            page_range: document.getElementById('pageRange')?.value?.trim() || 'all',
+            extract_mode: document.getElementById('extractMode')?.value || 'tables',
+            password: document.getElementById('password')?.value || ''
+        };
+    }
+
+    /**
+     * Inspect a PDF with the current options; resolves to the report, or null
+     * if the check itself failed (the upload then goes ahead unchecked)
+     */
+    function inspectFile(file) {
+        const options = inspectionOptions();
+        const key = [file.name, file.size, file.lastModified, options.page_range, options.extract_mode, options.password].join('|');
+        if (state.inspection && state.inspection.key === key) {
+            return state.inspection.promise;
+        }
+
+        const formData = new FormData();
+        formData.append('pdf_file', file);
+        for (const [name, value] of Object.entries(options)) {
+            formData.append(name, value);
+        }
+
+        const promise = fetch('/inspect', {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': getCsrfToken()
+            },
+            body: formData
+        })
+            .then(response => response.ok ? response.json() : null)
+            .catch(() => null);
+        state.inspection = { key, promise };
+        return promise;
+    }
+
+    /**
+     * Re-inspect the selected PDF and show the result under the file name
+     */
+    async function refreshInspection() {
+        const files = elements.fileInput?.files;
+        if (!state.currentUser || !files || files.length !== 1 || !elements.fileInfo) return;
+
+        const file = files[0];
+        const size = `Size: ${formatFileSize(file.size)}`;
+        const report = await inspectFile(file);
+        if (!report || elements.fileInput.files[0] !== file) return;
+
+        if (report.status === 'error') {
+            elements.fileInfo.textContent = `${size} · ${report.message}`;
             return;
         }
+        const details = [size, `${report.selected_pages} of ${report.pages} pages`];
+        if (report.tables_per_page !== null) {
+            details.push(`~${report.tables_per_page} tables/page`);
+        }
+        details.push(report.warning ? report.warning.message : `about ${Math.max(1, Math.round(report.eta_seconds))}s to convert`);
+        elements.fileInfo.textContent = details.join(' · ');
+    }
 
-        const sanitizedName = escapeHtml(file.name);
-        elements.fileName.textContent = sanitizedName;
-        elements.fileInfo.textContent = `Size: ${formatFileSize(file.size)}`;
-        document.querySelector('.file-upload-label')?.classList.add('has-file');
+    function scheduleInspection() {
+        clearTimeout(state.inspectTimer);
+        state.inspectTimer = setTimeout(refreshInspection, 400);
     }
 
     function resetFileInput() {
@@ -292,7 +383,7 @@
             elements.fileInput.value = '';
         }
         if (elements.fileName) {
-            elements.fileName.textContent = 'Choose PDF file or drag & drop here';
+            elements.fileName.textContent = 'Choose PDF file(s) or drag & drop here';
         }
         if (elements.fileInfo) {
             elements.fileInfo.textContent = '';
@@ -337,7 +428,7 @@
             const files = e.dataTransfer?.files;
             if (files && files.length > 0) {
                 elements.fileInput.files = files;
-                handleFileSelect(files[0]);
+                handleFileSelect(files);
             }
         });
     }
@@ -349,17 +440,21 @@
     async function handleFormSubmit(e) {
         e.preventDefault();
 
-        if (!elements.fileInput?.files[0]) {
+        const selectedFiles = elements.fileInput?.files;
+        if (!selectedFiles || selectedFiles.length === 0) {
             showToast('Please select a PDF file', 'error');
             return;
         }
 
         // Validate file size
-        if (elements.fileInput.files[0].size > CONFIG.MAX_FILE_SIZE) {
+        if (Array.from(selectedFiles).some(file => file.size > CONFIG.MAX_FILE_SIZE)) {
             showToast('File size exceeds 50MB limit', 'error');
             return;
         }
 
+        // Several files go through the batch endpoint as one job
+        const isBatch = selectedFiles.length > 1;
+
         // Validate page range format
         const pageRange = document.getElementById('pageRange')?.value?.trim() || '';
         if (pageRange && pageRange.toLowerCase() !== 'all') {
@@ -370,12 +465,31 @@
             }
         }
 
+        // Check the PDF before spending a credit on it
+        if (!isBatch) {
+            const report = await inspectFile(selectedFiles[0]);
+            if (report && report.status === 'error') {
+                showToast(`${report.message} ${report.suggestion}`, 'error');
+                return;
+            }
+            if (report && report.warning && !window.confirm(`${report.warning.message} ${report.warning.suggestion}\n\nConvert anyway? This uses 1 credit.`)) {
+                return;
+            }
+        }
+
         // Prepare form data
         const formData = new FormData();
-        formData.append('pdf_file', elements.fileInput.files[0]);
+        if (isBatch) {
+            for (const file of selectedFiles) {
+                formData.append('pdf_files', file);
+            }
+        } else {
+            formData.append('pdf_file', selectedFiles[0]);
+        }
         formData.append('page_range', document.getElementById('pageRange')?.value || 'all');
         formData.append('extract_mode', document.getElementById('extractMode')?.value || 'tables');
         formData.append('output_format', document.getElementById('outputFormat')?.value || 'xlsx');
+        formData.append('text_rows', document.getElementById('textRows')?.value || 'pages');
         formData.append('merge_tables', document.getElementById('mergeTables')?.checked || false);
         formData.append('include_headers', document.getElementById('includeHeaders')?.checked !== false);
         formData.append('clean_data', document.getElementById('cleanData')?.checked !== false);
@@ -386,14 +500,15 @@
         if (elements.progressSection) elements.progressSection.style.display = 'block';
         if (elements.convertBtn) elements.convertBtn.disabled = true;
         if (elements.progressBar) elements.progressBar.style.width = '0%';
-        if (elements.statusMessage) elements.statusMessage.textContent = 'Uploading file...';
+        if (elements.statusMessage) elements.statusMessage.textContent = isBatch ? `Uploading ${selectedFiles.length} files...` : 'Uploading file...';
+        renderBatchFiles(null);
 
         try {
             // Upload file with timeout
             const controller = new AbortController();
             const timeoutId = setTimeout(() => controller.abort(), CONFIG.UPLOAD_TIMEOUT);
 
-            const response = await fetch('/upload', {
+            const response = await fetch(isBatch ? '/upload-batch' : '/upload', {
                 method: 'POST',
                 headers: {
                     'X-CSRFToken': getCsrfToken()
@@ -415,7 +530,7 @@
                     return;
                 }
 
-                throw new Error(error.error || 'Upload failed');
+                throw new Error(error.error === 'rate_limited' ? error.message : (error.error || 'Upload failed'));
             }
 
             const result = await response.json();
@@ -464,8 +579,14 @@
                     return;
                 }
 
+                // Nobody is watching a background tab: skip the poll (the server keeps converting)
+                if (document.hidden) return;
+
                 const response = await fetch(`/progress/${state.currentTaskId}`);
 
+                // Rate limited: not a failure, just poll again on a later interval
+                if (response.status === 429) return;
+
                 if (!response.ok) {
                     consecutiveErrors++;
                     if (consecutiveErrors >= MAX_ERRORS) {
@@ -505,6 +626,28 @@
         if (progress.message && elements.statusMessage) {
             elements.statusMessage.textContent = progress.message;
         }
+        renderBatchFiles(progress.files);
+    }
+
+    /**
+     * Render per-file status for batch conversions (hidden for single files)
+     */
+    function renderBatchFiles(files) {
+        if (!elements.batchFileList) return;
+
+        if (!files || files.length === 0) {
+            elements.batchFileList.innerHTML = '';
+            elements.batchFileList.style.display = 'none';
+            return;
+        }
+
+        elements.batchFileList.innerHTML = files.map(file => `
+            <li class="batch-file batch-file-${escapeHtml(file.status)}">
+                <span class="batch-file-name">${escapeHtml(file.filename)}</span>
+                <span class="batch-file-status">${file.status === 'error' ? escapeHtml(file.message) : `${escapeHtml(file.progress)}%`}</span>
+            </li>
+        `).join('');
+        elements.batchFileList.style.display = 'block';
     }
 
     // ========================================================================
@@ -527,13 +670,19 @@
 
         // Build result details
         let details = '<div class="result-details">';
+        if (progress.total_files) {
+            details += `<p><strong>Files converted:</strong> ${progress.completed_files} of ${progress.total_files}</p>`;
+        }
         if (progress.table_count > 0) {
             details += `<p><strong>Tables extracted:</strong> ${progress.table_count}</p>`;
         }
         if (progress.text_count > 0) {
             details += `<p><strong>Text pages extracted:</strong> ${progress.text_count}</p>`;
         }
-        const format = state.downloadFilename?.endsWith('.xlsx') ? 'Excel (.xlsx)' : 'CSV (.csv)';
+        let format = state.downloadFilename?.endsWith('.xlsx') ? 'Excel (.xlsx)' : 'CSV (.csv)';
+        if (state.downloadFilename?.endsWith('.zip')) {
+            format = 'ZIP of CSV files (.zip)';
+        }
         details += `<p><strong>Output format:</strong> ${format}</p>`;
         details += '</div>';
 
@@ -676,6 +825,7 @@
         const pageRange = document.getElementById('pageRange');
         const extractMode = document.getElementById('extractMode');
         const outputFormat = document.getElementById('outputFormat');
+        const textRows = document.getElementById('textRows');
         const mergeTables = document.getElementById('mergeTables');
         const includeHeaders = document.getElementById('includeHeaders');
         const cleanData = document.getElementById('cleanData');
@@ -683,6 +833,7 @@
         if (pageRange) pageRange.value = settings.page_range || 'all';
         if (extractMode) extractMode.value = settings.extract_mode || 'tables';
         if (outputFormat) outputFormat.value = settings.output_format || 'xlsx';
+        if (textRows) textRows.value = settings.text_rows || 'pages';
         if (mergeTables) mergeTables.checked = settings.merge_tables || false;
         if (includeHeaders) includeHeaders.checked = settings.include_headers !== false;
         if (cleanData) cleanData.checked = settings.clean_data !== false;
@@ -793,29 +944,49 @@
     // HISTORY MODAL
     // ========================================================================
 
-    async function showHistoryModal() {
-        try {
-            const response = await fetch('/history');
-            if (!response.ok) {
-                throw new Error('Failed to load history');
-            }
+    async function fetchHistoryPage(url, cursor) {
+        // History endpoints are paginated newest first; next_cursor fetches the following page
+        const response = await fetch(cursor ? `${url}?cursor=${encodeURIComponent(cursor)}` : url);
+        if (!response.ok) {
+            throw new Error('Failed to load history');
+        }
+        return response.json();
+    }
 
-            const data = await response.json();
-            displayHistoryModal(data.history);
+    function setLoadMoreButton(container, nextCursor, loadPage) {
+        const existing = container.querySelector('.load-more-btn');
+        if (existing) existing.remove();
+        if (!nextCursor) return;
+
+        const button = document.createElement('button');
+        button.className = 'load-more-btn';
+        button.innerHTML = '<i class="fas fa-chevron-down"></i> Load more';
+        button.addEventListener('click', () => {
+            button.disabled = true;
+            loadPage(nextCursor);
+        });
+        container.appendChild(button);
+    }
+
+    async function showHistoryModal(cursor = null) {
+        try {
+            const data = await fetchHistoryPage('/history', cursor);
+            displayHistoryModal(data, Boolean(cursor));
         } catch (error) {
             showToast('Unable to load history: ' + error.message, 'error');
         }
     }
 
-    function displayHistoryModal(history) {
+    function displayHistoryModal(data, append = false) {
         const historyList = document.querySelector('#historyContent .history-list');
         if (!historyList) return;
+        const history = data.history;
 
-        if (history.length === 0) {
+        if (history.length === 0 && !append) {
             historyList.innerHTML = '<p class="empty-message">No conversion history yet</p>';
         } else {
-            let html = '<div class="history-items">';
-            history.reverse().forEach(item => {
+            let html = '';
+            history.forEach(item => {
                 const date = new Date(item.timestamp);
                 const statusClass = item.status === 'completed' ? 'success' :
                     item.status === 'error' ? 'error' : 'pending';
@@ -838,11 +1009,18 @@
                     </div>
                 </div>`;
             });
-            html += '</div>';
-            historyList.innerHTML = html;
 
-            // Add event listeners to download buttons
-            historyList.querySelectorAll('.history-download-btn').forEach(btn => {
+            const items = append && historyList.querySelector('.history-items');
+            if (items) {
+                items.insertAdjacentHTML('beforeend', html);
+            } else {
+                historyList.innerHTML = `<div class="history-items">${html}</div>`;
+            }
+            setLoadMoreButton(historyList, data.next_cursor, showHistoryModal);
+
+            // Add event listeners to new download buttons
+            historyList.querySelectorAll('.history-download-btn:not([data-bound])').forEach(btn => {
+                btn.setAttribute('data-bound', 'true');
                 btn.addEventListener('click', function () {
                     const filename = this.getAttribute('data-filename');
                     if (filename) {
@@ -862,20 +1040,29 @@
     // AUTHENTICATION
     // ========================================================================
 
+    async function fetchDashboard() {
+        // 'no-cache' keeps the response in the browser cache but revalidates it with If-None-Match,
+        // so an unchanged dashboard costs a 304 and is served from the cached copy
+        const response = await fetch('/api/dashboard', {
+            cache: 'no-cache',
+            credentials: 'same-origin'
+        });
+        if (!response.ok) throw new Error('Failed to load dashboard');
+        return response.json();
+    }
+
     async function checkUserStatus() {
         // Prevent race conditions
         if (state.isCheckingStatus) return;
         state.isCheckingStatus = true;
 
         try {
-            const response = await fetch('/api/user-status');
-            const data = await response.json();
+            const data = await fetchDashboard();
 
             if (data.logged_in) {
                 state.currentUser = data;
                 state.userReferralCode = data.referral_code;
                 showLoggedInState(data);
-                await updateCreditsDisplay();
             } else {
                 showLoggedOutState();
             }
@@ -903,17 +1090,10 @@
 
     async function updateCreditsDisplay() {
         try {
-            // Add timestamp to bypass cache
-            const response = await fetch(`/api/credits?_=${Date.now()}`, {
-                headers: {
-                    'Cache-Control': 'no-cache',
-                    'Pragma': 'no-cache'
-                }
-            });
-            if (response.ok) {
-                const data = await response.json();
+            const data = await fetchDashboard();
+            if (data.logged_in) {
                 if (elements.creditsCount) {
-                    elements.creditsCount.textContent = data.available;
+                    elements.creditsCount.textContent = data.available_credits;
                 }
                 state.currentUser = data;
             }
@@ -1026,7 +1206,7 @@
                 window.location.reload();
             } else {
                 if (errorDiv) {
-                    errorDiv.textContent = data.error || 'Authentication failed';
+                    errorDiv.textContent = data.message || data.error || 'Authentication failed';
                     errorDiv.style.display = 'block';
                 }
             }
@@ -1089,32 +1269,26 @@
 
     async function showReferralModal() {
         try {
-            const [creditsResponse, statsResponse] = await Promise.all([
-                fetch('/api/credits'),
-                fetch('/api/referral-stats')
-            ]);
-
-            const creditsData = await creditsResponse.json();
-            const statsData = await statsResponse.json();
+            const data = await fetchDashboard();
 
             const availableCredits = document.getElementById('availableCredits');
             const totalReferrals = document.getElementById('totalReferrals');
             const creditsEarned = document.getElementById('creditsEarned');
             const referralLink = document.getElementById('dashboardReferralLink');
 
-            if (availableCredits) availableCredits.textContent = creditsData.available;
-            if (totalReferrals) totalReferrals.textContent = statsData.total_referrals;
-            if (creditsEarned) creditsEarned.textContent = creditsData.total_earned;
+            if (availableCredits) availableCredits.textContent = data.available_credits;
+            if (totalReferrals) totalReferrals.textContent = data.referrals_count;
+            if (creditsEarned) creditsEarned.textContent = data.total_credits;
             if (referralLink) {
-                referralLink.value = `${window.location.origin}/?ref=${creditsData.referral_code}`;
+                referralLink.value = `${window.location.origin}/?ref=${data.referral_code}`;
             }
 
             // Display referral list
             const referralList = document.getElementById('referralList');
             if (referralList) {
-                if (statsData.referrals && statsData.referrals.length > 0) {
+                if (data.referrals && data.referrals.length > 0) {
                     let html = '<div class="referral-items">';
-                    statsData.referrals.forEach(ref => {
+                    data.referrals.forEach(ref => {
                         const date = new Date(ref.signup_date).toLocaleDateString();
                         const email = escapeHtml(ref.email);
                         html += `
@@ -1204,17 +1378,14 @@
         }
     }
 
-    async function loadCreditHistory() {
+    async function loadCreditHistory(cursor = null) {
         try {
-            const response = await fetch('/api/credit-history');
-            if (!response.ok) throw new Error('Failed to load credit history');
-
-            const data = await response.json();
+            const data = await fetchHistoryPage('/api/credit-history', cursor);
             const historyList = document.getElementById('creditHistoryList');
 
             if (!historyList) return;
 
-            if (data.history.length === 0) {
+            if (data.history.length === 0 && !cursor) {
                 historyList.innerHTML = `
                     <div class="no-history">
                         <i class="fas fa-inbox"></i>
@@ -1224,7 +1395,8 @@
                 return;
             }
 
-            historyList.innerHTML = '';
+            if (!cursor) historyList.innerHTML = '';
+            const loadMore = historyList.querySelector('.load-more-btn');
             data.history.forEach(item => {
                 const isPositive = item.amount > 0;
                 const amountClass = isPositive ? 'positive' : 'negative';
@@ -1244,12 +1416,15 @@
                         <div class="history-balance">Balance: ${item.balance_after}</div>
                     </div>
                 `;
-                historyList.appendChild(historyItem);
+                historyList.insertBefore(historyItem, loadMore);
             });
+            setLoadMoreButton(historyList, data.next_cursor, loadCreditHistory);
         } catch (error) {
             console.error('Error loading credit history:', error);
             const historyList = document.getElementById('creditHistoryList');
-            if (historyList) {
+            if (cursor) {
+                showToast('Failed to load more history', 'error');
+            } else if (historyList) {
                 historyList.innerHTML = '<div class="loading-message">Failed to load history</div>';
             }
         }
@@ -1367,10 +1542,16 @@
         // File upload
         if (elements.fileInput) {
             elements.fileInput.addEventListener('change', (e) => {
-                handleFileSelect(e.target.files[0]);
+                handleFileSelect(e.target.files);
             });
         }
 
+        // Re-check the selected PDF as the options it depends on change
+        ['pageRange', 'password'].forEach(id => {
+            document.getElementById(id)?.addEventListener('input', scheduleInspection);
+        });
+        document.getElementById('extractMode')?.addEventListener('change', scheduleInspection);
+
         // Form submission
         if (elements.uploadForm) {
             elements.uploadForm.addEventListener('submit', handleFormSubmit);
@@ -1404,7 +1585,7 @@
 
         // History button
         if (elements.historyBtn) {
-            elements.historyBtn.addEventListener('click', showHistoryModal);
+            elements.historyBtn.addEventListener('click', () => showHistoryModal());
         }
 
         // Template buttons
@@ -1454,6 +1635,7 @@
                     page_range: document.getElementById('pageRange')?.value || 'all',
                     extract_mode: document.getElementById('extractMode')?.value || 'tables',
                     output_format: document.getElementById('outputFormat')?.value || 'xlsx',
+                    text_rows: document.getElementById('textRows')?.value || 'pages',
                     merge_tables: document.getElementById('mergeTables')?.checked || false,
                     include_headers: document.getElementById('includeHeaders')?.checked !== false,
                     clean_data: document.getElementById('cleanData')?.checked !== false